@@ -0,0 +1,72 @@
+"""End-to-end latency of client flash requests.
+
+Measures the time from a `flash_window` request being sent to the first opacity write on the
+focused window, through a fully running `FlashServer`.
+"""
+from __future__ import annotations
+
+from threading import Event, Thread
+from time import perf_counter, sleep
+
+from benchmarks.common import main, result, summarize
+from flashfocus.client import client_request_flash
+from flashfocus.display_protocols.fake import DISPLAY
+from flashfocus.server import FlashServer
+
+
+NREQUESTS = 200
+
+CONFIG = dict(
+    default_opacity=1,
+    flash_opacity=0.8,
+    time=1,
+    ntimepoints=1,
+    adaptive_frames=False,
+    simple=True,
+    rules=None,
+    flash_on_focus=False,
+    flash_lone_windows="always",
+    flash_fullscreen=True,
+    fast_forward_on_unfocus=False,
+)
+
+
+def run() -> list[dict]:
+    window = DISPLAY.create_window()
+    DISPLAY.focus(window.id)
+    server = FlashServer(CONFIG)
+    server_thread = Thread(target=server.event_loop)
+    server_thread.start()
+    while not server.ready:
+        sleep(0.01)
+
+    flashed = Event()
+    set_opacity = DISPLAY.set_opacity
+
+    def record_set_opacity(window_id: int, opacity: float) -> None:
+        set_opacity(window_id, opacity)
+        if opacity != CONFIG["default_opacity"]:
+            flashed.set()
+
+    DISPLAY.set_opacity = record_set_opacity  # type: ignore[method-assign]
+
+    latencies = []
+    flasher = server.router.flashers[-1]
+    try:
+        for _ in range(NREQUESTS):
+            flashed.clear()
+            start = perf_counter()
+            client_request_flash()
+            flashed.wait()
+            latencies.append(perf_counter() - start)
+            # Wait for the flash to finish so that the next request isn't merged into it
+            while flasher.progress:
+                sleep(0.001)
+    finally:
+        server.shutdown(disconnect_from_wm=False)
+        server_thread.join()
+    return [result("client.request_latency", {}, "s", summarize(latencies))]
+
+
+if __name__ == "__main__":
+    main(run)
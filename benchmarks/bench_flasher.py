@@ -0,0 +1,89 @@
+"""Accuracy of flash animation frame timing with many concurrently flashing windows.
+
+Windows are flashed using the real (monotonic clock) scheduler and the time of each opacity write is
+compared to the time at which it should ideally have occurred.
+"""
+from __future__ import annotations
+
+from threading import Event
+from time import monotonic
+
+from benchmarks.common import main, result, summarize
+from flashfocus.display_protocols.fake import DISPLAY, Window
+from flashfocus.flasher import Flasher
+from flashfocus.scheduler import MonotonicScheduler
+
+
+WINDOW_COUNTS = [1, 10, 100]
+TIME = 200
+NTIMEPOINTS = 10
+REPEAT = 5
+
+
+class RecordingWindow(Window):
+    """A simulated window which records the wall-clock time of each opacity write."""
+
+    def __init__(self, window_id: int, writes: list[tuple[int, float]], done: Event) -> None:
+        super().__init__(window_id)
+        self.writes = writes
+        self.done = done
+
+    def set_opacity(self, opacity: float | None) -> None:
+        self.writes.append((self.id, monotonic()))
+        super().set_opacity(opacity)
+        if opacity == 1:
+            self.done.set()
+
+
+def flash_windows(nwindows: int) -> list[float]:
+    """Flash `nwindows` windows at once and return the lateness of each frame in seconds."""
+    DISPLAY.reset()
+    flasher = Flasher(
+        time=TIME,
+        flash_opacity=0.8,
+        default_opacity=1,
+        simple=False,
+        ntimepoints=NTIMEPOINTS,
+        scheduler=MonotonicScheduler(),
+        # Frame lateness is measured against a fixed frame interval
+        adaptive_frames=False,
+    )
+    writes: list[tuple[int, float]] = []
+    windows = []
+    for _ in range(nwindows):
+        done = Event()
+        windows.append(RecordingWindow(DISPLAY.create_window().id, writes, done))
+    start = monotonic()
+    for window in windows:
+        flasher.flash(window)
+    for window in windows:
+        window.done.wait()
+
+    lateness = []
+    frame_numbers: dict[int, int] = {}
+    for window_id, time in writes:
+        frame = frame_numbers.get(window_id, 0)
+        frame_numbers[window_id] = frame + 1
+        lateness.append(time - (start + frame * flasher.timechunk))
+    return lateness
+
+
+def run() -> list[dict]:
+    results = []
+    for nwindows in WINDOW_COUNTS:
+        lateness = []
+        for _ in range(REPEAT):
+            lateness += flash_windows(nwindows)
+        results.append(
+            result(
+                "flasher.frame_lateness",
+                {"windows": nwindows, "time": TIME, "ntimepoints": NTIMEPOINTS},
+                "s",
+                summarize(lateness),
+            )
+        )
+    return results
+
+
+if __name__ == "__main__":
+    main(run)
@@ -0,0 +1,66 @@
+"""Throughput of `FlashRouter.route_request` with varying numbers of rules."""
+from __future__ import annotations
+
+import re
+from itertools import cycle
+
+from benchmarks.common import main, result, timeit
+from flashfocus.display import WMEvent, WMEventType
+from flashfocus.display_protocols.fake import DISPLAY
+from flashfocus.router import FlashRouter
+
+
+RULE_COUNTS = [1, 10, 100]
+
+
+def make_config(nrules: int, flash_lone_windows: str) -> dict:
+    """A config with `nrules` rules, none of which match the benchmark windows."""
+    config = dict(
+        default_opacity=1,
+        flash_opacity=0.8,
+        time=100,
+        ntimepoints=4,
+        adaptive_frames=False,
+        simple=False,
+        flash_on_focus=True,
+        flash_lone_windows=flash_lone_windows,
+        flash_fullscreen=False,
+        fast_forward_on_unfocus=False,
+    )
+    config["rules"] = [
+        {**config, "window_class": re.compile(f"^NoMatch{i}$")} for i in range(nrules)
+    ]
+    return config
+
+
+def run() -> list[dict]:
+    results = []
+    for flash_lone_windows in ["always", "never"]:
+        for nrules in RULE_COUNTS:
+            DISPLAY.reset()
+            windows = [DISPLAY.create_window(window_class=f"Window{i}") for i in range(10)]
+            router = FlashRouter(make_config(nrules, flash_lone_windows), DISPLAY.scheduler)
+            # Cycle focus through the windows so that consecutive events are never for the same
+            # window (these are ignored by the router).
+            events = cycle([WMEvent(window, WMEventType.FOCUS_SHIFT) for window in windows])
+
+            def route() -> None:
+                router.route_request(next(events))
+                # Draw any animation frames so that flasher state doesn't build up
+                DISPLAY.scheduler.run_until_idle()
+
+            stats = timeit(route, number=1000)
+            results.append(
+                result(
+                    "router.route_request",
+                    {"rules": nrules, "flash_lone_windows": flash_lone_windows},
+                    "s/event",
+                    stats,
+                    events_per_second=1 / stats["median"],
+                )
+            )
+    return results
+
+
+if __name__ == "__main__":
+    main(run)
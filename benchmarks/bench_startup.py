@@ -0,0 +1,210 @@
+"""Daemon startup time.
+
+Each measurement starts a fresh python process, so import costs are included, except for display
+protocol detection which is timed in-process with the FLASHFOCUS_DISPLAY_PROTOCOL override removed.
+"""
+from __future__ import annotations
+
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+from collections.abc import Callable
+from pathlib import Path
+from signal import SIGINT
+from time import perf_counter
+
+from benchmarks.common import main, result, summarize, timeit
+
+
+REPEAT = 5
+
+CONFIG_RULE_COUNTS = [10, 100, 1000]
+
+READY_MESSAGE = "waiting for events"
+
+
+def time_process(args: list[str]) -> float:
+    """Time a process from launch until it exits."""
+    start = perf_counter()
+    subprocess.run(args, check=True, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    return perf_counter() - start
+
+
+def time_daemon_ready(cache_dir: str | None = None) -> float:
+    """Time the daemon from launch until it is ready to handle events.
+
+    If `cache_dir` is None, the daemon starts with an empty config cache.
+    """
+    with tempfile.TemporaryDirectory() as tmpdir:
+        env = {
+            **os.environ,
+            "XDG_CONFIG_HOME": tmpdir,
+            "XDG_RUNTIME_DIR": tmpdir,
+            "XDG_CACHE_HOME": cache_dir or tmpdir,
+        }
+        start = perf_counter()
+        daemon = subprocess.Popen(
+            [sys.executable, "-m", "flashfocus.cli", "--verbosity", "INFO"],
+            env=env,
+            stderr=subprocess.PIPE,
+            text=True,
+        )
+        assert daemon.stderr is not None
+        for line in daemon.stderr:
+            if READY_MESSAGE in line:
+                break
+        else:
+            raise RuntimeError("flashfocus exited before it was ready")
+        elapsed = perf_counter() - start
+        daemon.send_signal(SIGINT)
+        daemon.communicate()
+    return elapsed
+
+
+def detection_results() -> list[dict]:
+    """Time display protocol detection, compared to the previous pidof based detection."""
+    from flashfocus.compat import detect_display_protocol
+    from flashfocus.util import find_process
+
+    results = []
+    # Detection is cheap when the session's environment identifies the display server, and falls
+    # back to scanning the process table otherwise
+    session_variables = ["SWAYSOCK", "I3SOCK", "WAYLAND_DISPLAY", "DISPLAY"]
+    saved = {name: os.environ.pop(name) for name in session_variables if name in os.environ}
+    try:
+        for environment in [
+            {},
+            {"SWAYSOCK": "/run/sway.sock"},
+            {"DISPLAY": ":0", "I3SOCK": "/run/i3.sock"},
+        ]:
+            for name in session_variables:
+                os.environ.pop(name, None)
+            os.environ.update(environment)
+            results.append(
+                result(
+                    "startup.detect_display_protocol",
+                    {"environment": ",".join(environment) or "none"},
+                    "s/call",
+                    timeit(detect_display_protocol, number=10),
+                )
+            )
+    finally:
+        for name in session_variables:
+            os.environ.pop(name, None)
+        os.environ.update(saved)
+    results.append(
+        result(
+            "startup.find_process",
+            {"method": "proc"},
+            "s/call",
+            timeit(lambda: find_process("sway"), number=10),
+        )
+    )
+    if shutil.which("pidof"):
+        results.append(
+            result(
+                "startup.find_process",
+                {"method": "pidof"},
+                "s/call",
+                timeit(lambda: subprocess.run(["pidof", "sway"], capture_output=True), number=10),
+            )
+        )
+    return results
+
+
+def write_config(path: Path, nrules: int) -> None:
+    lines = ["default-opacity: 1", "flash-opacity: 0.8", "rules:"]
+    for i in range(nrules):
+        lines += [f"  - window-class: ^app_{i}$", f"    default-opacity: {0.5 + (i % 5) / 10}"]
+    path.write_text("\n".join(lines) + "\n")
+
+
+def config_results() -> list[dict]:
+    """Time loading configs with many rules, with and without the config cache.
+
+    YAML parsing is timed separately with each available loader. The loader used by flashfocus is
+    reported in the params of the load_config results.
+    """
+    import yaml
+
+    from flashfocus import config
+    from flashfocus.config import CLI_ONLY_OPTS, load_merged_config
+    from flashfocus.config_cache import load_cached_config
+
+    loaders = {"SafeLoader": yaml.SafeLoader}
+    if yaml.__with_libyaml__:
+        loaders["CSafeLoader"] = yaml.CSafeLoader
+    results = []
+    with tempfile.TemporaryDirectory() as tmpdir:
+        os.environ["XDG_CACHE_HOME"] = tmpdir
+        for nrules in CONFIG_RULE_COUNTS:
+            config_file = Path(tmpdir) / f"flashfocus_{nrules}.yml"
+            write_config(config_file, nrules)
+            cli_options = {option: None for option in CLI_ONLY_OPTS}
+            for loader_name, loader in loaders.items():
+                results.append(
+                    result(
+                        "startup.parse_config",
+                        {"rules": nrules, "loader": loader_name},
+                        "s/call",
+                        timeit(lambda: yaml.load(config_file.read_text(), Loader=loader), number=5),
+                    )
+                )
+            params = {"rules": nrules, "loader": config.YAMLLoader.__name__}
+            results.append(
+                result(
+                    "startup.load_config",
+                    params,
+                    "s/call",
+                    timeit(lambda: load_merged_config(config_file, dict(cli_options)), number=5),
+                )
+            )
+            load_cached_config(config_file, cli_options)
+            results.append(
+                result(
+                    "startup.load_cached_config",
+                    params,
+                    "s/call",
+                    timeit(lambda: load_cached_config(config_file, cli_options), number=5),
+                )
+            )
+    return results
+
+
+def repeat(function: Callable[[], float]) -> dict:
+    return summarize([function() for _ in range(REPEAT)])
+
+
+def run() -> list[dict]:
+    python = sys.executable
+    warm_cache_dir = tempfile.mkdtemp()
+    try:
+        # Populate the cache before timing
+        time_daemon_ready(warm_cache_dir)
+        warm_daemon_ready = repeat(lambda: time_daemon_ready(warm_cache_dir))
+    finally:
+        shutil.rmtree(warm_cache_dir)
+    return [
+        result(
+            "startup.import_cli",
+            {},
+            "s",
+            repeat(lambda: time_process([python, "-c", "import flashfocus.cli"])),
+        ),
+        result(
+            "startup.help",
+            {},
+            "s",
+            repeat(lambda: time_process([python, "-m", "flashfocus.cli", "--help"])),
+        ),
+        result("startup.daemon_ready", {"config_cache": "cold"}, "s", repeat(time_daemon_ready)),
+        result("startup.daemon_ready", {"config_cache": "warm"}, "s", warm_daemon_ready),
+        *detection_results(),
+        *config_results(),
+    ]
+
+
+if __name__ == "__main__":
+    main(run)
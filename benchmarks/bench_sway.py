@@ -0,0 +1,109 @@
+"""Cost of sway IPC calls made by the sway backend.
+
+Runs against the compositor listening on $SWAYSOCK if it is set. Otherwise a stub compositor
+(tests.sway_stub) is started, which allows the backend's overhead to be measured across a range of
+tree sizes, along with the latency from a focus event to the resulting opacity command.
+"""
+from __future__ import annotations
+
+import os
+import tempfile
+from pathlib import Path
+from threading import Thread
+from time import monotonic, sleep
+
+from benchmarks.common import main, result, summarize, timeit
+from tests.sway_stub import StubSway
+
+# Number of windows in the stub compositor's tree, spread evenly over NWORKSPACES workspaces
+WINDOW_COUNTS = [10, 100, 1000]
+NWORKSPACES = 4
+NFOCUS_EVENTS = 100
+
+CONFIG = dict(
+    default_opacity=1,
+    flash_opacity=0.8,
+    time=1,
+    ntimepoints=1,
+    adaptive_frames=False,
+    simple=True,
+    rules=None,
+    flash_on_focus=True,
+    flash_lone_windows="always",
+    flash_fullscreen=True,
+    fast_forward_on_unfocus=False,
+)
+
+
+def backend_results(params: dict) -> list[dict]:
+    from flashfocus.compat import get_focused_window, get_workspace, list_mapped_windows
+
+    window = get_focused_window()
+    return [
+        result("sway.get_focused_window", params, "s/call", timeit(get_focused_window)),
+        result("sway.list_mapped_windows", params, "s/call", timeit(list_mapped_windows)),
+        result("sway.get_workspace", params, "s/call", timeit(lambda: get_workspace(window))),
+        result("sway.set_opacity", params, "s/call", timeit(lambda: window.set_opacity(1))),
+    ]
+
+
+def focus_latency(stub: StubSway, event_loop: str) -> dict:
+    """Time from the stub emitting a focus event to it receiving the first opacity command."""
+    from flashfocus.event_loop import EventLoop
+    from flashfocus.server import FlashServer
+
+    stub.populate({1: 2})
+    server = FlashServer(CONFIG, loop=EventLoop() if event_loop == "selector" else None)
+    server_thread = Thread(target=server.event_loop)
+    server_thread.start()
+    while not server.ready:
+        sleep(0.01)
+    stub.wait_for_subscriber("window")
+
+    latencies = []
+    flasher = server.router.flashers[-1]
+    try:
+        for i in range(NFOCUS_EVENTS):
+            ncommands = len(stub.commands)
+            start = monotonic()
+            stub.focus(stub.window_ids[i % 2])
+            while len(stub.commands) == ncommands:
+                sleep(0.0001)
+            latencies.append(stub.commands[ncommands][0] - start)
+            # Wait for the flash to finish so that the next event isn't merged into it
+            while flasher.progress:
+                sleep(0.001)
+    finally:
+        server.shutdown(disconnect_from_wm=False)
+        server_thread.join()
+    return result(
+        "sway.focus_to_command_latency",
+        {"compositor": "stub", "event_loop": event_loop},
+        "s",
+        summarize(latencies),
+    )
+
+
+def run() -> list[dict]:
+    if os.environ.get("SWAYSOCK"):
+        return backend_results({"compositor": "sway"})
+
+    with tempfile.TemporaryDirectory() as tmpdir:
+        socket_path = Path(tmpdir) / "sway.sock"
+        with StubSway(socket_path) as stub:
+            # The backend connects to sway when it's first imported
+            os.environ.pop("I3SOCK", None)
+            os.environ["SWAYSOCK"] = str(socket_path)
+            results = []
+            for nwindows in WINDOW_COUNTS:
+                stub.populate(
+                    {workspace: nwindows // NWORKSPACES for workspace in range(1, NWORKSPACES + 1)}
+                )
+                results += backend_results({"compositor": "stub", "windows": nwindows})
+            for event_loop in ["threads", "selector"]:
+                results.append(focus_latency(stub, event_loop))
+    return results
+
+
+if __name__ == "__main__":
+    main(run)
@@ -0,0 +1,109 @@
+"""Cost of X11 window/workspace queries with varying numbers of windows.
+
+Runs against the X server in $DISPLAY. If DISPLAY isn't set, a temporary Xvfb server is started
+(if Xvfb is installed). No window manager is required: the benchmark maintains the EWMH client list
+and window desktops itself.
+"""
+from __future__ import annotations
+
+import os
+import shutil
+import subprocess
+from collections.abc import Generator
+from contextlib import contextmanager
+from time import sleep
+
+from benchmarks.common import SkipBenchmark, main, result, timeit
+
+
+WINDOW_COUNTS = [10, 50, 100, 500]
+NWORKSPACES = 4
+XVFB_DISPLAY = ":99"
+
+
+@contextmanager
+def x_server() -> Generator[None, None, None]:
+    """Ensure that an X server is available, starting Xvfb if necessary."""
+    if os.environ.get("DISPLAY"):
+        yield
+        return
+    if shutil.which("Xvfb") is None:
+        raise SkipBenchmark("DISPLAY is not set and Xvfb is not installed")
+    xvfb = subprocess.Popen(
+        ["Xvfb", XVFB_DISPLAY, "-screen", "0", "1280x1024x24"],
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL,
+    )
+    os.environ["DISPLAY"] = XVFB_DISPLAY
+    try:
+        sleep(1)
+        yield
+    finally:
+        xvfb.terminate()
+        xvfb.wait()
+
+
+def run() -> list[dict]:
+    with x_server():
+        # xpybutil connects to the X server at import, so this must happen after the server starts
+        import xcffib.xproto
+        import xpybutil
+        from xpybutil.ewmh import set_client_list_checked, set_wm_desktop_checked
+
+        if xpybutil.conn is None:
+            raise SkipBenchmark("Could not connect to the X server")
+
+        from flashfocus.compat import Window, get_workspace, list_mapped_windows
+
+        setup = xpybutil.conn.get_setup()
+        screen = setup.roots[0]
+        results = []
+        windows: list[Window] = []
+        for nwindows in WINDOW_COUNTS:
+            while len(windows) < nwindows:
+                window = Window(xpybutil.conn.generate_id())
+                xpybutil.conn.core.CreateWindow(
+                    screen.root_depth,
+                    window.id,
+                    screen.root,
+                    0,
+                    0,
+                    10,
+                    10,
+                    0,
+                    xcffib.xproto.WindowClass.InputOutput,
+                    screen.root_visual,
+                    0,
+                    [],
+                )
+                xpybutil.conn.core.MapWindow(window.id)
+                set_wm_desktop_checked(window.id, len(windows) % NWORKSPACES).check()
+                window.set_class(f"window{len(windows)}", f"Window{len(windows)}")
+                windows.append(window)
+            set_client_list_checked([window.id for window in windows]).check()
+            assert len(list_mapped_windows()) == nwindows
+
+            params = {"windows": nwindows, "workspaces": NWORKSPACES}
+            results += [
+                result("x11.list_mapped_windows", params, "s/call", timeit(list_mapped_windows)),
+                result(
+                    "x11.list_mapped_windows(workspace)",
+                    params,
+                    "s/call",
+                    timeit(lambda: list_mapped_windows(0), number=10),
+                ),
+                result(
+                    "x11.get_workspace",
+                    params,
+                    "s/call",
+                    timeit(lambda: get_workspace(windows[-1])),
+                ),
+            ]
+
+        for window in windows:
+            window.destroy()
+        return results
+
+
+if __name__ == "__main__":
+    main(run)
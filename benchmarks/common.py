@@ -0,0 +1,62 @@
+"""Helpers shared by the benchmark modules.
+
+Each benchmark module defines a `run()` function which returns a list of result dictionaries.
+Benchmark modules are run in a separate process by `benchmarks.run` so that each one can use a
+different display protocol.
+
+"""
+from __future__ import annotations
+
+import json
+import statistics
+import sys
+from collections.abc import Callable, Sequence
+from time import perf_counter
+from typing import Any
+
+
+class SkipBenchmark(Exception):
+    """The benchmark can't run in this environment (e.g no X server is available)."""
+
+
+def summarize(samples: Sequence[float]) -> dict:
+    """Summary statistics for a series of timings (in seconds)."""
+    ordered = sorted(samples)
+    return {
+        "n": len(ordered),
+        "min": ordered[0],
+        "median": statistics.median(ordered),
+        "mean": statistics.fmean(ordered),
+        "p95": ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))],
+        "max": ordered[-1],
+        "stdev": statistics.stdev(ordered) if len(ordered) > 1 else 0.0,
+    }
+
+
+def timeit(function: Callable[[], Any], number: int = 100, repeat: int = 5) -> dict:
+    """Time `function`, returning summary statistics of the seconds taken per call.
+
+    The function is called `number` times in each of `repeat` batches. The per-call time of each
+    batch is treated as a single sample.
+    """
+    samples = []
+    for _ in range(repeat):
+        start = perf_counter()
+        for _ in range(number):
+            function()
+        samples.append((perf_counter() - start) / number)
+    return summarize(samples)
+
+
+def result(name: str, params: dict, unit: str, stats: dict, **extra: Any) -> dict:
+    """Construct a single benchmark result."""
+    return {"name": name, "params": params, "unit": unit, "stats": stats, **extra}
+
+
+def main(run: Callable[[], list[dict]]) -> None:
+    """Entrypoint for benchmark modules: run the benchmarks and print the results as JSON."""
+    try:
+        output: dict = {"results": run()}
+    except SkipBenchmark as skip:
+        output = {"skipped": str(skip)}
+    json.dump(output, sys.stdout)
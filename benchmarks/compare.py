@@ -0,0 +1,42 @@
+"""Compare two sets of benchmark results.
+
+Usage: python -m benchmarks.compare BASELINE.json CONTENDER.json
+
+For each benchmark present in both files, prints the median of each and the ratio of
+contender / baseline. Ratios greater than 1 mean the contender is slower.
+"""
+from __future__ import annotations
+
+import json
+from pathlib import Path
+
+import click
+
+
+def load_medians(path: str) -> dict[tuple[str, str], tuple[float, str]]:
+    """Load the median of each benchmark result, keyed by (name, params)."""
+    results = json.loads(Path(path).read_text())
+    medians = {}
+    for outcome in results["benchmarks"].values():
+        for result in outcome.get("results", []):
+            key = (result["name"], json.dumps(result["params"], sort_keys=True))
+            medians[key] = (result["stats"]["median"], result["unit"])
+    return medians
+
+
+@click.command()
+@click.argument("baseline", type=click.Path(exists=True, dir_okay=False))
+@click.argument("contender", type=click.Path(exists=True, dir_okay=False))
+def cli(baseline: str, contender: str) -> None:
+    """Compare benchmark results from two commits."""
+    baseline_medians = load_medians(baseline)
+    contender_medians = load_medians(contender)
+    for key in sorted(baseline_medians.keys() & contender_medians.keys()):
+        (old, unit), (new, _) = baseline_medians[key], contender_medians[key]
+        ratio = new / old if old else float("inf")
+        name, params = key
+        click.echo(f"{name} {params}: {old:.3g} -> {new:.3g} {unit} ({ratio:.2f}x)")
+
+
+if __name__ == "__main__":
+    cli()
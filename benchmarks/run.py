@@ -0,0 +1,110 @@
+"""Run the flashfocus benchmark suite and write the results as JSON.
+
+Usage: python -m benchmarks.run [--output results.json] [BENCHMARK...]
+
+Each benchmark module is run in a separate process against the display protocol it requires. The
+output contains the commit that was benchmarked so that results can be compared between commits
+with `python -m benchmarks.compare`.
+"""
+from __future__ import annotations
+
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+from datetime import datetime, timezone
+from pathlib import Path
+
+import click
+
+from flashfocus import __version__
+
+# Benchmark modules and the display protocol which each is run against. A process only ever loads
+# one display backend (the first time a backend function is used through flashfocus.compat), so
+# each benchmark is run in its own process with its display protocol set.
+BENCHMARKS = {
+    "router": "fake",
+    "flasher": "fake",
+    "x11": "x11",
+    "sway": "sway",
+    "client": "fake",
+    "startup": "fake",
+}
+
+
+def git_commit() -> str | None:
+    try:
+        return subprocess.check_output(
+            ["git", "rev-parse", "HEAD"], text=True, stderr=subprocess.DEVNULL
+        ).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run_benchmark(name: str) -> dict:
+    """Run a single benchmark module in a subprocess."""
+    module = f"benchmarks.bench_{name}"
+    with tempfile.TemporaryDirectory() as runtime_dir:
+        # Use a private runtime dir so that the benchmarks don't interfere with a running daemon
+        env = {
+            **os.environ,
+            "FLASHFOCUS_DISPLAY_PROTOCOL": BENCHMARKS[name],
+            "XDG_RUNTIME_DIR": runtime_dir,
+        }
+        process = subprocess.run(
+            [sys.executable, "-m", module],
+            env=env,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.PIPE,
+            text=True,
+        )
+    if process.returncode != 0:
+        return {"error": process.stderr.strip().splitlines()[-1:]}
+    output: dict = json.loads(process.stdout)
+    return output
+
+
+@click.command()
+@click.option(
+    "--output",
+    "-o",
+    type=click.Path(dir_okay=False, writable=True),
+    default="benchmark_results.json",
+    help="Write results to this file.",
+)
+@click.argument("benchmarks", nargs=-1, type=click.Choice(list(BENCHMARKS)))
+def cli(output: str, benchmarks: tuple[str, ...]) -> None:
+    """Run the benchmark suite (or the given BENCHMARKS)."""
+    results = {
+        "metadata": {
+            "commit": git_commit(),
+            "version": __version__,
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "date": datetime.now(timezone.utc).isoformat(),
+        },
+        "benchmarks": {},
+    }
+    for name in benchmarks or BENCHMARKS:
+        click.echo(f"Running {name} benchmarks...", err=True)
+        outcome = run_benchmark(name)
+        results["benchmarks"][name] = outcome
+        if "skipped" in outcome:
+            click.echo(f"  skipped: {outcome['skipped']}", err=True)
+        elif "error" in outcome:
+            click.echo(f"  failed: {outcome['error']}", err=True)
+        else:
+            for result in outcome["results"]:
+                click.echo(
+                    f"  {result['name']} {result['params']}: "
+                    f"median {result['stats']['median']:.3g} {result['unit']}",
+                    err=True,
+                )
+    Path(output).write_text(json.dumps(results, indent=2))
+    click.echo(f"Results written to {output}", err=True)
+
+
+if __name__ == "__main__":
+    cli()
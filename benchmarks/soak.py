@@ -0,0 +1,236 @@
+"""Soak test which checks that a long-running daemon's resource usage stays bounded.
+
+Usage: python -m benchmarks.soak [--events 1000000] [--windows 50] [--samples 50]
+
+A `FlashServer` runs against the fake display protocol while a random mix of synthetic events (focus
+shifts, new and closed windows, workspace switches, client requests and config reloads) is injected.
+Some opacity writes fail, to check that errors don't skip any cleanup.
+
+Resource usage (RSS, thread count, queue depth, the number of live objects and the sizes of the
+server's internal containers) is sampled at regular intervals. After a warmup period, each sample
+must stay within a tolerance of the largest value seen in the first half of the run. Once the events
+stop and the server has handled them, no flashes may be left in progress.
+
+The samples are written as JSON, and the exit status is 1 if any growth was detected.
+"""
+from __future__ import annotations
+
+import gc
+import json
+import logging
+import os
+import random
+import resource
+import tempfile
+import threading
+from collections.abc import Callable
+from pathlib import Path
+from time import monotonic, sleep
+
+import click
+
+from flashfocus.client import client_request_flash
+from flashfocus.display_protocols.fake import DISPLAY
+from flashfocus.errors import WMError
+from flashfocus.event_queue import PRIORITIES
+from flashfocus.scheduler import DEFAULT_SCHEDULER
+from flashfocus.server import ConfigReload, FlashServer
+from flashfocus.stats import STATS
+
+CONFIG = dict(
+    default_opacity=1,
+    flash_opacity=0.8,
+    time=5,
+    ntimepoints=4,
+    adaptive_frames=False,
+    simple=False,
+    rules=None,
+    flash_on_focus=True,
+    flash_lone_windows="always",
+    flash_fullscreen=True,
+    fast_forward_on_unfocus=False,
+    event_queue_size=100,
+)
+
+NWORKSPACES = 4
+
+# Writes to windows whose id is a multiple of this fail
+FAILING_WINDOW_MODULUS = 7
+
+# Fraction of the samples which are taken before growth is checked
+WARMUP = 0.2
+
+# Allowed growth of each sampled value, as (fraction, absolute) of the largest value in the first
+# half of the run after the warmup
+TOLERANCES = {
+    "rss_kb": (0.1, 4096),
+    "threads": (0, 0),
+    "objects": (0.05, 1000),
+    "stats": (0, 0),
+}
+
+# Sampled values which fluctuate with the load, so are instead checked against a fixed bound. Each
+# bound is multiplied by the typical number of open windows, or is None if it's fixed.
+BOUNDS = {
+    "queue_depth": (CONFIG["event_queue_size"] * len(PRIORITIES), None),
+    # Each window which is flashing has a single frame scheduled. The number of windows is kept
+    # below twice the typical number.
+    "flashes_in_progress": (0, 2),
+    "scheduled_callbacks": (0, 4),
+}
+
+
+def rss_kb() -> int:
+    """The resident set size of this process in KiB."""
+    try:
+        with open("/proc/self/statm") as statm:
+            resident_pages = int(statm.read().split()[1])
+        return resident_pages * os.sysconf("SC_PAGE_SIZE") // 1024
+    except OSError:
+        # This is the peak rather than the current RSS, but growth will still show up in it
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+
+def sample(server: FlashServer, events: int) -> dict:
+    return {
+        "events": events,
+        "rss_kb": rss_kb(),
+        "threads": threading.active_count(),
+        "objects": len(gc.get_objects()),
+        "queue_depth": server.events.qsize(),
+        "flashes_in_progress": sum(len(flasher.progress) for flasher in server.router.flashers),
+        "scheduled_callbacks": DEFAULT_SCHEDULER.pending,
+        "stats": len(STATS.counters) + len(STATS.timings),
+    }
+
+
+def check_growth(samples: list[dict], nwindows: int) -> list[str]:
+    """Check that each sampled value stays within tolerance of its value early in the run."""
+    samples = samples[int(len(samples) * WARMUP) :]
+    reference, rest = samples[: len(samples) // 2], samples[len(samples) // 2 :]
+    failures = []
+
+    def check(name: str, limit: float, checked: list[dict]) -> None:
+        peak = max(checked, key=lambda s: s[name])
+        if peak[name] > limit:
+            failures.append(
+                f"{name} grew to {peak[name]} after {peak['events']} events (limit {limit:.0f})"
+            )
+
+    for name, (fraction, absolute) in TOLERANCES.items():
+        check(name, max(s[name] for s in reference) * (1 + fraction) + absolute, rest)
+    for name, (fixed, per_window) in BOUNDS.items():
+        check(name, fixed + (per_window or 0) * nwindows, samples)
+    return failures
+
+
+def inject_write_failures() -> Callable[[], None]:
+    """Make opacity writes to some windows fail. Returns a function which undoes this."""
+    set_opacity = DISPLAY.set_opacity
+
+    def failing_set_opacity(window_id: int, opacity: float) -> None:
+        if window_id % FAILING_WINDOW_MODULUS == 0:
+            raise WMError(f"Injected failure for window {window_id}")
+        set_opacity(window_id, opacity)
+
+    DISPLAY.set_opacity = failing_set_opacity  # type: ignore[method-assign]
+    return lambda: setattr(DISPLAY, "set_opacity", set_opacity)
+
+
+def inject_event(rng: random.Random, server: FlashServer, nwindows: int, events: int) -> None:
+    """Inject a random event, keeping the number of windows close to `nwindows`."""
+    if events % 100_000 == 0:
+        opacity = 0.9 if events % 200_000 else 1
+        server.events.put(ConfigReload({**CONFIG, "default_opacity": opacity}))
+        return
+    window_ids = DISPLAY.list_window_ids()
+    action = rng.random()
+    if action < 0.05 or len(window_ids) < nwindows // 2:
+        DISPLAY.create_window(
+            window_class=f"class_{rng.randrange(10)}", workspace=rng.randrange(NWORKSPACES)
+        )
+    elif action < 0.1 or len(window_ids) > nwindows * 2:
+        DISPLAY.destroy_window(rng.choice(window_ids))
+    elif action < 0.15:
+        DISPLAY.switch_workspace(rng.randrange(NWORKSPACES))
+    elif action < 0.16:
+        DISPLAY.set_fullscreen(rng.choice(window_ids), rng.random() < 0.5)
+    elif action < 0.161:
+        client_request_flash()
+    else:
+        DISPLAY.focus(rng.choice(window_ids))
+
+
+def wait_until_idle(server: FlashServer, timeout: float = 10) -> None:
+    deadline = monotonic() + timeout
+    while monotonic() < deadline:
+        flashing = any(flasher.progress for flasher in server.router.flashers)
+        if server.events.empty() and not server.processing_event and not flashing:
+            return
+        sleep(0.01)
+
+
+def soak(nevents: int, nwindows: int, nsamples: int, seed: int) -> tuple[list[dict], list[str]]:
+    rng = random.Random(seed)
+    for _ in range(nwindows):
+        DISPLAY.create_window(workspace=rng.randrange(NWORKSPACES))
+    server = FlashServer(dict(CONFIG))
+    server_thread = threading.Thread(target=server.event_loop)
+    server_thread.start()
+    while not server.ready:
+        sleep(0.01)
+
+    restore_writes = inject_write_failures()
+    samples = []
+    interval = max(nevents // nsamples, 1)
+    try:
+        for events in range(1, nevents + 1):
+            inject_event(rng, server, nwindows, events)
+            if events % interval == 0:
+                samples.append(sample(server, events))
+        wait_until_idle(server)
+        final = sample(server, nevents)
+    finally:
+        restore_writes()
+        server.shutdown(disconnect_from_wm=False)
+        server_thread.join()
+
+    failures = check_growth(samples, nwindows)
+    if final["flashes_in_progress"]:
+        failures.append(f"{final['flashes_in_progress']} flashes were left in progress")
+    return samples, failures
+
+
+@click.command()
+@click.option("--events", "-e", default=1_000_000, help="Number of events to inject.")
+@click.option("--windows", "-w", default=50, help="Typical number of open windows.")
+@click.option("--samples", "-s", default=50, help="Number of times to sample resource usage.")
+@click.option("--seed", default=0, help="Seed for the random choice of events.")
+@click.option(
+    "--output",
+    "-o",
+    type=click.Path(dir_okay=False, writable=True),
+    default="soak_results.json",
+    help="Write the samples to this file.",
+)
+def cli(events: int, windows: int, samples: int, seed: int, output: str) -> None:
+    """Drive EVENTS synthetic events through the server and check for unbounded growth."""
+    # Failed writes are logged as errors, which would otherwise flood the output
+    logging.disable(logging.CRITICAL)
+    os.environ["FLASHFOCUS_DISPLAY_PROTOCOL"] = "fake"
+    with tempfile.TemporaryDirectory() as runtime_dir:
+        # Use a private runtime dir so that the client socket doesn't clash with a running daemon
+        os.environ["XDG_RUNTIME_DIR"] = runtime_dir
+        start = monotonic()
+        results, failures = soak(events, windows, samples, seed)
+    click.echo(f"Injected {events} events in {monotonic() - start:.1f}s", err=True)
+    Path(output).write_text(json.dumps({"samples": results, "failures": failures}, indent=2))
+    click.echo(f"Samples written to {output}", err=True)
+    for failure in failures:
+        click.echo(f"  unbounded growth: {failure}", err=True)
+    if failures:
+        raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    cli()
@@ -3,30 +3,34 @@
 from __future__ import annotations
 
 import logging
+import os
 import sys
 from pathlib import Path
+from signal import SIGHUP, signal
 
 import click
 
-from flashfocus.config import init_user_configfile, load_merged_config
+from flashfocus import __version__
 from flashfocus.errors import ConfigInitError, ConfigLoadError, UnsupportedWM
 from flashfocus.logging import setup_logging
-from flashfocus.pid import ensure_single_instance
-from flashfocus.server import FlashServer
+from flashfocus.trace import DEFAULT_BUFFER_SIZE
 
 # Basic logging init - we'll change the log level later
 logging.basicConfig(level="WARNING", format="%(levelname)s: %(message)s")
 
 
 def check_for_supported_wm() -> None:
+    from flashfocus import compat
+
     try:
-        import flashfocus.compat  # noqa F401
+        compat.load_backend()
     except UnsupportedWM as error:
         logging.error(str(error))
         sys.exit("Unrecoverable error, exiting...")
 
 
 @click.command()
+@click.version_option(__version__, prog_name="flashfocus")
 @click.option("--config", "-c", required=False, default=None, help="Config file location")
 @click.option(
     "--flash-opacity",
@@ -65,6 +69,14 @@ def check_for_supported_wm() -> None:
     "increased X server requests. Ignored if --simple is set. "
     "(default: 10)",
 )
+@click.option(
+    "--adaptive-frames/--no-adaptive-frames",
+    required=False,
+    is_flag=True,
+    default=None,
+    help="If True, fewer frames are drawn while the display server can't keep up. Off if "
+    "--ntimepoints is set without this option. (default: True)",
+)
 @click.option(
     "--flash-on-focus/--no-flash-on-focus",
     required=False,
@@ -82,6 +94,14 @@ def check_for_supported_wm() -> None:
     default=None,
     help="If True, fullscreen windows are flashed (default: True).",
 )
+@click.option(
+    "--fast-forward-on-unfocus/--no-fast-forward-on-unfocus",
+    required=False,
+    is_flag=True,
+    default=None,
+    help="If True, a window which loses focus while it is flashing is restored to its default "
+    "opacity on the next frame, rather than finishing the flash. (default: false)",
+)
 @click.option(
     "--flash-lone-windows",
     "-l",
@@ -98,6 +118,54 @@ def check_for_supported_wm() -> None:
     type=click.Choice(["INFO", "WARNING", "DEBUG", "ERROR"]),
     help="Set the logging verbosity.",
 )
+@click.option(
+    "--trace",
+    required=False,
+    default=None,
+    type=click.Path(dir_okay=False, writable=True),
+    help="Record timestamps of each event as it passes through flashfocus. The trace is written "
+    "to this file in Chrome trace-event format whenever flashfocus receives a SIGUSR1.",
+)
+@click.option(
+    "--trace-size",
+    required=False,
+    default=DEFAULT_BUFFER_SIZE,
+    type=click.IntRange(min=1),
+    help=f"Maximum number of trace events to keep in memory. (default: {DEFAULT_BUFFER_SIZE})",
+)
+@click.option(
+    "--profile",
+    required=False,
+    default=None,
+    type=click.Path(dir_okay=False, writable=True),
+    help="Profile all flashfocus threads and write the profile (in pstats format) to this file on "
+    "shutdown or whenever flashfocus receives a SIGUSR2.",
+)
+@click.option(
+    "--profile-duration",
+    required=False,
+    default=None,
+    type=click.FloatRange(min=0, min_open=True),
+    help="Stop profiling and write the profile after this many seconds. Ignored unless --profile "
+    "is set.",
+)
+@click.option(
+    "--record",
+    required=False,
+    default=None,
+    type=click.Path(dir_okay=False, writable=True),
+    help="Record every window manager event to this file. Recordings can be replayed with "
+    "flashfocus-replay.",
+)
+@click.option(
+    "--event-loop",
+    required=False,
+    default="threads",
+    type=click.Choice(["threads", "selector"]),
+    help="How events are handled. 'threads' handles each source of events in a separate thread. "
+    "'selector' handles all events and animations in a single thread, which avoids waking up "
+    "periodically while idle. (default: threads)",
+)
 def cli(*args, **kwargs) -> None:  # type: ignore[no-untyped-def]
     """Simple focus animations for tiling window managers."""
     init_server(kwargs)
@@ -105,9 +173,27 @@ def cli(*args, **kwargs) -> None:  # type: ignore[no-untyped-def]
 
 def init_server(cli_options: dict) -> None:
     """Initialize the flashfocus server with given command line options."""
+    # These imports are deferred so that e.g `flashfocus --help` doesn't need to load them
+    from flashfocus.config import init_user_configfile
+    from flashfocus.config_cache import load_cached_config
+    from flashfocus.event_loop import EventLoop
+    from flashfocus.pid import ensure_single_instance
+    from flashfocus.profiling import start_profiling
+    from flashfocus.recording import EventRecorder
+    from flashfocus.server import FlashServer
+    from flashfocus.trace import enable_tracing
+
     setup_logging(cli_options["verbosity"])
     check_for_supported_wm()
     ensure_single_instance()
+    if cli_options["trace"] is not None:
+        enable_tracing(Path(cli_options["trace"]), cli_options["trace_size"])
+    profiler = None
+    if cli_options["profile"] is not None:
+        profiler = start_profiling(Path(cli_options["profile"]), cli_options["profile_duration"])
+    recorder = None
+    if cli_options["record"] is not None:
+        recorder = EventRecorder(Path(cli_options["record"]))
 
     config_file_path = cli_options["config"]
     if config_file_path is None:
@@ -117,12 +203,23 @@ def init_server(cli_options: dict) -> None:
             if str(error):
                 logging.error(str(error))
             sys.exit("Could not load config file, exiting...")
-    config = load_merged_config(config_file_path=Path(config_file_path), cli_options=cli_options)
+    config = load_cached_config(config_file_path=Path(config_file_path), cli_options=cli_options)
     logging.info(f"Initializing with parameters:\n{config}")
-    server = FlashServer(config)
-    # The return statement is a hack for testing purposes. It allows us to mock the return of
-    # the function.
-    return server.event_loop()
+    server = FlashServer(
+        config,
+        recorder=recorder,
+        config_loader=lambda: load_cached_config(Path(config_file_path), cli_options),
+        loop=EventLoop() if cli_options["event_loop"] == "selector" else None,
+    )
+    signal(SIGHUP, lambda signum, frame: server.request_reload())
+    logging.info(f"Send SIGHUP to pid {os.getpid()} to reload the config")
+    try:
+        # The return statement is a hack for testing purposes. It allows us to mock the return of
+        # the function.
+        return server.event_loop()
+    finally:
+        if profiler is not None:
+            profiler.stop()
 
 
 if __name__ == "__main__":
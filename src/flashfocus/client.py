@@ -1,13 +1,19 @@
 """Communicating with the flashfocus server via unix socket."""
+from __future__ import annotations
+
 import logging
 import socket
 from queue import Queue
+from typing import TYPE_CHECKING
 
-from flashfocus.compat import get_focused_window
+from flashfocus import compat
 from flashfocus.display import WMEventType
 from flashfocus.producer import ProducerThread
 from flashfocus.sockets import init_client_socket, init_server_socket
 
+if TYPE_CHECKING:
+    from flashfocus.event_loop import DispatchQueue
+
 
 def client_request_flash() -> None:
     """Request that the server flashes the current window."""
@@ -21,7 +27,7 @@ def client_request_flash() -> None:
 class ClientMonitor(ProducerThread):
     """Queue flash requests from clients."""
 
-    def __init__(self, queue: Queue) -> None:
+    def __init__(self, queue: Queue | DispatchQueue) -> None:
         super().__init__(queue)
         self.sock = init_server_socket()
         self.ready = True
@@ -33,14 +39,37 @@ class ClientMonitor(ProducerThread):
                 self.sock.recv(1)
             except socket.timeout:
                 continue
-            logging.debug("Received a flash request from client...")
-            focused = get_focused_window()
-            if focused is not None:
-                self.queue_window(focused, WMEventType.CLIENT_REQUEST)
-            else:
-                logging.debug("Focused window is undefined, ignoring request...")
+            self._handle_request()
 
     def stop(self) -> None:
         super().stop()
         logging.debug("Disconnecting socket...")
         self.sock.close()
+
+    def setup(self) -> None:
+        self.sock.setblocking(False)
+        super().setup()
+
+    def fileno(self) -> int:
+        return self.sock.fileno()
+
+    def handle_events(self) -> None:
+        while True:
+            try:
+                self.sock.recv(1)
+            except BlockingIOError:
+                return
+            self._handle_request()
+
+    def teardown(self) -> None:
+        super().teardown()
+        logging.debug("Disconnecting socket...")
+        self.sock.close()
+
+    def _handle_request(self) -> None:
+        logging.debug("Received a flash request from client...")
+        focused = compat.get_focused_window()
+        if focused is not None:
+            self.queue_window(focused, WMEventType.CLIENT_REQUEST)
+        else:
+            logging.debug("Focused window is undefined, ignoring request...")
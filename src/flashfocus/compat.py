@@ -1,53 +1,122 @@
-"""Compatibility module for abstracting across display protocols."""
+"""Compatibility module for abstracting across display protocols.
+
+Each display backend in flashfocus.display_protocols provides the names in `BACKEND_ATTRIBUTES`.
+Accessing one of these names through this module (e.g `compat.list_mapped_windows`) loads the
+backend for the user's display protocol. Importing this module is cheap and doesn't connect to the
+display, so other modules should look up backend names at call time rather than at import time.
+
+"""
+import functools
+import importlib
 import logging
 import os
 from enum import Enum, auto
+from types import ModuleType
+from typing import TYPE_CHECKING, Any
 
 from flashfocus.errors import UnsupportedWM
 from flashfocus.util import find_process
 
+if TYPE_CHECKING:
+    from flashfocus.display_protocols.sway import (  # noqa: F401
+        DisplayHandler,
+        Window,
+        disconnect_display_conn,
+        get_focused_window,
+        get_focused_workspace,
+        get_workspace,
+        list_mapped_windows,
+        restore_full_opacity,
+    )
+
+# Setting this environment variable to the name of a display protocol (e.g "fake") skips detection
+DISPLAY_PROTOCOL_ENV_VAR = "FLASHFOCUS_DISPLAY_PROTOCOL"
+
 
 class DisplayProtocol(Enum):
     SWAY = auto()
     WAYLAND = auto()
     X11 = auto()
+    FAKE = auto()
 
 
-def get_display_protocol() -> DisplayProtocol:
+BACKEND_MODULES = {
+    DisplayProtocol.SWAY: "flashfocus.display_protocols.sway",
+    DisplayProtocol.X11: "flashfocus.display_protocols.x11",
+    DisplayProtocol.FAKE: "flashfocus.display_protocols.fake",
+}
+
+BACKEND_ATTRIBUTES = {
+    "DisplayHandler",
+    "Window",
+    "disconnect_display_conn",
+    "get_focused_window",
+    "get_focused_workspace",
+    "get_workspace",
+    "list_mapped_windows",
+    "restore_full_opacity",
+}
+
+
+def detect_display_protocol() -> DisplayProtocol:
+    """Detect the display protocol from the environment of the user's session.
+
+    The environment variables exported by the display server are checked first. Only if they are
+    inconclusive is the process table scanned for a running sway instance.
+    """
+    if os.environ.get("SWAYSOCK"):
+        return DisplayProtocol.SWAY
+    if os.environ.get("WAYLAND_DISPLAY"):
+        # Sway also sets I3SOCK, whereas i3 itself runs under X11
+        if os.environ.get("I3SOCK") or find_process("sway"):
+            return DisplayProtocol.SWAY
+        return DisplayProtocol.WAYLAND
+    if os.environ.get("DISPLAY") and os.environ.get("I3SOCK"):
+        # i3 under X11, since sway would have set SWAYSOCK too
+        return DisplayProtocol.X11
+    # DISPLAY alone is inconclusive, since it's also set for XWayland clients and the environment
+    # may be incomplete (e.g when only DISPLAY is imported into a service manager). A running sway
+    # takes precedence, as it always has.
     if find_process("sway"):
-        protocol = DisplayProtocol.SWAY
-    elif os.environ.get("WAYLAND_DISPLAY"):
-        protocol = DisplayProtocol.WAYLAND
-    else:
-        protocol = DisplayProtocol.X11
-    return protocol
+        return DisplayProtocol.SWAY
+    return DisplayProtocol.X11
 
 
-_display_protocol = get_display_protocol()
+@functools.cache
+def _detected_display_protocol() -> DisplayProtocol:
+    # The display protocol can't change during the lifetime of the process, so only detect it once
+    return detect_display_protocol()
 
-# pylint: disable=unused-import
-if _display_protocol is DisplayProtocol.SWAY:
-    logging.info("Detected display protocol: wayland - sway")
-    from flashfocus.display_protocols.sway import (  # noqa: F401
-        DisplayHandler,
-        Window,
-        disconnect_display_conn,
-        get_focused_window,
-        get_focused_workspace,
-        get_workspace,
-        list_mapped_windows,
-    )
-elif _display_protocol is DisplayProtocol.WAYLAND:
-    logging.info("Detected display protocol: wayland - other")
-    raise UnsupportedWM("This window manager is not supported yet.")
-else:
-    logging.info("Detected display protocol: X11")
-    from flashfocus.display_protocols.x11 import (  # type: ignore # noqa: F401
-        DisplayHandler,
-        Window,
-        disconnect_display_conn,
-        get_focused_window,
-        get_focused_workspace,
-        get_workspace,
-        list_mapped_windows,
-    )
+
+def get_display_protocol() -> DisplayProtocol:
+    override = os.environ.get(DISPLAY_PROTOCOL_ENV_VAR)
+    if override:
+        try:
+            return DisplayProtocol[override.upper()]
+        except KeyError:
+            raise UnsupportedWM(f"Unknown display protocol: {override}")
+    return _detected_display_protocol()
+
+
+def load_backend() -> ModuleType:
+    """Import the display backend for the current display protocol.
+
+    Importing a backend connects to the display server, so this is deferred until the first time
+    one of the backend's functions/classes is accessed through this module.
+    """
+    display_protocol = get_display_protocol()
+    if display_protocol is DisplayProtocol.WAYLAND:
+        logging.info("Detected display protocol: wayland - other")
+        raise UnsupportedWM("This window manager is not supported yet.")
+    logging.info(f"Using display protocol: {display_protocol.name.lower()}")
+    return importlib.import_module(BACKEND_MODULES[display_protocol])
+
+
+def __getattr__(name: str) -> Any:
+    if name not in BACKEND_ATTRIBUTES:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    backend = load_backend()
+    # Cache the backend's attributes in the module so that this is only called once per attribute
+    for attribute in BACKEND_ATTRIBUTES:
+        globals()[attribute] = getattr(backend, attribute)
+    return globals()[name]
@@ -18,11 +18,16 @@ from collections.abc import Mapping
 
 import yaml
 from marshmallow import Schema, ValidationError, fields, post_load, validates_schema
-from yaml.parser import ParserError
-from yaml.scanner import ScannerError
+
+try:
+    # The libyaml based loader is several times faster, but PyYAML may be built without it
+    from yaml import CSafeLoader as YAMLLoader
+except ImportError:
+    from yaml import SafeLoader as YAMLLoader  # type: ignore[assignment]
 
 from flashfocus.compat import DisplayProtocol, get_display_protocol
 from flashfocus.errors import ConfigInitError, ConfigLoadError
+from flashfocus.event_queue import OVERFLOW_POLICIES, PRIORITIES, event_type_name
 from flashfocus.types import Number
 from flashfocus.util import indent
 
@@ -33,8 +38,10 @@ BASE_PROPERTIES = [
     "simple",
     "flash_on_focus",
     "ntimepoints",
+    "adaptive_frames",
     "time",
     "flash_lone_windows",
+    "fast_forward_on_unfocus",
 ]
 
 FLASH_LONE_WINDOWS_OPTS = ["never", "on_open_close", "on_switch", "always"]
@@ -47,7 +54,16 @@ WAYLAND_MATCH_PROPERTIES = {"window_name", "app_id"}
 
 WINDOW_MATCH_PROPERTIES = X11_MATCH_PROPERTIES | WAYLAND_MATCH_PROPERTIES
 WINDOW_MATCH_NAMES = {x.replace("_", "-") for x in WINDOW_MATCH_PROPERTIES}
-CLI_ONLY_OPTS = ["config", "verbosity"]
+CLI_ONLY_OPTS = [
+    "config",
+    "verbosity",
+    "trace",
+    "trace_size",
+    "profile",
+    "profile_duration",
+    "record",
+    "event_loop",
+]
 
 
 def validate_positive_number(data: Number) -> None:
@@ -71,6 +87,21 @@ def validate_flash_lone_windows(data: str) -> None:
         )
 
 
+def validate_event_queue_overflow(data: dict) -> None:
+    event_types = [event_type_name(event_type) for event_type in PRIORITIES]
+    for event_type, policy in data.items():
+        if event_type not in event_types:
+            raise ValidationError(
+                f"Unknown event type '{event_type}', expected one of {', '.join(event_types)}"
+            )
+        if policy not in OVERFLOW_POLICIES:
+            raise ValidationError(
+                f"Invalid overflow policy for {event_type}, expected one of "
+                f"{', '.join(OVERFLOW_POLICIES)}",
+                policy,
+            )
+
+
 class Regex(fields.Field):
     """Schema field for validating a regex."""
 
@@ -93,9 +124,11 @@ class BaseSchema(Schema):
     simple: fields.Boolean = fields.Boolean()
     time: fields.Float = fields.Float(validate=validate_positive_number)
     ntimepoints: fields.Integer = fields.Integer(validate=validate_positive_number)
+    adaptive_frames: fields.Boolean = fields.Boolean()
     flash_on_focus: fields.Boolean = fields.Boolean()
     flash_lone_windows: fields.String = fields.String(validate=validate_flash_lone_windows)
     flash_fullscreen: fields.Boolean = fields.Boolean()
+    fast_forward_on_unfocus: fields.Boolean = fields.Boolean()
 
     @validates_schema(pass_original=True)
     def check_unknown_fields(self, data: dict, original_data: dict, **_: Any) -> None:
@@ -134,6 +167,10 @@ class ConfigSchema(BaseSchema):
     """
 
     rules: fields.Nested = fields.Nested(RulesSchema, many=True)
+    event_queue_size: fields.Integer = fields.Integer(validate=validate_positive_number)
+    event_queue_overflow: fields.Dict = fields.Dict(
+        keys=fields.String(), values=fields.String(), validate=validate_event_queue_overflow
+    )
 
     @post_load()
     def set_rule_defaults(self, config: dict, **_: Any) -> dict:
@@ -142,20 +179,31 @@ class ConfigSchema(BaseSchema):
             config["rules"] = None
         else:
             for rule in config["rules"]:
+                disable_adaptive_frames_if_fixed(rule)
                 for prop in BASE_PROPERTIES:
                     if prop not in rule:
                         rule[prop] = config[prop]
         return config
 
 
+def disable_adaptive_frames_if_fixed(options: dict) -> None:
+    """Turn off adaptive frame counts if `ntimepoints` is set without `adaptive_frames`.
+
+    Users who chose a number of frames get exactly that many, unless they also opt in to adaptive
+    frame counts.
+    """
+    if options.get("ntimepoints") is not None and options.get("adaptive_frames") is None:
+        options["adaptive_frames"] = False
+
+
 def load_config(config_file: Path) -> dict:
     """Load the config yaml file into a dictionary."""
     try:
         with config_file.open("r") as f:
-            config: dict = yaml.load(f, Loader=yaml.FullLoader)
+            config: dict = yaml.load(f, Loader=YAMLLoader)
     except FileNotFoundError:
         raise ConfigLoadError(f"Config file does not exist: {config_file}")
-    except (ScannerError, ParserError) as e:
+    except yaml.YAMLError as e:
         logging.error(str(e))
         raise ConfigLoadError(
             "Error encountered in config file. Check that your config file is formatted correctly."
@@ -349,7 +397,10 @@ def merge_config_sources(user_config: dict, default_config: dict, cli_options: d
     """Merge the user, default configs and CLI options into a single dict."""
     for opt in CLI_ONLY_OPTS:
         del cli_options[opt]
-    config = hierarchical_merge([default_config, user_config, cli_options])
+    # Only the user's own choice of frame count turns off adaptive frame counts, not the default
+    user_options = hierarchical_merge([user_config, cli_options])
+    disable_adaptive_frames_if_fixed(user_options)
+    config = hierarchical_merge([default_config, user_options])
     validated_config = validate_config(config)
     return validated_config
 
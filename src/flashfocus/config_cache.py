@@ -0,0 +1,114 @@
+"""Caching the validated config between runs.
+
+Parsing the config files and validating them with marshmallow (see flashfocus.config) accounts for a
+large part of flashfocus' startup time, particularly for configs with many rules. The validated
+config is therefore cached in the user's cache dir, along with a key describing everything that the
+config was derived from. If the key matches on the next startup, the cached config is used without
+parsing or validating anything.
+
+"""
+from __future__ import annotations
+
+import hashlib
+import logging
+import os
+import pickle
+from pathlib import Path
+
+from flashfocus import __version__
+from flashfocus.compat import get_display_protocol
+from flashfocus.config import (
+    CLI_ONLY_OPTS,
+    ConfigSchema,
+    RulesSchema,
+    get_default_config_file,
+    load_merged_config,
+)
+
+CACHE_FILE_NAME = "config.pickle"
+
+# Increment this when the layout of the cache file or of the cached config changes
+CACHE_FORMAT_VERSION = 1
+
+
+def get_cache_file() -> Path:
+    """Get the location of the config cache."""
+    xdg_cache_home = os.environ.get("XDG_CACHE_HOME")
+    cache_dir = Path(xdg_cache_home) if xdg_cache_home else Path.home() / ".cache"
+    return cache_dir / "flashfocus" / CACHE_FILE_NAME
+
+
+def build_cache_key(config_files: list[Path], cli_options: dict) -> str:
+    """Build a key which changes whenever the config derived from these sources might change.
+
+    Files are identified by their path, modification time and size, so that they don't need to be
+    read to build the key. The options known to the config schema are included too, since a config
+    cached by an older flashfocus lacks the defaults of newer options.
+    """
+    parts = [
+        str(CACHE_FORMAT_VERSION),
+        __version__,
+        get_display_protocol().name,
+        ",".join(sorted(ConfigSchema._declared_fields)),
+        ",".join(sorted(RulesSchema._declared_fields)),
+    ]
+    for config_file in config_files:
+        stat = config_file.stat()
+        parts.append(f"{config_file.resolve()}:{stat.st_mtime_ns}:{stat.st_size}")
+    parts.append(repr(sorted(cli_options.items())))
+    return hashlib.sha256("\n".join(parts).encode()).hexdigest()
+
+
+def read_cache(cache_file: Path, key: str) -> dict | None:
+    """Read the cached config if it was cached with the same key."""
+    try:
+        with cache_file.open("rb") as f:
+            cached = pickle.load(f)
+    except FileNotFoundError:
+        return None
+    except Exception as error:
+        # A corrupt cache is harmless, we'll just overwrite it
+        logging.debug(f"Failed to read config cache: {error}")
+        return None
+    if not isinstance(cached, dict) or cached.get("key") != key:
+        return None
+    config: dict = cached["config"]
+    return config
+
+
+def write_cache(cache_file: Path, key: str, config: dict) -> None:
+    try:
+        cache_file.parent.mkdir(parents=True, exist_ok=True)
+        # Write to a temporary file first so that a concurrent reader never sees a partial cache
+        tmp_file = cache_file.with_suffix(f".{os.getpid()}.tmp")
+        with tmp_file.open("wb") as f:
+            pickle.dump({"key": key, "config": config}, f)
+        tmp_file.replace(cache_file)
+    except OSError as error:
+        logging.debug(f"Failed to write config cache: {error}")
+
+
+def load_cached_config(config_file_path: Path, cli_options: dict) -> dict:
+    """Load the merged config, using the cached config if none of its sources have changed.
+
+    Unlike `flashfocus.config.load_merged_config`, `cli_options` is not modified.
+    """
+    cache_file = get_cache_file()
+    config_options = {
+        option: value for option, value in cli_options.items() if option not in CLI_ONLY_OPTS
+    }
+    try:
+        key = build_cache_key([get_default_config_file(), config_file_path], config_options)
+    except OSError:
+        # Let the config loader report the missing file
+        key = None
+    if key is not None:
+        config = read_cache(cache_file, key)
+        if config is not None:
+            logging.info(f"Loaded configuration from cache {cache_file}")
+            return config
+
+    config = load_merged_config(config_file_path=config_file_path, cli_options=dict(cli_options))
+    if key is not None:
+        write_cache(cache_file, key, config)
+    return config
@@ -2,10 +2,12 @@
 
 from __future__ import annotations
 from abc import ABC, abstractmethod
-from collections import namedtuple
+from collections import OrderedDict
+from collections.abc import Iterable, Mapping
+from dataclasses import dataclass, field
 from enum import Enum, auto
-from typing import Any
-from collections.abc import Mapping
+from threading import Lock
+from typing import Any, Generic, TypeVar
 
 from flashfocus.errors import WMError
 
@@ -17,15 +19,18 @@ class WMEventType(Enum):
     WINDOW_INIT = auto()
 
 
-WMEvent = namedtuple("WMEvent", ["window", "event_type"])
-
-
 class BaseWindow(ABC):
     """Abstract base class for a window.
 
     Contains any logic which isn't specifically tied to wayland/X11.
+
+    A window object is created for every event, and may wait in the server's queue for some time
+    during bursts of events. Subclasses should therefore define `__slots__` and hold only what is
+    needed to route the window.
     """
 
+    __slots__ = ("id",)
+
     def __init__(self, window_id: int) -> None:
         if window_id is None:
             raise WMError("Invalid window ID")
@@ -75,3 +80,134 @@ class BaseWindow(ABC):
     @abstractmethod
     def is_fullscreen(self) -> bool:
         pass
+
+    @abstractmethod
+    def refresh_interval(self) -> float | None:
+        """Seconds between refreshes of the output which shows the window (None if unknown)."""
+        pass
+
+
+@dataclass(slots=True)
+class WMEvent:
+    """An event which is queued for the server to handle.
+
+    Attributes
+    ----------
+    workspace
+        The workspace that the event happened on, as known to the display handler when it queued the
+        event (None if unknown). Events may wait in the queue and be reordered by it, so this is
+        used instead of the display server's state at the time the event is handled.
+    screen
+        On X11, the root window of the screen that the event happened on, since desktops are
+        numbered separately on each screen. None if unknown or on other display protocols.
+
+    """
+
+    window: BaseWindow
+    event_type: WMEventType
+    workspace: int | None = field(default=None, compare=False)
+    screen: int | None = field(default=None, compare=False)
+
+
+WindowT = TypeVar("WindowT", bound=BaseWindow)
+
+# Maximum number of windows kept by a WindowRegistry
+WINDOW_REGISTRY_SIZE = 1024
+
+
+class WindowRegistry(Generic[WindowT]):
+    """Interns window objects, so that each window id maps to the same object across events.
+
+    This allows window state which is expensive to fetch (e.g properties) to be cached on the window
+    object for as long as the window exists. Display backends evict windows from the registry when
+    they are closed. In case an eviction is missed, the least recently used window is evicted once
+    the registry is full.
+
+    Parameters
+    ----------
+    maxsize
+        Maximum number of windows in the registry.
+
+    """
+
+    def __init__(self, maxsize: int = WINDOW_REGISTRY_SIZE) -> None:
+        self.maxsize = maxsize
+        self._windows: OrderedDict[int, WindowT] = OrderedDict()
+        # The registry is used by both the display handler and the server
+        self._lock = Lock()
+
+    def get(self, window_id: int) -> WindowT | None:
+        """Get the registered window with this id (or None if there isn't one)."""
+        with self._lock:
+            window = self._windows.get(window_id)
+            if window is not None:
+                self._windows.move_to_end(window_id)
+            return window
+
+    def intern(self, window: WindowT) -> WindowT:
+        """Register a window, unless a window with the same id is already registered.
+
+        Returns
+        -------
+        The registered window with the same id.
+
+        """
+        with self._lock:
+            registered = self._windows.setdefault(window.id, window)
+            self._windows.move_to_end(window.id)
+            if len(self._windows) > self.maxsize:
+                self._windows.popitem(last=False)
+            return registered
+
+    def evict(self, window_id: int) -> None:
+        with self._lock:
+            self._windows.pop(window_id, None)
+
+    def retain(self, window_ids: Iterable[int]) -> None:
+        """Evict every window whose id isn't in `window_ids`."""
+        keep = set(window_ids)
+        with self._lock:
+            for window_id in [window_id for window_id in self._windows if window_id not in keep]:
+                del self._windows[window_id]
+
+    def clear(self) -> None:
+        with self._lock:
+            self._windows.clear()
+
+    def __contains__(self, window_id: int) -> bool:
+        return window_id in self._windows
+
+    def __len__(self) -> int:
+        return len(self._windows)
+
+
+class WorkspaceTracker:
+    """Keeps track of the focused workspace using the display server's events.
+
+    Querying the focused workspace costs a round trip to the display server (on sway, fetching the
+    whole layout tree). Instead, display handlers record each workspace change here as it happens,
+    and backends answer `get_focused_workspace` from the tracker while it is tracking.
+
+    Attributes
+    ----------
+    workspace
+        The focused workspace. Only up to date while `tracking` is True.
+    tracking
+        True while a display handler is recording workspace changes.
+
+    """
+
+    __slots__ = ("workspace", "tracking")
+
+    def __init__(self) -> None:
+        self.workspace: int | None = None
+        self.tracking = False
+
+    def update(self, workspace: int | None) -> None:
+        self.workspace = workspace
+        self.tracking = True
+
+    def stop(self) -> None:
+        """Stop tracking, e.g when the display handler stops listening for events."""
+        self.tracking = False
+        self.workspace = None
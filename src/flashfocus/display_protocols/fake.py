@@ -0,0 +1,330 @@
+"""In-memory display backend.
+
+All submodules in flashfocus.display_protocols are expected to contain a minimal set of
+functions/classes for abstracting across various display protocols. See list in flashfocus.compat
+
+This backend doesn't connect to a display server. Instead, windows and workspaces are simulated in
+memory and window manager events are injected by calling methods on `DISPLAY`. This makes it
+possible to test and benchmark routing/animation logic at full speed, without an X server or sway
+session. The backend is selected by setting FLASHFOCUS_DISPLAY_PROTOCOL=fake.
+
+"""
+from __future__ import annotations
+
+from dataclasses import dataclass, field
+from itertools import count
+from queue import Queue
+from threading import Event, Lock
+from collections.abc import Mapping
+from typing import TYPE_CHECKING
+
+from flashfocus.display import BaseWindow, WMEventType
+from flashfocus.errors import WMError
+from flashfocus.producer import ProducerThread
+from flashfocus.scheduler import ManualScheduler
+from flashfocus.util import match_regex
+
+if TYPE_CHECKING:
+    from flashfocus.event_loop import DispatchQueue
+
+
+@dataclass
+class WindowState:
+    """State of a simulated window.
+
+    Attributes
+    ----------
+    opacity_history
+        Every opacity change of the window as a list of (virtual time, opacity) tuples.
+
+    """
+
+    id: int
+    workspace: int
+    properties: dict
+    fullscreen: bool = False
+    opacity: float | None = None
+    opacity_history: list[tuple[float, float]] = field(default_factory=list)
+
+
+class FakeDisplay:
+    """A simulated display server with a scriptable event injector.
+
+    Methods which simulate user actions (e.g `focus`, `create_window`) emit the same events that a
+    real window manager would to any running `DisplayHandler`.
+
+    Attributes
+    ----------
+    scheduler
+        Virtual clock used to timestamp opacity changes. Passing this to `FlashServer` (or a
+        `Flasher`) allows animations to be driven by `advance`.
+    write_latency
+        Virtual time (in seconds) that each opacity change takes, to simulate a slow display server.
+    refresh_interval
+        Seconds between refreshes of the simulated output, or None if the output's refresh rate is
+        unknown.
+    windows
+        Mapping of window id to the state of each mapped window.
+    current_workspace
+        The currently focused workspace.
+    focused
+        The id of the focused window (or None if no window is focused).
+
+    """
+
+    def __init__(self) -> None:
+        self.scheduler = ManualScheduler()
+        self._lock = Lock()
+        self._ids = count(1)
+        self._handlers: list[DisplayHandler] = []
+        self.windows: dict[int, WindowState] = {}
+        # Window ids by workspace, used to avoid scanning every window when listing a workspace
+        self._workspaces: dict[int, dict[int, None]] = {}
+        self.current_workspace = 0
+        self.focused: int | None = None
+        self.write_latency = 0.0
+        self.refresh_interval: float | None = None
+
+    def reset(self) -> None:
+        """Remove all windows and return to the initial state."""
+        with self._lock:
+            self.windows.clear()
+            self._workspaces.clear()
+            self.current_workspace = 0
+            self.focused = None
+            self.write_latency = 0.0
+            self.refresh_interval = None
+            self.scheduler = ManualScheduler()
+
+    def create_window(
+        self,
+        window_class: str | None = None,
+        window_id: str | None = None,
+        app_id: str | None = None,
+        window_name: str | None = None,
+        workspace: int | None = None,
+    ) -> Window:
+        """Map a new window, by default on the current workspace."""
+        if workspace is None:
+            workspace = self.current_workspace
+        with self._lock:
+            wid = next(self._ids)
+            self.windows[wid] = WindowState(
+                id=wid,
+                workspace=workspace,
+                properties={
+                    "window_class": window_class,
+                    "window_id": window_id,
+                    "app_id": app_id,
+                    "window_name": window_name,
+                },
+            )
+            self._workspaces.setdefault(workspace, {})[wid] = None
+        window = Window(wid)
+        self._emit(window, WMEventType.NEW_WINDOW, workspace)
+        return window
+
+    def destroy_window(self, window_id: int) -> None:
+        with self._lock:
+            state = self.windows.pop(window_id, None)
+            if state is None:
+                raise WMError(f"Invalid window: {window_id}")
+            del self._workspaces[state.workspace][window_id]
+            if self.focused == window_id:
+                self.focused = None
+
+    def focus(self, window_id: int) -> None:
+        """Focus a window, switching to its workspace if necessary."""
+        with self._lock:
+            state = self._get_state(window_id)
+            self.current_workspace = state.workspace
+            self.focused = window_id
+        self._emit(Window(window_id), WMEventType.FOCUS_SHIFT, state.workspace)
+
+    def switch_workspace(self, workspace: int) -> None:
+        """Switch workspace, focusing the first window on it (if any)."""
+        with self._lock:
+            self.current_workspace = workspace
+            window_ids = list(self._workspaces.get(workspace, {}))
+            focused = self.focused = window_ids[0] if window_ids else None
+        if focused is not None:
+            self._emit(Window(focused), WMEventType.FOCUS_SHIFT, workspace)
+
+    def set_fullscreen(self, window_id: int, fullscreen: bool = True) -> None:
+        with self._lock:
+            self._get_state(window_id).fullscreen = fullscreen
+
+    def advance(self, seconds: float) -> None:
+        """Advance the virtual clock, running any animation frames which are due."""
+        self.scheduler.advance(seconds)
+
+    def opacity_history(self, window_id: int) -> list[tuple[float, float]]:
+        """Get the history of opacity changes of a window as (virtual time, opacity) tuples."""
+        with self._lock:
+            return list(self._get_state(window_id).opacity_history)
+
+    def list_window_ids(self, workspace: int | None = None) -> list[int]:
+        with self._lock:
+            if workspace is None:
+                return list(self.windows)
+            return list(self._workspaces.get(workspace, {}))
+
+    def set_opacity(self, window_id: int, opacity: float) -> None:
+        if self.write_latency:
+            self.scheduler.sleep(self.write_latency)
+        with self._lock:
+            state = self.windows.get(window_id)
+            # Mirror the X11 backend by silently ignoring writes to windows which don't exist
+            if state is not None:
+                state.opacity = opacity
+                state.opacity_history.append((self.scheduler.now(), opacity))
+
+    def get_state(self, window_id: int) -> WindowState:
+        with self._lock:
+            return self._get_state(window_id)
+
+    def add_handler(self, handler: DisplayHandler) -> None:
+        with self._lock:
+            self._handlers.append(handler)
+
+    def remove_handler(self, handler: DisplayHandler) -> None:
+        with self._lock:
+            self._handlers.remove(handler)
+
+    def _get_state(self, window_id: int) -> WindowState:
+        try:
+            return self.windows[window_id]
+        except KeyError as e:
+            raise WMError(f"Invalid window: {window_id}") from e
+
+    def _emit(self, window: Window, event_type: WMEventType, workspace: int) -> None:
+        with self._lock:
+            handlers = list(self._handlers)
+        for handler in handlers:
+            handler.queue_window(window, event_type, workspace)
+
+
+# The simulated display is shared by all classes/functions in the module.
+DISPLAY = FakeDisplay()
+
+
+class Window(BaseWindow):
+    """Represents a simulated window.
+
+    Parameters
+    ----------
+    window_id
+        The unique id of the window in the simulated display.
+
+    """
+
+    __slots__ = ()
+
+    @property
+    def properties(self) -> dict:
+        return DISPLAY.get_state(self.id).properties
+
+    def match(self, criteria: Mapping) -> bool:
+        """Determine whether the window matches a set of criteria.
+
+        Parameters
+        ----------
+        criteria
+            Dictionary of regexes of the form {PROPERTY: REGEX} e.g {"window_id": r"termite"}
+
+        """
+        for prop, value in self.properties.items():
+            if criteria.get(prop) and not match_regex(criteria[prop], value):
+                return False
+        return True
+
+    @property
+    def opacity(self) -> float | None:
+        return DISPLAY.get_state(self.id).opacity
+
+    def set_opacity(self, opacity: float | None) -> None:
+        # If opacity is None just silently ignore the request
+        if opacity is not None:
+            DISPLAY.set_opacity(self.id, opacity)
+
+    def destroy(self) -> None:
+        DISPLAY.destroy_window(self.id)
+
+    def is_fullscreen(self) -> bool:
+        return DISPLAY.get_state(self.id).fullscreen
+
+    def refresh_interval(self) -> float | None:
+        return DISPLAY.refresh_interval
+
+
+class DisplayHandler(ProducerThread):
+    """Pass events injected into the simulated display on to FlashServer."""
+
+    def __init__(self, queue: Queue | DispatchQueue) -> None:
+        super().__init__(queue)
+        self._stopped = Event()
+
+    def run(self) -> None:
+        DISPLAY.add_handler(self)
+        self.ready = True
+        # Events are queued directly by the thread which injects them, so there's nothing to do
+        # here except wait for the stop signal
+        self._stopped.wait()
+        DISPLAY.remove_handler(self)
+
+    def stop(self) -> None:
+        self.keep_going = False
+        self._stopped.set()
+        super().stop()
+
+    def setup(self) -> None:
+        # Events are passed on to the event loop by the thread which injects them
+        DISPLAY.add_handler(self)
+        super().setup()
+
+    def teardown(self) -> None:
+        DISPLAY.remove_handler(self)
+        super().teardown()
+
+
+def get_focused_window() -> Window | None:
+    if DISPLAY.focused is None:
+        return None
+    return Window(DISPLAY.focused)
+
+
+def list_mapped_windows(workspace: int | None = None, screen: int | None = None) -> list[Window]:
+    # The simulated display has a single screen
+    return [Window(wid) for wid in DISPLAY.list_window_ids(workspace)]
+
+
+def get_focused_workspace() -> int | None:
+    return DISPLAY.current_workspace
+
+
+def get_workspace(window: Window) -> int | None:
+    """Get the workspace that the window is mapped to."""
+    try:
+        return DISPLAY.get_state(window.id).workspace
+    except WMError:
+        return None
+
+
+def restore_full_opacity() -> int:
+    """Set every window which isn't fully opaque to full opacity.
+
+    Returns
+    -------
+    The number of windows whose opacity was changed.
+
+    """
+    restored = 0
+    for window_id in DISPLAY.list_window_ids():
+        if DISPLAY.get_state(window_id).opacity not in (None, 1):
+            DISPLAY.set_opacity(window_id, 1)
+            restored += 1
+    return restored
+
+
+def disconnect_display_conn() -> None:
+    pass
@@ -6,24 +6,44 @@ functions/classes for abstracting across various display protocols. See list in
 """
 from __future__ import annotations
 
+import itertools
 import logging
 from queue import Queue
 from collections.abc import Mapping
+from typing import TYPE_CHECKING
 
 import i3ipc
 
-from flashfocus.display import BaseWindow, WMEventType
+from flashfocus.display import BaseWindow, WindowRegistry, WMEventType, WorkspaceTracker
 from flashfocus.producer import ProducerThread
 from flashfocus.util import match_regex
 
-# This connection is shared by all classes/functions in the module. It is not thread-safe to
-# maintain multiple connections to sway through the same socket.
-SWAY = i3ipc.Connection()
+if TYPE_CHECKING:
+    from flashfocus.event_loop import DispatchQueue
+
+# Messages sent through an i3ipc connection are serialized, and their replies are read by the
+# sending thread. Each kind of message therefore has its own connection to sway, so that e.g
+# opacity commands from the flashers never wait behind a tree query from another thread.
+
+# Subscribes to window events (used only by DisplayHandler)
+EVENTS = i3ipc.Connection()
+# Queries the layout tree
+QUERIES = i3ipc.Connection()
+# Runs commands (e.g setting window opacity)
+COMMANDS = i3ipc.Connection()
+
+
+# Window properties in the order that they're stored in `Window`
+PROPERTY_NAMES = ("window_name", "window_class", "window_id", "app_id")
 
 
 class Window(BaseWindow):
     """Represents a sway window.
 
+    Only the container's id, properties and fullscreen state are copied from the container, so that
+    queued windows don't keep the rest of the layout tree alive. Sway doesn't report the opacity of
+    windows, so the last opacity set through the window is remembered instead.
+
     Parameters
     ----------
     container
@@ -39,19 +59,29 @@ class Window(BaseWindow):
         contain the window's ID (instance) and class.
     """
 
+    __slots__ = ("_property_values", "_fullscreen_mode", "_opacity", "_output", "_output_checked")
+
     def __init__(self, container: i3ipc.Con) -> None:
-        self._container = container
-        super().__init__(self._container.id)
-        self._properties = {
-            "window_name": self._container.name,
-            "window_class": self._container.window_class,
-            "window_id": self._container.window_instance,
-            "app_id": self._container.app_id,
-        }
+        super().__init__(container.id)
+        self._opacity: float | None = None
+        self._output: str | None = None
+        # The value of `_layout_changes` when the window's output was fetched
+        self._output_checked: int | None = None
+        self.update(container)
+
+    def update(self, container: i3ipc.Con) -> None:
+        """Update the window's state from a more recent copy of its container."""
+        self._property_values = (
+            container.name,
+            container.window_class,
+            container.window_instance,
+            container.app_id,
+        )
+        self._fullscreen_mode: int = container.fullscreen_mode
 
     @property
     def properties(self) -> dict:
-        return self._properties
+        return dict(zip(PROPERTY_NAMES, self._property_values))
 
     def match(self, criteria: Mapping) -> bool:
         """Determine whether the window matches a set of criteria.
@@ -62,8 +92,8 @@ class Window(BaseWindow):
             Dictionary of regexes of the form {PROPERTY: REGEX} e.g {"window_id": r"termite"}
 
         """
-        for prop in self.properties.keys():
-            if criteria.get(prop) and not match_regex(criteria[prop], self.properties[prop]):
+        for prop, value in zip(PROPERTY_NAMES, self._property_values):
+            if criteria.get(prop) and not match_regex(criteria[prop], value):
                 return False
         return True
 
@@ -73,7 +103,8 @@ class Window(BaseWindow):
 
     def set_opacity(self, opacity: float) -> None:
         # If opacity is None just silently ignore the request
-        self._container.command(f"opacity {opacity}")
+        self._command(f"opacity {opacity}")
+        self._opacity = opacity
 
     def set_name(self, name: str) -> None:
         raise NotImplementedError()
@@ -82,17 +113,94 @@ class Window(BaseWindow):
         raise NotImplementedError()
 
     def destroy(self) -> None:
-        self._container.command("kill")
+        self._command("kill")
 
     def is_fullscreen(self) -> bool:
-        fullscreen_mode: int = self._container.fullscreen_mode
-        return fullscreen_mode == 1
+        return self._fullscreen_mode == 1
+
+    def refresh_interval(self) -> float | None:
+        intervals = _get_refresh_intervals()
+        if len(set(intervals.values())) == 1:
+            # All outputs refresh at the same rate, so there's no need to find the window's output
+            return next(iter(intervals.values()))
+        if _layout_changes is None or self._output_checked != _layout_changes:
+            # Read before the request so that a move during the round trip isn't missed
+            checked = _layout_changes
+            container = QUERIES.get_tree().find_by_id(self.id)
+            workspace = container.workspace() if container is not None else None
+            self._output = workspace.ipc_data.get("output") if workspace is not None else None
+            self._output_checked = checked
+        return intervals.get(self._output) if self._output is not None else None
+
+    def _command(self, command: str) -> None:
+        # Equivalent to i3ipc.Con.command
+        COMMANDS.command(f'[con_id="{self.id}"] {command}')
+
+
+# Windows are interned so that each sway container is represented by the same Window object
+WINDOWS: WindowRegistry[Window] = WindowRegistry()
+
+
+# The focused workspace is tracked from workspace events while the DisplayHandler is running
+FOCUSED_WORKSPACE = WorkspaceTracker()
+
+# Changes whenever a window or workspace may have moved to another output, or None if the
+# DisplayHandler isn't running. While it's running, the output of each window is cached until then.
+# The count is drawn from a counter which is never reset, so that an output cached while the handler
+# was previously running isn't trusted after it's restarted.
+_layout_changes: int | None = None
+_layout_change_counter = itertools.count()
+
+
+def _start_tracking_layout_changes() -> None:
+    global _layout_changes
+    _layout_changes = next(_layout_change_counter)
+
+
+def _count_layout_change() -> None:
+    global _layout_changes
+    if _layout_changes is not None:
+        _layout_changes = next(_layout_change_counter)
+
+
+def _stop_tracking_layout_changes() -> None:
+    global _layout_changes
+    _layout_changes = None
+
+
+# Seconds between refreshes of each active output by name, or None if they haven't been fetched
+# since the outputs last changed
+_refresh_intervals: dict[str, float] | None = None
+
+
+def _get_refresh_intervals() -> dict[str, float]:
+    global _refresh_intervals
+    if _refresh_intervals is None:
+        _refresh_intervals = {
+            output.name: 1000 / output.current_mode.refresh
+            for output in QUERIES.get_outputs()
+            if output.active and output.current_mode is not None and output.current_mode.refresh
+        }
+    return _refresh_intervals
+
+
+def _clear_refresh_intervals() -> None:
+    global _refresh_intervals
+    _refresh_intervals = None
+
+
+def _get_window(container: i3ipc.Con) -> Window:
+    window = WINDOWS.get(container.id)
+    if window is None:
+        return WINDOWS.intern(Window(container))
+    window.update(container)
+    return window
 
 
 class DisplayHandler(ProducerThread):
     """Parse events from sway and pass them on to FlashServer"""
 
-    def __init__(self, queue: Queue) -> None:
+    def __init__(self, queue: Queue | DispatchQueue) -> None:
         # This is set to True when initialization of the thread is complete and its ready to begin
         # the event loop
         self.ready = False
@@ -100,25 +208,110 @@ class DisplayHandler(ProducerThread):
         self.queue = queue
 
     def run(self) -> None:
-        # We need to share one global sway connection in order to be thread-safe
-        SWAY.on(i3ipc.Event.WINDOW_FOCUS, self._handle_focus_shift)
-        SWAY.on(i3ipc.Event.WINDOW_NEW, self._handle_new_mapped_window)
+        self._subscribe()
         self.ready = True
-        SWAY.main()
+        EVENTS.main()
 
     def stop(self) -> None:
-        SWAY.main_quit()
+        self._unsubscribe()
+        FOCUSED_WORKSPACE.stop()
+        _stop_tracking_layout_changes()
+        EVENTS.main_quit()
         super().stop()
 
+    # i3ipc only handles events in its own blocking main loop, so running without a thread relies
+    # on the internals of i3ipc.Connection which implement that loop
+
+    def setup(self) -> None:
+        self._subscribe()
+        EVENTS._event_socket_setup()
+        super().setup()
+
+    def fileno(self) -> int:
+        fd: int = EVENTS._sub_socket.fileno()
+        return fd
+
+    def handle_events(self) -> None:
+        # Handles a single event. If there are more, the socket is still readable.
+        eof = EVENTS._event_socket_poll()
+        if eof:
+            logging.error("Lost the connection to sway")
+            self.teardown()
+
+    def teardown(self) -> None:
+        self._unsubscribe()
+        FOCUSED_WORKSPACE.stop()
+        _stop_tracking_layout_changes()
+        EVENTS._event_socket_teardown()
+        super().teardown()
+
+    def _subscribe(self) -> None:
+        EVENTS.on(i3ipc.Event.WINDOW_FOCUS, self._handle_focus_shift)
+        EVENTS.on(i3ipc.Event.WINDOW_NEW, self._handle_new_mapped_window)
+        EVENTS.on(i3ipc.Event.WINDOW_CLOSE, self._handle_window_close)
+        EVENTS.on(i3ipc.Event.WINDOW_FULLSCREEN_MODE, self._handle_fullscreen_mode)
+        EVENTS.on(i3ipc.Event.WORKSPACE_FOCUS, self._handle_workspace_focus)
+        # The outputs of windows are fetched again after they may have moved
+        EVENTS.on(i3ipc.Event.WINDOW_MOVE, self._handle_layout_change)
+        EVENTS.on(i3ipc.Event.WORKSPACE_MOVE, self._handle_layout_change)
+        # Refresh rates are fetched again after the outputs change
+        EVENTS.on(i3ipc.Event.OUTPUT, self._handle_output_change)
+        # Sway sends a tick event as soon as we're subscribed, after which no workspace change or
+        # move can be missed
+        EVENTS.on(i3ipc.Event.TICK, self._handle_tick)
+
+    def _unsubscribe(self) -> None:
+        # EVENTS is shared by every DisplayHandler, so the handlers of a stopped one must be removed
+        # to keep them from e.g restarting the tracking of layout changes for its successor
+        for handler in (
+            self._handle_focus_shift,
+            self._handle_new_mapped_window,
+            self._handle_window_close,
+            self._handle_fullscreen_mode,
+            self._handle_workspace_focus,
+            self._handle_layout_change,
+            self._handle_output_change,
+            self._handle_tick,
+        ):
+            EVENTS.off(handler)
+
     def _handle_focus_shift(self, _: i3ipc.Connection, event: i3ipc.Event) -> None:
         if _is_mapped_window(event.container):
             logging.debug("Focus shifted to %s", event.container.id)
-            self.queue_window(Window(event.container), WMEventType.FOCUS_SHIFT)
+            # Sway sends the workspace::focus event before the window::focus event, so the tracked
+            # workspace is already that of the window
+            workspace = FOCUSED_WORKSPACE.workspace if FOCUSED_WORKSPACE.tracking else None
+            self.queue_window(_get_window(event.container), WMEventType.FOCUS_SHIFT, workspace)
 
     def _handle_new_mapped_window(self, _: i3ipc.Connection, event: i3ipc.Event) -> None:
         if _is_mapped_window(event.container):
             logging.debug("Window %s mapped...", event.container.id)
-            self.queue_window(Window(event.container), WMEventType.NEW_WINDOW)
+            self.queue_window(_get_window(event.container), WMEventType.NEW_WINDOW)
+
+    def _handle_window_close(self, _: i3ipc.Connection, event: i3ipc.Event) -> None:
+        WINDOWS.evict(event.container.id)
+
+    def _handle_fullscreen_mode(self, _: i3ipc.Connection, event: i3ipc.Event) -> None:
+        window = WINDOWS.get(event.container.id)
+        if window is not None:
+            window.update(event.container)
+
+    def _handle_workspace_focus(self, _: i3ipc.Connection, event: i3ipc.Event) -> None:
+        if event.current is not None:
+            FOCUSED_WORKSPACE.update(event.current.num)
+
+    def _handle_layout_change(self, _: i3ipc.Connection, event: i3ipc.Event) -> None:
+        _count_layout_change()
+
+    def _handle_output_change(self, _: i3ipc.Connection, event: i3ipc.Event) -> None:
+        _clear_refresh_intervals()
+        # Workspaces are moved to other outputs when their output is disabled
+        _count_layout_change()
+
+    def _handle_tick(self, _: i3ipc.Connection, event: i3ipc.Event) -> None:
+        if event.first:
+            FOCUSED_WORKSPACE.update(_query_focused_workspace())
+            _start_tracking_layout_changes()
 
 
 def _is_mapped_window(container: i3ipc.Con) -> bool:
@@ -127,25 +320,44 @@ def _is_mapped_window(container: i3ipc.Con) -> bool:
 
 
 def get_focused_window() -> Window | None:
-    return Window(SWAY.get_tree().find_focused())
+    return _get_window(QUERIES.get_tree().find_focused())
 
 
 def _get_workspace_object(workspace: int) -> i3ipc.Con:
-    return next(filter(lambda ws: ws.num == workspace, SWAY.get_tree().workspaces()), None)
+    return next(filter(lambda ws: ws.num == workspace, QUERIES.get_tree().workspaces()), None)
 
 
-def list_mapped_windows(workspace: int | None = None) -> list[Window]:
+def list_mapped_windows(workspace: int | None = None, screen: int | None = None) -> list[Window]:
+    # Sway numbers workspaces across all outputs, so `screen` (used by X11) is ignored
     if workspace is not None:
         containers = _get_workspace_object(workspace)
     else:
-        containers = SWAY.get_tree().leaves()
+        containers = QUERIES.get_tree().leaves()
 
-    windows = [Window(con) for con in containers if _is_mapped_window(con)]
+    windows = [_get_window(con) for con in containers if _is_mapped_window(con)]
     return windows
 
 
+def restore_full_opacity() -> int:
+    """Set every window which isn't fully opaque to full opacity, using a single command.
+
+    Windows which were last set to full opacity by flashfocus are skipped.
+
+    Returns
+    -------
+    The number of windows whose opacity was changed.
+
+    """
+    translucent = [window for window in list_mapped_windows() if window._opacity != 1]
+    if translucent:
+        COMMANDS.command("; ".join(f'[con_id="{window.id}"] opacity 1' for window in translucent))
+        for window in translucent:
+            window._opacity = 1
+    return len(translucent)
+
+
 def disconnect_display_conn() -> None:
-    SWAY.main_quit()
+    EVENTS.main_quit()
 
 
 def _try_get_con_workspace(container: i3ipc.Con | None) -> int | None:
@@ -160,11 +372,17 @@ def _try_get_con_workspace(container: i3ipc.Con | None) -> int | None:
 
 
 def get_focused_workspace() -> int | None:
-    focused_container = SWAY.get_tree().find_focused()
+    if FOCUSED_WORKSPACE.tracking:
+        return FOCUSED_WORKSPACE.workspace
+    return _query_focused_workspace()
+
+
+def _query_focused_workspace() -> int | None:
+    focused_container = QUERIES.get_tree().find_focused()
     return _try_get_con_workspace(focused_container)
 
 
 def get_workspace(window: Window) -> int | None:
     """Get the workspace that the window is mapped to."""
-    i3ipc_window = SWAY.get_tree().find_by_id(window.id)
+    i3ipc_window = QUERIES.get_tree().find_by_id(window.id)
     return _try_get_con_workspace(i3ipc_window)
@@ -7,40 +7,61 @@ functions/classes for abstracting across various display protocols. See list in
 from __future__ import annotations
 
 import functools
+import itertools
 import logging
 import struct
+from dataclasses import dataclass
 from queue import Queue
-from typing import Any
+from typing import TYPE_CHECKING, Any
 from collections.abc import Mapping
 
+import xcffib
+import xcffib.randr
 import xpybutil.window
 from xcffib.xproto import (
     CW,
+    ConfigureNotifyEvent,
     CreateNotifyEvent,
+    DestroyNotifyEvent,
     EventMask,
     PropertyNotifyEvent,
+    UnmapNotifyEvent,
     WindowClass,
     WindowError,
 )
 from xpybutil import conn, root
 from xpybutil.ewmh import (
-    get_active_window,
-    get_client_list,
-    get_current_desktop,
     get_wm_desktop,
     get_wm_state,
     get_wm_window_opacity,
+    set_wm_window_opacity,
     set_wm_window_opacity_checked,
 )
 from xpybutil.icccm import get_wm_class, set_wm_class_checked, set_wm_name_checked
-from xpybutil.util import PropertyCookieSingle, get_atom_name
+from xpybutil.util import (
+    PropertyCookie,
+    PropertyCookieSingle,
+    get_atom,
+    get_atom_name,
+    get_property,
+)
 
-from flashfocus.display import BaseWindow, WMEventType
+from flashfocus.display import BaseWindow, WindowRegistry, WMEventType, WorkspaceTracker
 from flashfocus.errors import WMError
 from flashfocus.producer import ProducerThread
 from flashfocus.util import match_regex
 
-Event = CreateNotifyEvent | PropertyNotifyEvent
+if TYPE_CHECKING:
+    from flashfocus.event_loop import DispatchQueue
+
+Event = (
+    ConfigureNotifyEvent
+    | CreateNotifyEvent
+    | DestroyNotifyEvent
+    | PropertyNotifyEvent
+    | UnmapNotifyEvent
+    | xcffib.randr.ScreenChangeNotifyEvent
+)
 
 
 def ignore_window_error(function):  # type: ignore
@@ -54,7 +75,28 @@ def ignore_window_error(function):  # type: ignore
     return wrapper
 
 
+@functools.cache
+def _get_atom(name: str) -> int:
+    atom: int = get_atom(name)
+    return atom
+
+
+@functools.cache
+def _get_atom_name(atom: int) -> str:
+    # xpybutil caches atom names, but still queries the X server each time this is called
+    name: str = get_atom_name(atom)
+    return name
+
+
 class Window(BaseWindow):
+    __slots__ = (
+        "_properties",
+        "_fullscreen",
+        "_fullscreen_watched",
+        "_refresh_interval",
+        "_refresh_interval_checked",
+    )
+
     def __init__(self, window_id: int) -> None:
         """Represents an Xorg window.
 
@@ -69,15 +111,22 @@ class Window(BaseWindow):
             The XORG window ID
         """
         super().__init__(window_id)
-        self._properties: dict = {}
+        # Not fetched until needed
+        self._properties: dict | None = None
+        self._fullscreen: bool | None = None
+        # The `_watch_session` in which changes to the window's _NET_WM_STATE were listened for
+        self._fullscreen_watched: int | None = None
+        self._refresh_interval: float | None = None
+        self._refresh_interval_checked: int | None = None
 
     @property
     def properties(self) -> dict:
         """Get a dictionary with the window class and instance."""
         # Properties are cached after the first call to this function and so might not necessarily
         # be correct if the properties are changed between calls. This is acceptable for our
-        # purposes because Windows are short-lived objects.
-        if not self._properties:
+        # purposes because clients set WM_CLASS before the window is mapped, and rarely change it
+        # afterwards.
+        if self._properties is None:
             try:
                 reply = get_wm_class(self.id).reply()
             except (struct.error, WindowError) as e:
@@ -85,7 +134,7 @@ class Window(BaseWindow):
             try:
                 self._properties = {"window_id": reply[0], "window_class": reply[1]}
             except TypeError:
-                pass
+                return {}
         return self._properties
 
     def match(self, criteria: Mapping) -> bool:
@@ -142,13 +191,307 @@ class Window(BaseWindow):
 
     @ignore_window_error
     def is_fullscreen(self) -> bool:
+        if _watch_session is None or self._fullscreen_watched != _watch_session:
+            self.update_fullscreen()
+        return bool(self._fullscreen)
+
+    def refresh_interval(self) -> float | None:
+        crtcs = _get_crtcs()
+        intervals = {crtc.interval for crtc in crtcs}
+        if len(intervals) < 2:
+            # There's no need to find the window's CRTC if they all refresh at the same rate
+            return intervals.pop() if intervals else None
+        # The window's CRTC can only change when a top-level window is reconfigured (or the CRTCs
+        # change)
+        if _reconfigurations is None or self._refresh_interval_checked != _reconfigurations:
+            checked = _reconfigurations
+            self._refresh_interval = self._query_refresh_interval(crtcs)
+            self._refresh_interval_checked = checked
+        return self._refresh_interval
+
+    def _query_refresh_interval(self, crtcs: list[Crtc]) -> float | None:
+        """Find the refresh interval of the CRTC which shows the center of the window."""
+        try:
+            geometry = conn.core.GetGeometry(self.id).reply()
+            position = conn.core.TranslateCoordinates(self.id, geometry.root, 0, 0).reply()
+        except xcffib.XcffibException:
+            return None
+        center_x = position.dst_x + geometry.width // 2
+        center_y = position.dst_y + geometry.height // 2
+        for crtc in crtcs:
+            if crtc.root == geometry.root and crtc.contains(center_x, center_y):
+                return crtc.interval
+        return None
+
+    @ignore_window_error
+    def update_fullscreen(self) -> None:
+        """Fetch the fullscreen state of the window from the X server."""
         wm_states = get_wm_state(self.id).reply()
         # wm_states might be null in some WMs - #29
-        if wm_states:
-            for wm_state in wm_states:
-                if get_atom_name(wm_state) == "_NET_WM_STATE_FULLSCREEN":
-                    return True
+        self._fullscreen = bool(wm_states) and _get_atom("_NET_WM_STATE_FULLSCREEN") in wm_states
+
+    @ignore_window_error
+    def watch_fullscreen(self) -> None:
+        """Listen for changes to the window's _NET_WM_STATE and fetch its current fullscreen state.
+
+        While the DisplayHandler is running, the state of a watched window is updated from its
+        PropertyNotify events, so checking it doesn't need a round trip.
+        """
+        session = _watch_session
+        if session is None or self._fullscreen_watched == session:
+            return
+        # The state is fetched after selecting the events, so that no change can be missed
+        cookie = conn.core.ChangeWindowAttributesChecked(
+            self.id, CW.EventMask, [EventMask.PropertyChange]
+        )
+        self.update_fullscreen()
+        cookie.check()
+        self._fullscreen_watched = session
+
+
+# Windows are interned so that their properties only need to be fetched once
+WINDOWS: WindowRegistry[Window] = WindowRegistry()
+
+# Identifies the current run of the DisplayHandler, or None if it isn't running. Windows are
+# watched for changes to their fullscreen state within a session, so that a state cached while the
+# handler was previously running isn't trusted after it's restarted.
+_watch_session: int | None = None
+_watch_sessions = itertools.count()
+
+
+def _start_watch_session() -> None:
+    global _watch_session
+    _watch_session = next(_watch_sessions)
+
+
+def _stop_watch_session() -> None:
+    global _watch_session
+    _watch_session = None
+
+
+# Changes on each ConfigureNotify event for a top-level window, or None if the DisplayHandler
+# isn't running. The CRTC of each window is cached until any top-level window is reconfigured.
+_reconfigurations: int | None = None
+# The count is drawn from a counter which is never reset, so that a value cached while the handler
+# was previously running isn't trusted after it's restarted
+_reconfiguration_counter = itertools.count()
+
+
+def _start_tracking_reconfigurations() -> None:
+    global _reconfigurations
+    _reconfigurations = next(_reconfiguration_counter)
+
+
+def _count_reconfiguration() -> None:
+    global _reconfigurations
+    if _reconfigurations is not None:
+        _reconfigurations = next(_reconfiguration_counter)
+
+
+def _stop_tracking_reconfigurations() -> None:
+    global _reconfigurations
+    _reconfigurations = None
+
+
+class Screen:
+    """One of the screens of the X display.
+
+    In a multi-screen ("Zaphod") setup each screen has its own root window, and the EWMH state of
+    each screen (active window, current desktop and client list) is set on its root by the window
+    manager. While the DisplayHandler is running, it keeps each screen's current desktop and client
+    list up to date from changes to the properties of the root window.
+
+    Parameters
+    ----------
+    root
+        The id of the screen's root window.
+
+    Attributes
+    ----------
+    root
+        The id of the screen's root window.
+    workspace
+        Tracks the screen's current desktop.
+    client_ids
+        Ids of the windows managed on the screen, or None if they aren't being tracked.
+
+    """
+
+    __slots__ = ("root", "workspace", "client_ids")
+
+    def __init__(self, root: int) -> None:
+        self.root = root
+        self.workspace = WorkspaceTracker()
+        self.client_ids: list[int] | None = None
+
+    def __repr__(self) -> str:
+        return f"Screen(root={self.root})"
+
+    def get_active_window(self) -> Window | None:
+        window_id = _try_unwrap(PropertyCookieSingle(get_property(self.root, "_NET_ACTIVE_WINDOW")))
+        if window_id is None:
+            return None
+        return _get_window(window_id)
+
+    def get_current_desktop(self) -> int | None:
+        if self.workspace.tracking:
+            return self.workspace.workspace
+        return self.query_current_desktop()
+
+    def query_current_desktop(self) -> int | None:
+        """Fetch the current desktop from the X server."""
+        workspace = _try_unwrap(
+            PropertyCookieSingle(get_property(self.root, "_NET_CURRENT_DESKTOP"))
+        )
+        if workspace is not None and not isinstance(workspace, int):
+            raise RuntimeError(f"Unexpected workspace value: {workspace}")
+        return workspace
+
+    def get_client_list(self) -> list[int]:
+        if self.client_ids is not None:
+            return self.client_ids
+        return self.query_client_list()
+
+    def query_client_list(self) -> list[int]:
+        """Fetch the ids of the windows managed on the screen from the X server."""
+        window_ids = _try_unwrap(PropertyCookie(get_property(self.root, "_NET_CLIENT_LIST")))
+        return [window_id for window_id in window_ids or [] if window_id is not None]
+
+    def track(self) -> None:
+        """Start tracking the screen's state. Changes to the root window must be listened for."""
+        self.workspace.update(self.query_current_desktop())
+        self.client_ids = self.query_client_list()
+
+    def stop_tracking(self) -> None:
+        self.workspace.stop()
+        self.client_ids = None
+
+
+# Each of the display's screens by root window id
+SCREENS: dict[int, Screen] = (
+    {screen.root: Screen(screen.root) for screen in conn.get_setup().roots}
+    if conn is not None
+    else {}
+)
+
+
+# The screen of the most recently focused window. Focus events from every screen are handled, but
+# the focused window and workspace are those of this screen.
+_focused_root: int | None = (
+    conn.get_setup().roots[conn.pref_screen].root if conn is not None else None
+)
+
+
+def _focused_screen() -> Screen:
+    if _focused_root is None:
+        raise WMError("Not connected to an X server")
+    return SCREENS[_focused_root]
+
+
+def _set_focused_screen(screen: Screen) -> None:
+    global _focused_root
+    _focused_root = screen.root
+
+
+@dataclass(frozen=True)
+class Crtc:
+    """The area of a screen shown by one of its CRTCs (i.e an output), and its refresh interval."""
+
+    root: int
+    x: int
+    y: int
+    width: int
+    height: int
+    interval: float
+
+    def contains(self, x: int, y: int) -> bool:
+        return self.x <= x < self.x + self.width and self.y <= y < self.y + self.height
+
+
+RANDR_NAME = "RANDR"
+# GetScreenResourcesCurrent was added in RandR 1.3
+RANDR_VERSION = (1, 3)
+
+# The active CRTCs of every screen, or None if they haven't been fetched since they last changed
+_crtcs: list[Crtc] | None = None
+
+
+def _get_crtcs() -> list[Crtc]:
+    global _crtcs
+    if conn is None:
+        raise WMError("Not connected to an X server")
+    if _crtcs is None:
+        try:
+            _crtcs = _query_crtcs()
+        except xcffib.Error:
+            # E.g a CRTC was disabled while it was being queried
+            logging.debug("Failed to query the refresh rates of outputs", exc_info=True)
+            _crtcs = []
+    return _crtcs
+
+
+@functools.cache
+def _randr_supported() -> bool:
+    """Determine whether the X server supports RandR 1.3."""
+    # Sending a request for an extension which the X server doesn't have shuts down the connection,
+    # so the extension must be checked for first
+    if not conn.core.QueryExtension(len(RANDR_NAME), RANDR_NAME).reply().present:
+        logging.debug("The X server doesn't support RandR, refresh rates are unknown")
+        return False
+    version = conn(xcffib.randr.key).QueryVersion(*RANDR_VERSION).reply()
+    if (version.major_version, version.minor_version) < RANDR_VERSION:
+        logging.debug(
+            f"The X server only supports RandR {version.major_version}.{version.minor_version}, "
+            "refresh rates are unknown"
+        )
         return False
+    return True
+
+
+def _query_crtcs() -> list[Crtc]:
+    """Fetch the position and refresh interval of the active CRTCs of every screen using RandR.
+
+    If the X server doesn't support RandR 1.3, no CRTCs are returned.
+    """
+    if not _randr_supported():
+        return []
+    randr = conn(xcffib.randr.key)
+    crtcs = []
+    for screen in SCREENS.values():
+        resources = randr.GetScreenResourcesCurrent(screen.root).reply()
+        modes = {mode.id: mode for mode in resources.modes}
+        cookies = [randr.GetCrtcInfo(crtc, resources.config_timestamp) for crtc in resources.crtcs]
+        for cookie in cookies:
+            info = cookie.reply()
+            mode = modes.get(info.mode)
+            if mode is None or not (mode.dot_clock and mode.htotal and mode.vtotal):
+                # The CRTC is disabled
+                continue
+            interval = mode.htotal * mode.vtotal / mode.dot_clock
+            crtcs.append(Crtc(screen.root, info.x, info.y, info.width, info.height, interval))
+    return crtcs
+
+
+def _clear_crtcs() -> None:
+    global _crtcs
+    _crtcs = None
+
+
+def _list_client_ids(live: bool = False) -> list[int]:
+    """List the ids of the windows managed on every screen.
+
+    If `live`, the client lists are fetched from the X server even if they're being tracked.
+    """
+    if live:
+        return list(itertools.chain.from_iterable(s.query_client_list() for s in SCREENS.values()))
+    return list(itertools.chain.from_iterable(s.get_client_list() for s in SCREENS.values()))
+
+
+def _get_window(window_id: int) -> Window:
+    window = WINDOWS.get(window_id)
+    if window is None:
+        window = WINDOWS.intern(Window(window_id))
+    return window
 
 
 def _create_message_window() -> Window:
@@ -162,10 +505,11 @@ def _create_message_window() -> Window:
         An X-window id.
 
     """
-    setup = conn.get_setup()
+    # The window must have the depth and visual of the screen whose root is its parent
+    screen = next(screen for screen in conn.get_setup().roots if screen.root == root)
     window_id = conn.generate_id()
     conn.core.CreateWindow(
-        depth=setup.roots[0].root_depth,
+        depth=screen.root_depth,
         wid=window_id,
         parent=root,
         x=0,
@@ -174,7 +518,7 @@ def _create_message_window() -> Window:
         height=1,
         border_width=0,
         _class=WindowClass.InputOutput,
-        visual=setup.roots[0].root_visual,
+        visual=screen.root_visual,
         value_mask=CW.EventMask,
         value_list=[EventMask.PropertyChange],
         is_checked=True,
@@ -185,7 +529,7 @@ def _create_message_window() -> Window:
 class DisplayHandler(ProducerThread):
     """Parse events from the X-server and pass them on to FlashServer"""
 
-    def __init__(self, queue: Queue) -> None:
+    def __init__(self, queue: Queue | DispatchQueue) -> None:
         super().__init__(queue)
 
         # In order to interrupt the event loop we need to map a special message-passing window.
@@ -194,48 +538,130 @@ class DisplayHandler(ProducerThread):
         self.message_window: Window = _create_message_window()
 
     def run(self) -> None:
+        self.setup()
+        while self.keep_going:
+            self._handle_event(conn.wait_for_event())
+
+    def stop(self) -> None:
+        for screen in SCREENS.values():
+            screen.stop_tracking()
+        _stop_watch_session()
+        _stop_tracking_reconfigurations()
+        set_wm_name_checked(self.message_window.id, "KILL").check()
+        self.message_window.destroy()
+        super().stop()
+
+    def setup(self) -> None:
         # PropertyChange is for detecting changes in focus
         # SubstructureNotify is for detecting new mapped windows
-        xpybutil.window.listen(xpybutil.root, "PropertyChange", "SubstructureNotify")
+        for screen in SCREENS.values():
+            xpybutil.window.listen(screen.root, "PropertyChange", "SubstructureNotify")
 
         # Also listen to property changes in the message window
         xpybutil.window.listen(self.message_window.id, "PropertyChange")
 
-        self.ready = True
-        while self.keep_going:
-            event = conn.wait_for_event()
-            if isinstance(event, PropertyNotifyEvent):
-                self._handle_property_change(event)
-            elif isinstance(event, CreateNotifyEvent):
-                self._handle_new_mapped_window(event)
-
-    def stop(self) -> None:
-        set_wm_name_checked(self.message_window.id, "KILL").check()
+        # Refresh rates are fetched again after the outputs change. This is listened for even if no
+        # CRTCs are active yet (e.g a headless server), so that outputs added later are noticed.
+        _clear_crtcs()
+        if _randr_supported():
+            randr = conn(xcffib.randr.key)
+            for screen in SCREENS.values():
+                randr.SelectInput(screen.root, xcffib.randr.NotifyMask.ScreenChange)
+
+        # Any later changes to the screens will generate events
+        for screen in SCREENS.values():
+            screen.track()
+        _start_watch_session()
+        _start_tracking_reconfigurations()
+        super().setup()
+
+    def fileno(self) -> int:
+        fd: int = conn.get_file_descriptor()
+        return fd
+
+    def handle_events(self) -> None:
+        while (event := conn.poll_for_event()) is not None:
+            self._handle_event(event)
+
+    def handle_buffered_events(self) -> None:
+        # xcb reads any events which arrive while it is waiting for a reply to a request and buffers
+        # them, so they need to be handled even though the connection isn't readable
+        self.handle_events()
+        conn.flush()
+
+    def teardown(self) -> None:
+        for screen in SCREENS.values():
+            screen.stop_tracking()
+        _stop_watch_session()
+        _stop_tracking_reconfigurations()
         self.message_window.destroy()
-        super().stop()
+        super().teardown()
+
+    def _handle_event(self, event: Event) -> None:
+        if isinstance(event, PropertyNotifyEvent):
+            self._handle_property_change(event)
+        elif isinstance(event, CreateNotifyEvent):
+            self._handle_new_mapped_window(event)
+        elif isinstance(event, ConfigureNotifyEvent):
+            _count_reconfiguration()
+        elif isinstance(event, (DestroyNotifyEvent, UnmapNotifyEvent)):
+            WINDOWS.evict(event.window)
+        elif isinstance(event, xcffib.randr.ScreenChangeNotifyEvent):
+            _clear_crtcs()
+            _count_reconfiguration()
 
     def _handle_new_mapped_window(self, event: CreateNotifyEvent) -> None:
         logging.debug(f"Window {event.window} mapped...")
         if event.window is not None:
-            window = Window(event.window)
+            window = _get_window(event.window)
             # Check that window is visible so that we don't accidentally set
             # opacity of windows which are not for display. Without this step
             # window opacity can become frozen and stop responding to flashes.
-            if window in list_mapped_windows():
-                self.queue_window(window, WMEventType.NEW_WINDOW)
+            # The tracked client lists are only updated by later events, so they're fetched here.
+            if window.id in _list_client_ids(live=True):
+                # Top-level windows are created as children of their screen's root
+                screen = event.parent if event.parent in SCREENS else None
+                window.watch_fullscreen()
+                self.queue_window(window, WMEventType.NEW_WINDOW, screen=screen)
             else:
                 logging.debug(f"Window {window.id} is not visible, ignoring...")
 
+    def _handle_focus_shift(self, screen: Screen) -> None:
+        # The focused window is read from the screen's root rather than the event, since the event's
+        # window is the root window
+        focused_window = screen.get_active_window()
+        if focused_window is not None:
+            logging.debug(f"Focus shifted to {focused_window.id}")
+            _set_focused_screen(screen)
+            # Only a round trip the first time that the window is focused
+            focused_window.watch_fullscreen()
+            # The screen's desktop is snapshotted from the tracked state, so that handling a focus
+            # event needs no further round trips
+            workspace = screen.workspace.workspace if screen.workspace.tracking else None
+            self.queue_window(focused_window, WMEventType.FOCUS_SHIFT, workspace, screen.root)
+
     def _handle_property_change(self, event: PropertyNotifyEvent) -> None:
         """Handle a property change on a watched window."""
-        atom_name = get_atom_name(event.atom)
+        atom_name = _get_atom_name(event.atom)
+        # The EWMH properties of each screen are set on its root window
+        screen = SCREENS.get(event.window)
         if atom_name == "_NET_ACTIVE_WINDOW":
-            # We are deliberately not using the `event.window` property here since that property
-            # sometimes contains incorrect ids. Possibly its returning the id from a parent window
-            focused_window = get_focused_window()
-            if focused_window is not None:
-                logging.debug(f"Focus shifted to {focused_window.id}")
-                self.queue_window(focused_window, WMEventType.FOCUS_SHIFT)
+            if screen is not None:
+                self._handle_focus_shift(screen)
+        elif atom_name == "_NET_CURRENT_DESKTOP":
+            if screen is not None:
+                screen.workspace.update(screen.query_current_desktop())
+        elif atom_name == "_NET_CLIENT_LIST":
+            if screen is not None:
+                screen.client_ids = screen.query_client_list()
+            # In reparenting window managers, the DestroyNotify events of client windows are only
+            # sent to their frame, so we also evict windows once they leave the client list
+            WINDOWS.retain(_list_client_ids())
+        elif atom_name == "_NET_WM_STATE":
+            # Only sent for windows whose fullscreen state is being watched
+            window = WINDOWS.get(event.window)
+            if window is not None:
+                window.update_fullscreen()
         elif atom_name == "WM_NAME" and event.window == self.message_window.id:
             # Received kill signal from server -> terminate the thread
             self.keep_going = False
@@ -243,11 +669,7 @@ class DisplayHandler(ProducerThread):
 
 @ignore_window_error
 def get_focused_window() -> Window | None:
-    window_id = get_active_window().reply()
-    if window_id is not None:
-        return Window(window_id)
-    else:
-        return None
+    return _focused_screen().get_active_window()
 
 
 def _try_unwrap(cookie: PropertyCookieSingle) -> Any:  # type: ignore[no-any-unimported]
@@ -259,12 +681,21 @@ def _try_unwrap(cookie: PropertyCookieSingle) -> Any:  # type: ignore[no-any-uni
 
 
 @ignore_window_error
-def list_mapped_windows(workspace: int | None = None) -> list[Window]:
-    mapped_window_ids = get_client_list().reply()
-    if mapped_window_ids is None:
-        mapped_window_ids = []
+def list_mapped_windows(workspace: int | None = None, screen: int | None = None) -> list[Window]:
+    """List the windows managed on every screen.
+
+    Desktops are numbered separately on each screen, so if `workspace` is given only the windows on
+    that desktop of `screen` are listed. `screen` is the root window of a screen, and defaults to
+    the focused screen.
+    """
+    if workspace is None:
+        mapped_window_ids = _list_client_ids()
+    elif screen in SCREENS:
+        mapped_window_ids = SCREENS[screen].get_client_list()
+    else:
+        mapped_window_ids = _focused_screen().get_client_list()
 
-    mapped_windows = [Window(wid) for wid in mapped_window_ids if wid is not None]
+    mapped_windows = [_get_window(wid) for wid in mapped_window_ids if wid is not None]
     if workspace is not None:
         cookies = [get_wm_desktop(wid) for wid in mapped_window_ids]
         workspaces = [_try_unwrap(cookie) for cookie in cookies]
@@ -272,12 +703,8 @@ def list_mapped_windows(workspace: int | None = None) -> list[Window]:
     return mapped_windows
 
 
-@ignore_window_error
 def get_focused_workspace() -> int | None:
-    workspace = get_current_desktop().reply()
-    if workspace is not None and not isinstance(workspace, int):
-        raise RuntimeError(f"Unexpected workspace value: {workspace}")
-    return workspace
+    return _focused_screen().get_current_desktop()
 
 
 def get_workspace(window: Window) -> int | None:
@@ -288,6 +715,31 @@ def get_workspace(window: Window) -> int | None:
     return workspace
 
 
+def restore_full_opacity() -> int:
+    """Set every window which isn't fully opaque to full opacity.
+
+    All requests are pipelined: the opacity of every window is requested at once, then the changes
+    are sent unchecked and a single round trip waits for the X server to handle them.
+
+    Returns
+    -------
+    The number of windows whose opacity was changed.
+
+    """
+    window_ids = _list_client_ids()
+    cookies = [get_wm_window_opacity(window_id) for window_id in window_ids]
+    # Windows without an opacity (None) are fully opaque
+    translucent = [
+        window_id
+        for window_id, cookie in zip(window_ids, cookies)
+        if _try_unwrap(cookie) not in (None, 1)
+    ]
+    for window_id in translucent:
+        set_wm_window_opacity(window_id, 1)
+    conn.core.GetInputFocus().reply()
+    return len(translucent)
+
+
 @ignore_window_error
 def disconnect_display_conn() -> None:
     conn.disconnect()
@@ -0,0 +1,203 @@
+"""A single-threaded event loop.
+
+By default, each source of events (the display server connection and the client socket) runs in
+its own thread and passes events to the server through a queue, and animation frames are run by the
+scheduler's thread. With `flashfocus --event-loop selector` all of this happens in a single thread
+instead: the file descriptors of the event sources are multiplexed with a selector, events are
+handled as soon as they're read, and animation frames are run by the same loop in between. The loop
+only wakes up when an event arrives or a frame is due, so an idle daemon doesn't wake up at all.
+
+"""
+from __future__ import annotations
+
+import heapq
+import logging
+import os
+import selectors
+from collections import deque
+from collections.abc import Callable
+from itertools import count
+from threading import Event, get_ident
+from time import monotonic
+from typing import Any, Protocol
+
+from flashfocus.scheduler import Job, Scheduler, _run_job
+
+
+class EventSource(Protocol):
+    """A source of events which can be multiplexed by an `EventLoop`.
+
+    Attributes
+    ----------
+    keep_going
+        Sources which set this to False are removed from the loop (e.g after the connection to the
+        display server is lost).
+
+    """
+
+    keep_going: bool
+
+    def fileno(self) -> int | None:
+        """The file descriptor which becomes readable when events are available.
+
+        If None, the source only produces events from other threads (see `EventLoop.call_soon`).
+        """
+        ...
+
+    def handle_events(self) -> None:
+        """Handle the events which are available, without blocking."""
+        ...
+
+    def handle_buffered_events(self) -> None:
+        """Handle events which were already read from the file descriptor.
+
+        This is called before the loop waits for events, because buffered events don't make the file
+        descriptor readable.
+        """
+        ...
+
+
+class EventLoop(Scheduler):
+    """Multiplexes event sources and scheduled callbacks in a single thread.
+
+    The loop is also a `Scheduler`, so that animation frames are run by the loop's thread. Callbacks
+    may be scheduled from other threads, in which case the loop is woken up to run them.
+    """
+
+    def __init__(self) -> None:
+        self._selector = selectors.DefaultSelector()
+        self._sources: list[EventSource] = []
+        self._jobs: list[Job] = []
+        self._sequence = count()
+        # Callbacks scheduled by other threads, as (deadline, callback, args). Appending to a deque
+        # is atomic, so this doesn't need a lock.
+        self._incoming: deque[tuple[float, Callable[..., Any], tuple]] = deque()
+        # Writing to this pipe wakes up the loop
+        self._wakeup_read, self._wakeup_write = os.pipe()
+        os.set_blocking(self._wakeup_read, False)
+        os.set_blocking(self._wakeup_write, False)
+        self._selector.register(self._wakeup_read, selectors.EVENT_READ)
+        self._thread_id: int | None = None
+        self._stopped = Event()
+        self.keep_going = True
+
+    def now(self) -> float:
+        return monotonic()
+
+    def call_later(self, delay: float, callback: Callable[..., Any], *args: Any) -> None:
+        deadline = monotonic() + delay
+        if get_ident() == self._thread_id:
+            heapq.heappush(self._jobs, (deadline, next(self._sequence), callback, args))
+        else:
+            self._incoming.append((deadline, callback, args))
+            self._wakeup()
+
+    def add_source(self, source: EventSource) -> None:
+        self._sources.append(source)
+        fd = source.fileno()
+        if fd is not None:
+            self._selector.register(fd, selectors.EVENT_READ, source)
+
+    def remove_source(self, source: EventSource) -> None:
+        self._sources.remove(source)
+        for key in list(self._selector.get_map().values()):
+            if key.data is source:
+                self._selector.unregister(key.fileobj)
+
+    def run(self) -> None:
+        """Run until `stop` is called."""
+        self._thread_id = get_ident()
+        self._stopped.clear()
+        try:
+            while self.keep_going:
+                self._run_once()
+        finally:
+            self._thread_id = None
+            self._stopped.set()
+
+    def stop(self) -> None:
+        """Stop the loop. Can be called from any thread."""
+        self.keep_going = False
+        self._wakeup()
+
+    def join(self, timeout: float | None = None) -> None:
+        """Wait for the loop to stop, if it is running in another thread."""
+        if self._thread_id is not None and self._thread_id != get_ident():
+            self._stopped.wait(timeout)
+
+    def close(self) -> None:
+        self._selector.close()
+        os.close(self._wakeup_read)
+        os.close(self._wakeup_write)
+
+    def _run_once(self) -> None:
+        while self._incoming:
+            deadline, callback, args = self._incoming.popleft()
+            heapq.heappush(self._jobs, (deadline, next(self._sequence), callback, args))
+        self._run_due_jobs()
+        # The loop may have been stopped by one of the jobs, in which case the sources may already
+        # have been cleaned up
+        if not self.keep_going:
+            return
+        for source in self._sources:
+            source.handle_buffered_events()
+
+        if self._incoming:
+            timeout: float | None = 0
+        elif self._jobs:
+            timeout = max(self._jobs[0][0] - monotonic(), 0)
+        else:
+            timeout = None
+        for key, _ in self._selector.select(timeout):
+            source = key.data
+            if not self.keep_going:
+                return
+            if source is None:
+                self._drain_wakeup_pipe()
+                continue
+            try:
+                source.handle_events()
+            except Exception:
+                # An error in one event shouldn't bring down the whole daemon
+                logging.exception(f"Error while handling events from {source}")
+            if not source.keep_going:
+                self.remove_source(source)
+
+    def _run_due_jobs(self) -> None:
+        # Callbacks scheduled by these jobs run on the next iteration, so that a callback which
+        # reschedules itself immediately can't starve the event sources
+        now = monotonic()
+        due = []
+        while self._jobs and self._jobs[0][0] <= now:
+            due.append(heapq.heappop(self._jobs))
+        for job in due:
+            _run_job(job)
+
+    def _wakeup(self) -> None:
+        try:
+            os.write(self._wakeup_write, b"\0")
+        except BlockingIOError:
+            # The pipe is full, so the loop will be woken up anyway
+            pass
+
+    def _drain_wakeup_pipe(self) -> None:
+        try:
+            while os.read(self._wakeup_read, 4096):
+                pass
+        except BlockingIOError:
+            pass
+
+
+class DispatchQueue:
+    """Stands in for the server's event queue when events are handled by an `EventLoop`.
+
+    Rather than being queued for another thread, each event is handled by the loop as soon as
+    possible.
+    """
+
+    def __init__(self, loop: EventLoop, handler: Callable[[Any], None]) -> None:
+        self.loop = loop
+        self.handler = handler
+
+    def put(self, item: Any) -> None:
+        self.loop.call_soon(self.handler, item)
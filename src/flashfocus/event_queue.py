@@ -0,0 +1,147 @@
+"""The queue of events waiting to be handled by the server.
+
+Events are handled in order of priority: client requests (the user explicitly asked for a flash)
+first, then focus shifts, new windows and finally window initialization. Within each type, events
+are handled in the order that they arrived. Other messages (e.g config reloads) are handled before
+any events.
+
+The number of waiting events of each type is bounded. During a burst of events (e.g when the window
+manager restarts or a session is restored) events which no longer matter are dropped according to
+the overflow policy of their type:
+
+drop-oldest
+    The oldest waiting event of the same type is dropped.
+coalesce
+    A waiting event of the same type for the same window is dropped. If there is none, the oldest
+    waiting event of the same type is dropped.
+
+Dropped events and the time that events wait in the queue are counted in flashfocus.stats.
+"""
+from __future__ import annotations
+
+from collections import deque
+from collections.abc import Mapping
+from queue import Queue
+from time import monotonic
+from typing import Any
+
+from flashfocus.display import WMEvent, WMEventType
+from flashfocus.stats import STATS
+
+# Event types in order of priority
+PRIORITIES = [
+    WMEventType.CLIENT_REQUEST,
+    WMEventType.FOCUS_SHIFT,
+    WMEventType.NEW_WINDOW,
+    WMEventType.WINDOW_INIT,
+]
+
+OVERFLOW_POLICIES = ["drop-oldest", "coalesce"]
+
+DEFAULT_SIZE = 1000
+
+DEFAULT_OVERFLOW = {
+    WMEventType.CLIENT_REQUEST: "drop-oldest",
+    WMEventType.FOCUS_SHIFT: "coalesce",
+    WMEventType.NEW_WINDOW: "coalesce",
+    WMEventType.WINDOW_INIT: "coalesce",
+}
+
+
+def event_type_name(event_type: WMEventType) -> str:
+    """The name used for an event type in the config (e.g focus-shift)."""
+    return event_type.name.lower().replace("_", "-")
+
+
+def parse_overflow_policies(overflow: Mapping[str, str] | None) -> dict[WMEventType, str]:
+    """Fill in the default policies for any event types missing from the config."""
+    policies = dict(DEFAULT_OVERFLOW)
+    for name, policy in (overflow or {}).items():
+        policies[WMEventType[name.replace("-", "_").upper()]] = policy
+    return policies
+
+
+class EventQueue(Queue):
+    """A bounded priority queue of `WMEvent`s.
+
+    Like `queue.Queue`, this can be used from multiple threads. Putting an event never blocks, since
+    events are dropped instead when there are too many of the same type.
+
+    Parameters
+    ----------
+    size
+        Maximum number of waiting events of each type.
+    overflow
+        Overflow policy of each event type, by config name (e.g {"focus-shift": "coalesce"}). Types
+        which aren't given use their default policy.
+
+    """
+
+    def __init__(self, size: int = DEFAULT_SIZE, overflow: Mapping[str, str] | None = None) -> None:
+        self.size = size
+        self.overflow = parse_overflow_policies(overflow)
+        super().__init__()
+
+    @classmethod
+    def from_config(cls, config: Mapping) -> EventQueue:
+        queue = cls()
+        queue.configure(config)
+        return queue
+
+    def configure(self, config: Mapping) -> None:
+        """Apply the event queue options of a config.
+
+        If the size is reduced, the excess events are dropped as more events arrive.
+        """
+        self.size = config.get("event_queue_size", DEFAULT_SIZE)
+        self.overflow = parse_overflow_policies(config.get("event_queue_overflow"))
+
+    # The methods below implement the queue.Queue storage interface. They're called with the queue's
+    # mutex held.
+
+    def _init(self, maxsize: int) -> None:
+        self._messages: deque[Any] = deque()
+        self._events: dict[WMEventType, deque[tuple[float, WMEvent]]] = {
+            event_type: deque() for event_type in PRIORITIES
+        }
+
+    def _qsize(self) -> int:
+        return len(self._messages) + sum(len(events) for events in self._events.values())
+
+    def _put(self, item: Any) -> None:
+        if not isinstance(item, WMEvent):
+            self._messages.append(item)
+            return
+        events = self._events[item.event_type]
+        while len(events) >= self.size:
+            self._drop(events, item)
+        events.append((monotonic(), item))
+
+    def _get(self) -> Any:
+        if self._messages:
+            return self._messages.popleft()
+        for event_type in PRIORITIES:
+            events = self._events[event_type]
+            if events:
+                queued_at, event = events.popleft()
+                STATS.observe(f"queue.{event_type.name.lower()}.wait", monotonic() - queued_at)
+                return event
+        raise IndexError("get from an empty EventQueue")
+
+    def _drop(self, events: deque[tuple[float, WMEvent]], new_event: WMEvent) -> None:
+        """Drop an event to make room for `new_event`."""
+        name = new_event.event_type.name.lower()
+        if self.overflow[new_event.event_type] == "coalesce":
+            for i, (_, event) in enumerate(events):
+                if event.window.id == new_event.window.id:
+                    del events[i]
+                    STATS.increment(f"queue.{name}.coalesced")
+                    break
+            else:
+                events.popleft()
+                STATS.increment(f"queue.{name}.dropped")
+        else:
+            events.popleft()
+            STATS.increment(f"queue.{name}.dropped")
+        # Dropped events will never be marked done
+        self.unfinished_tasks -= 1
@@ -1,19 +1,49 @@
 """Flashing windows."""
 from __future__ import annotations
 import logging
-from threading import Thread
-from time import sleep
+import math
+from collections.abc import Callable
+from threading import Lock
+from time import monotonic_ns
+from typing import TYPE_CHECKING, Any
 
-from flashfocus.compat import Window
+from flashfocus.errors import WMError
+from flashfocus.scheduler import DEFAULT_SCHEDULER, Scheduler
+from flashfocus.stats import STATS
+from flashfocus.trace import TRACER
 from flashfocus.types import Number
 
+if TYPE_CHECKING:
+    from flashfocus.compat import Window
+
+# Weight of the latest frame in the moving average of frame latency
+LATENCY_SMOOTHING = 0.2
+
+# Number of frames which must be drawn at a frame count before it is lowered/raised again. Raising
+# the frame count is much slower than lowering it, so that a struggling display server recovers
+# before it is loaded with more frames.
+MIN_FRAMES_BEFORE_DECREASE = 5
+MIN_FRAMES_BEFORE_INCREASE = 50
+
+# The frame count is only raised once the average frame latency is below this fraction of the frame
+# interval at the higher frame count
+INCREASE_THRESHOLD = 0.25
+
+# Tolerance for frame times which fall exactly on a refresh boundary
+REFRESH_TOLERANCE = 1e-6
+
 
 class Flasher:
     """Creates smooth window flash animations.
 
     If a flash is requested on an already flashing window, the first request is
-    restarted and the second request is ignored. This ensures that Flasher
-    threads do not try to draw to the same window at the same time.
+    restarted and the second request is ignored. This ensures that animation
+    frames for the same window are never interleaved.
+
+    If the refresh rate of the output which shows the window is known, frames
+    are paced to it. Each frame is delayed to the end of the refresh interval
+    it falls in, and frames which would fall in the same refresh interval as a
+    later frame are skipped, since the display would never show them.
 
     Parameters
     ----------
@@ -31,6 +61,16 @@ class Flasher:
     simple: bool
         If True, don't animate flashes. Setting this parameter improves
         performance but causes rougher opacity transitions.
+    scheduler: Scheduler
+        Used to schedule animation frames. Defaults to a scheduler which uses the
+        system's monotonic clock.
+    adaptive_frames: bool
+        If True, the number of timepoints adapts to the latency of the display
+        server. Each frame's latency (the time taken by its opacity write) is
+        measured. When writes take longer than the interval between frames, the
+        number of timepoints is halved, down to a single timepoint as in simple
+        mode. Once latency recovers, the number of timepoints is doubled back up
+        to `ntimepoints`.
 
     Attributes
     ----------
@@ -40,8 +80,15 @@ class Flasher:
         Keys are window ids for windows that are currently being flashed. Values
         are indices in the flash_series which define the progress in the flash
         animation.
+    ntimepoints: int
+        The current number of timepoints in the flash animation.
+    max_ntimepoints: int
+        The number of timepoints when the display server isn't struggling.
     timechunk: float
         Number of seconds between opacity transitions.
+    frame_latency: float | None
+        Moving average of frame latency in seconds, since the number of
+        timepoints last changed.
 
     """
 
@@ -52,44 +99,73 @@ class Flasher:
         default_opacity: float,
         simple: bool,
         ntimepoints: int,
+        scheduler: Scheduler | None = None,
+        adaptive_frames: bool = False,
     ) -> None:
+        self.scheduler = scheduler if scheduler is not None else DEFAULT_SCHEDULER
         self.default_opacity = default_opacity
         self.flash_opacity = flash_opacity
         self.time = time / 1000
-        if simple:
-            self.ntimepoints = 1
-            self.timechunk = self.time
-            self.flash_series = [flash_opacity]
-        else:
-            self.ntimepoints = ntimepoints
-            self.timechunk = self.time / self.ntimepoints
-            self.flash_series = self._compute_flash_series()
+        self.adaptive_frames = adaptive_frames
+        self.max_ntimepoints = 1 if simple else ntimepoints
         self.progress: dict[int, int] = {}
+        # Callbacks to run once the flash of each window has finished, by window id
+        self._finish_callbacks: dict[int, list[tuple[Callable[..., Any], tuple]]] = {}
+        # Guards `progress` and the frame count, which are modified both by the server and by
+        # animation frames
+        self._lock = Lock()
+        self.ntimepoints = self.max_ntimepoints
+        self.frame_latency: float | None = None
+        self._set_ntimepoints(self.max_ntimepoints)
 
     def flash(self, window: Window) -> None:
         logging.debug(f"Flashing window {window.id}")
         if self.default_opacity == self.flash_opacity:
             return
 
-        if window.id in self.progress:
-            try:
-                self.progress[window.id] = 0
-            except KeyError:
-                # This happens in rare case that window is deleted from progress
-                # after first if statement
-                self.flash(window)
-        else:
-            p = Thread(target=self._flash, args=[window])
-            p.daemon = True
-            p.start()
+        if TRACER.enabled:
+            TRACER.instant("flash_dispatched", window=window.id)
+        with self._lock:
+            in_progress = window.id in self.progress
+            # If the window is already flashing, this restarts the animation
+            self.progress[window.id] = 0
+        if not in_progress:
+            self.scheduler.call_soon(self._flash_frame, window, _get_refresh_interval(window))
+
+    def fast_forward(self, window: Window) -> None:
+        """Cut short the flash of a window, if it is flashing.
+
+        Rather than continuing the animation, the next frame restores the window to the default
+        opacity.
+        """
+        with self._lock:
+            frame = self.progress.get(window.id)
+            if frame is None or frame >= self.ntimepoints:
+                return
+            self.progress[window.id] = self.ntimepoints
+            skipped = self.ntimepoints - frame
+        logging.debug(f"Fast-forwarding flash of window {window.id}")
+        STATS.increment("flasher.frames_fast_forwarded", skipped)
+
+    def when_finished(self, window: Window, callback: Callable[..., Any], *args: Any) -> None:
+        """Call `callback(*args)` once the flash of a window has finished.
+
+        The callback runs on the scheduler right after the flash's last frame (or a failed frame
+        which ends it). If the window isn't flashing, the callback is called immediately.
+        """
+        with self._lock:
+            if window.id in self.progress:
+                self._finish_callbacks.setdefault(window.id, []).append((callback, args))
+                return
+        callback(*args)
 
     def set_default_opacity(self, window: Window) -> None:
         """Set the opacity of a window to its default."""
-        # This needs to occur in a separate thread or Xorg freaks out and
-        # doesn't allow further changes to window properties
-        p = Thread(target=window.set_opacity, args=[self.default_opacity])
-        p.daemon = True
-        p.start()
+        # This needs to occur outside of the server thread or Xorg freaks out
+        # and doesn't allow further changes to window properties
+        if TRACER.enabled:
+            TRACER.instant("default_opacity_dispatched", window=window.id)
+        self.scheduler.call_soon(self._set_opacity, window, self.default_opacity)
 
     def _compute_flash_series(self) -> list[float]:
         """Calculate the series of opacity values for the flash animation.
@@ -105,20 +181,137 @@ class Flasher:
         ]
         return flash_series
 
-    def _flash(self, window: Window) -> None:
-        """Flash a window.
+    def _set_ntimepoints(self, ntimepoints: int) -> None:
+        """Change the number of timepoints in the flash animation. Called with the lock held.
 
-        This function just iterates across `self.flash_series` and modifies the
-        window opacity accordingly. It waits `self.timechunk` between
-        modifications.
+        Windows which are already flashing continue from the same point in the animation.
         """
-        self.progress[window.id] = 0
-        while self.progress[window.id] < self.ntimepoints:
-            target_opacity = self.flash_series[self.progress[window.id]]
-            window.set_opacity(target_opacity)
-            sleep(self.timechunk)
-            self.progress[window.id] += 1
-
-        logging.debug(f"Resetting window {window.id} opacity to default")
-        window.set_opacity(self.default_opacity)
-        del self.progress[window.id]
+        previous = self.ntimepoints
+        self.ntimepoints = ntimepoints
+        self.timechunk = self.time / ntimepoints
+        self.flash_series = self._compute_flash_series()
+        for window_id, frame in self.progress.items():
+            self.progress[window_id] = round(frame * ntimepoints / previous)
+        self.frame_latency = None
+        self._frames_since_change = 0
+
+    def _record_frame_latency(self, latency: float) -> None:
+        """Adapt the number of timepoints to the latency of a frame. Called with the lock held."""
+        STATS.observe("flasher.frame_latency", latency)
+        if self.frame_latency is None:
+            self.frame_latency = latency
+        else:
+            self.frame_latency += LATENCY_SMOOTHING * (latency - self.frame_latency)
+        self._frames_since_change += 1
+
+        if (
+            self.frame_latency > self.timechunk
+            and self.ntimepoints > 1
+            and self._frames_since_change >= MIN_FRAMES_BEFORE_DECREASE
+        ):
+            ntimepoints = self.ntimepoints // 2
+            STATS.increment("flasher.ntimepoints_decreased")
+        elif (
+            self.frame_latency < INCREASE_THRESHOLD * self.timechunk / 2
+            and self.ntimepoints < self.max_ntimepoints
+            and self._frames_since_change >= MIN_FRAMES_BEFORE_INCREASE
+        ):
+            ntimepoints = min(self.ntimepoints * 2, self.max_ntimepoints)
+            STATS.increment("flasher.ntimepoints_increased")
+        else:
+            return
+        logging.info(
+            f"Average frame latency is {self.frame_latency * 1000:.1f}ms, changing the number of "
+            f"flash timepoints from {self.ntimepoints} to {ntimepoints}"
+        )
+        self._set_ntimepoints(ntimepoints)
+
+    def _next_frame(self, frame: int, refresh_interval: float | None) -> tuple[int, float]:
+        """Find the frame to draw after `frame`. Called with the lock held.
+
+        Returns
+        -------
+        The index of the next frame and the delay until it should be drawn.
+
+        """
+        if refresh_interval is None:
+            return frame + 1, self.timechunk
+
+        def refresh(frame: int) -> int:
+            """The refresh interval (counted from the start of the flash) that a frame ends."""
+            return math.ceil(frame * self.timechunk / refresh_interval - REFRESH_TOLERANCE)
+
+        next_frame = frame + 1
+        # The last frame (which restores the default opacity) is never skipped
+        while next_frame < self.ntimepoints and refresh(next_frame + 1) == refresh(next_frame):
+            next_frame += 1
+        if next_frame > frame + 1:
+            STATS.increment("flasher.frames_skipped", next_frame - frame - 1)
+        return next_frame, (refresh(next_frame) - refresh(frame)) * refresh_interval
+
+    def _flash_frame(self, window: Window, refresh_interval: float | None) -> None:
+        """Draw a single frame of a flash animation.
+
+        Each frame sets the window opacity to the next value in `self.flash_series` and schedules
+        the following frame `self.timechunk` seconds later, or paced to `refresh_interval` if it
+        isn't None. After the last frame the window is restored to the default opacity.
+        """
+        with self._lock:
+            frame = self.progress[window.id]
+            last_frame = frame >= self.ntimepoints
+            if last_frame:
+                del self.progress[window.id]
+                opacity = self.default_opacity
+            else:
+                next_frame, delay = self._next_frame(frame, refresh_interval)
+                self.progress[window.id] = next_frame
+                opacity = self.flash_series[frame]
+
+        if last_frame:
+            logging.debug(f"Resetting window {window.id} opacity to default")
+        # The scheduler runs the frames of every window, so a frame's latency is measured from when
+        # its write starts rather than from when it was due. Otherwise it would include the time
+        # spent on frames of other windows.
+        start = self.scheduler.now()
+        try:
+            self._set_opacity(window, opacity)
+        except Exception:
+            # No more frames will be scheduled, so the window must not be left in `progress`.
+            # Otherwise it would never be flashed again, since it would seem to be flashing already.
+            with self._lock:
+                self.progress.pop(window.id, None)
+            self._finish(window)
+            raise
+        if last_frame:
+            self._finish(window)
+        if self.adaptive_frames:
+            with self._lock:
+                self._record_frame_latency(self.scheduler.now() - start)
+        if not last_frame:
+            self.scheduler.call_later(delay, self._flash_frame, window, refresh_interval)
+
+    def _finish(self, window: Window) -> None:
+        """Run the callbacks waiting for the flash of a window to finish."""
+        with self._lock:
+            callbacks = self._finish_callbacks.pop(window.id, [])
+        for callback, args in callbacks:
+            callback(*args)
+
+    def _set_opacity(self, window: Window, opacity: float) -> None:
+        if not TRACER.enabled:
+            window.set_opacity(opacity)
+            return
+        start = monotonic_ns()
+        window.set_opacity(opacity)
+        TRACER.complete("set_opacity", start, window=window.id, opacity=opacity)
+
+
+def _get_refresh_interval(window: Window) -> float | None:
+    """Get the refresh interval of the output which shows a window, if it is known."""
+    try:
+        interval = window.refresh_interval()
+    except WMError:
+        return None
+    if interval is None or interval <= 0:
+        return None
+    return interval
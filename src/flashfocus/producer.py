@@ -1,24 +1,35 @@
+from __future__ import annotations
+
 from queue import Queue
 from threading import Thread
+from typing import TYPE_CHECKING
 
 from flashfocus.display import BaseWindow, WMEvent, WMEventType
+from flashfocus.trace import TRACER
+
+if TYPE_CHECKING:
+    from flashfocus.event_loop import DispatchQueue
 
 
 class ProducerThread(Thread):
     """Base class for a thread which produces events to be handled by the flashfocus server.
 
+    Producers can also be run without a thread, by the single-threaded event loop in
+    flashfocus.event_loop. In that case `setup` is called instead of `start`, the loop calls
+    `handle_events` whenever `fileno` is readable, and `teardown` is called instead of `stop`.
+
     Attributes
     ----------
     ready: bool
         True if thread is fully initialized and ready to process events
-    queue: Queue
+    queue: Queue | DispatchQueue
         Queue of WMEvents which require processing.
     keep_going: bool
         If this attribute is set to False the thread will attempt to shutdown.
 
     """
 
-    def __init__(self, queue: Queue) -> None:
+    def __init__(self, queue: Queue | DispatchQueue) -> None:
         super().__init__()
         # This is set to True when initialization of the thread is complete and its ready to begin
         # the event loop
@@ -31,10 +42,40 @@ class ProducerThread(Thread):
         # should disconnect from XCB
         self.keep_going = True
 
-    def queue_window(self, window: BaseWindow, event_type: WMEventType) -> None:
-        """Add a window to the queue."""
-        self.queue.put(WMEvent(window=window, event_type=event_type))
+    def queue_window(
+        self,
+        window: BaseWindow,
+        event_type: WMEventType,
+        workspace: int | None = None,
+        screen: int | None = None,
+    ) -> None:
+        """Add a window to the queue, along with the workspace and screen of the event if known."""
+        if TRACER.enabled:
+            TRACER.instant("event_produced", window=window.id, event_type=event_type.name)
+        self.queue.put(
+            WMEvent(window=window, event_type=event_type, workspace=workspace, screen=screen)
+        )
 
     def stop(self) -> None:
         self.keep_going = False
         self.join()
+
+    def setup(self) -> None:
+        """Prepare to produce events without a thread."""
+        self.ready = True
+
+    def fileno(self) -> int | None:
+        """The file descriptor which becomes readable when there are events to handle."""
+        return None
+
+    def handle_events(self) -> None:
+        """Handle any events which are available, without blocking."""
+        pass
+
+    def handle_buffered_events(self) -> None:
+        """Handle events which were read from the file descriptor but not yet handled."""
+        pass
+
+    def teardown(self) -> None:
+        """Clean up after `setup`."""
+        self.keep_going = False
@@ -0,0 +1,169 @@
+"""Profiling the flashfocus daemon.
+
+Work in the daemon is spread across the server thread, the producer threads and the scheduler
+thread which draws the frames of every flash, so a profiler attached to a single thread (e.g
+`cProfile.run`) misses most of it.
+Instead, a background thread periodically samples the stack of every other thread in the process.
+The samples are merged into a single profile which is written in the same format as cProfile, so it
+can be inspected using `python -m pstats` or tools such as snakeviz.
+
+Note that since the profile is statistical, the call counts in the output are the number of samples
+in which a function was observed rather than the true number of calls.
+
+"""
+from __future__ import annotations
+
+import logging
+import marshal
+import os
+import sys
+from collections import Counter
+from pathlib import Path
+from signal import SIGUSR2, signal
+from threading import Lock, Thread, get_ident
+from time import monotonic, sleep
+from types import CodeType, FrameType
+
+# Number of seconds between samples
+DEFAULT_INTERVAL = 0.005
+
+# A function as identified in pstats files: (filename, line number, function name)
+FunctionKey = tuple[str, int, str]
+
+
+def _function_key(code: CodeType) -> FunctionKey:
+    return code.co_filename, code.co_firstlineno, code.co_name
+
+
+class SamplingProfiler(Thread):
+    """Periodically sample the call stacks of all threads in the process.
+
+    Parameters
+    ----------
+    profile_file
+        The merged profile is written to this location when the profiler stops.
+    duration
+        If not None, the profiler stops after this many seconds.
+    interval
+        Number of seconds between samples.
+
+    Attributes
+    ----------
+    keep_going
+        If this attribute is set to False the profiler stops sampling and writes the profile.
+    nsamples
+        Number of samples taken so far.
+
+    """
+
+    def __init__(
+        self, profile_file: Path, duration: float | None = None, interval: float = DEFAULT_INTERVAL
+    ) -> None:
+        super().__init__(daemon=True)
+        self.profile_file = profile_file
+        self.duration = duration
+        self.interval = interval
+        self.keep_going = True
+        self.nsamples = 0
+        self._lock = Lock()
+        # Number of samples (and seconds) where the function was at the top of the stack
+        self._self_samples: Counter[FunctionKey] = Counter()
+        self._self_time: Counter[FunctionKey] = Counter()
+        # Number of samples (and seconds) where the function was anywhere in the stack
+        self._total_samples: Counter[FunctionKey] = Counter()
+        self._total_time: Counter[FunctionKey] = Counter()
+        # As above, but for each (caller, callee) pair
+        self._call_samples: Counter[tuple[FunctionKey, FunctionKey]] = Counter()
+        self._call_time: Counter[tuple[FunctionKey, FunctionKey]] = Counter()
+
+    def run(self) -> None:
+        own_id = get_ident()
+        start = last_sample = monotonic()
+        while self.keep_going:
+            sleep(self.interval)
+            now = monotonic()
+            # Weight each sample by the time elapsed since the last one, since the sampling interval
+            # is not exact
+            elapsed = now - last_sample
+            last_sample = now
+            with self._lock:
+                for thread_id, frame in sys._current_frames().items():
+                    if thread_id != own_id:
+                        self._sample(frame, elapsed)
+                self.nsamples += 1
+            if self.duration is not None and now - start >= self.duration:
+                logging.info("Profiling duration elapsed")
+                break
+        self.dump()
+
+    def stop(self) -> None:
+        self.keep_going = False
+        if self.is_alive():
+            self.join()
+
+    def _sample(self, frame: FrameType | None, elapsed: float) -> None:
+        """Record the stack of a single thread."""
+        stack = []
+        while frame is not None:
+            stack.append(_function_key(frame.f_code))
+            frame = frame.f_back
+        if not stack:
+            return
+        self._self_samples[stack[0]] += 1
+        self._self_time[stack[0]] += elapsed
+        # Recursive functions should only be counted once per sample
+        for function in set(stack):
+            self._total_samples[function] += 1
+            self._total_time[function] += elapsed
+        for call in set(zip(stack[1:], stack)):
+            self._call_samples[call] += 1
+            self._call_time[call] += elapsed
+
+    def get_stats(self) -> dict:
+        """Get the profile as a dictionary in the format used by `pstats`."""
+        with self._lock:
+            callers: dict[FunctionKey, dict] = {function: {} for function in self._total_samples}
+            for (caller, callee), count in self._call_samples.items():
+                callers[callee][caller] = (count, count, 0.0, self._call_time[(caller, callee)])
+            return {
+                function: (
+                    count,
+                    count,
+                    self._self_time[function],
+                    self._total_time[function],
+                    callers[function],
+                )
+                for function, count in self._total_samples.items()
+            }
+
+    def dump(self) -> None:
+        """Write the profile collected so far to `profile_file`."""
+        try:
+            # The profile may be dumped by a SIGUSR2 and by the profiler thread at the same time, so
+            # each writes its own temporary file which then replaces the profile in one step
+            tmp_file = self.profile_file.with_suffix(f".{os.getpid()}.{get_ident()}.tmp")
+            with tmp_file.open("wb") as f:
+                marshal.dump(self.get_stats(), f)
+            tmp_file.replace(self.profile_file)
+        except OSError as error:
+            logging.error(f"Failed to write profile: {error}")
+        else:
+            logging.info(f"Wrote profile of {self.nsamples} samples to {self.profile_file}")
+
+
+def start_profiling(profile_file: Path, duration: float | None = None) -> SamplingProfiler:
+    """Start profiling the process.
+
+    The profile is written to `profile_file` when the profiler is stopped, after `duration` seconds,
+    or whenever a SIGUSR2 is received.
+
+    """
+    profiler = SamplingProfiler(profile_file, duration=duration)
+
+    def dump_profile(signum: int, frame: FrameType | None) -> None:
+        profiler.dump()
+
+    signal(SIGUSR2, dump_profile)
+    profiler.start()
+    logging.info(f"Profiling enabled, send SIGUSR2 to pid {os.getpid()} to write {profile_file}")
+    return profiler
@@ -0,0 +1,91 @@
+"""Recording window manager events to a file.
+
+When recording is enabled, every `WMEvent` handled by the server is written to a JSON lines file
+along with the time it was handled and the window state that the router uses to decide how to
+handle it. A recording can be fed back through flashfocus with `flashfocus-replay` (see
+flashfocus.replay) to reproduce a performance problem offline.
+
+This module doesn't depend on flashfocus.compat so that recordings can be read without connecting to
+a display.
+
+"""
+from __future__ import annotations
+
+import json
+import logging
+from collections.abc import Iterator
+from dataclasses import asdict, dataclass
+from pathlib import Path
+from time import monotonic
+from typing import TextIO
+
+from flashfocus.display import WMEvent
+
+
+@dataclass
+class RecordedEvent:
+    """A single recorded event.
+
+    Attributes
+    ----------
+    time
+        Seconds since the recording started.
+    event_type
+        Name of the event's `WMEventType`.
+    window
+        Id of the window in the display that the event was recorded from.
+    properties
+        Properties of the window (used by the router for rule matching).
+    workspace
+        The workspace that the window was on.
+    fullscreen
+        Whether the window was fullscreen.
+
+    """
+
+    time: float
+    event_type: str
+    window: int
+    properties: dict
+    workspace: int | None
+    fullscreen: bool
+
+
+class EventRecorder:
+    """Writes events to a JSON lines file as they are handled."""
+
+    def __init__(self, record_file: Path) -> None:
+        self.record_file = record_file
+        self.nevents = 0
+        self._start: float | None = None
+        self._file: TextIO = record_file.open("w")
+
+    def record(self, event: WMEvent, workspace: int | None) -> None:
+        """Record an event, along with the workspace of the event's window."""
+        now = monotonic()
+        if self._start is None:
+            self._start = now
+        recorded_event = RecordedEvent(
+            time=now - self._start,
+            event_type=event.event_type.name,
+            window=event.window.id,
+            properties=event.window.properties,
+            workspace=workspace,
+            fullscreen=event.window.is_fullscreen(),
+        )
+        self._file.write(json.dumps(asdict(recorded_event)) + "\n")
+        # Flush each event so that the recording survives the daemon being killed
+        self._file.flush()
+        self.nevents += 1
+
+    def close(self) -> None:
+        self._file.close()
+        logging.info(f"Recorded {self.nevents} events to {self.record_file}")
+
+
+def read_recording(record_file: Path) -> Iterator[RecordedEvent]:
+    """Read the events from a recording in the order they were recorded."""
+    with record_file.open() as f:
+        for line in f:
+            if line.strip():
+                yield RecordedEvent(**json.loads(line))
@@ -0,0 +1,356 @@
+"""Replay a recording of window manager events through flashfocus.
+
+Recordings are made by running `flashfocus --record FILE` (see flashfocus.recording). Replaying
+feeds each recorded event through a `FlashRouter` in the same order (and optionally with the same
+timing) as it was originally handled, and reports how quickly the events were processed. This
+allows performance problems tied to a specific pattern of focus changes to be reproduced offline.
+
+Events are replayed against one of the following display backends:
+
+fake
+    A simulated in-memory display (see flashfocus.display_protocols.fake). Recorded windows are
+    recreated with their original properties, workspaces and fullscreen state.
+x11
+    The X server in $DISPLAY (e.g Xvfb). Recorded windows are recreated as real X windows. If no
+    window manager is running, the EWMH client list and window desktops are maintained by the
+    replay itself.
+sway
+    The compositor listening on $SWAYSOCK (e.g the stub compositor in tests/sway_stub.py). Windows
+    can't be created over sway IPC, so recorded windows are mapped onto the windows which already
+    exist in the compositor in order of first appearance.
+
+"""
+from __future__ import annotations
+
+import json
+import logging
+import os
+import statistics
+from abc import ABC, abstractmethod
+from collections.abc import Sequence
+from pathlib import Path
+from time import perf_counter, sleep
+from typing import TYPE_CHECKING, Any
+
+import click
+
+from flashfocus import compat
+from flashfocus.config import (
+    CLI_ONLY_OPTS,
+    find_config_file,
+    get_default_config_file,
+    load_merged_config,
+)
+from flashfocus.errors import WMError
+from flashfocus.logging import setup_logging
+from flashfocus.recording import RecordedEvent, read_recording
+from flashfocus.router import FlashRouter
+
+if TYPE_CHECKING:
+    from flashfocus.display import BaseWindow
+
+logging.basicConfig(level="WARNING", format="%(levelname)s: %(message)s")
+
+# The fake backend's window properties
+FAKE_WINDOW_PROPERTIES = {"window_class", "window_id", "app_id", "window_name"}
+
+
+class ReplayTarget(ABC):
+    """Recreates recorded windows in a display backend.
+
+    Attributes
+    ----------
+    windows
+        Mapping of the window ids in the recording to the windows which represent them.
+
+    """
+
+    def __init__(self) -> None:
+        self.windows: dict[int, BaseWindow] = {}
+
+    def get_window(self, event: RecordedEvent) -> BaseWindow:
+        """Get the window which represents the window in a recorded event."""
+        window = self.windows.get(event.window)
+        if window is None:
+            window = self.windows[event.window] = self.create_window(event)
+        return window
+
+    @abstractmethod
+    def create_window(self, event: RecordedEvent) -> BaseWindow:
+        pass
+
+    def update(self, window: BaseWindow, event: RecordedEvent) -> None:
+        """Update the display to match the state recorded with an event."""
+        pass
+
+    def cleanup(self) -> None:
+        pass
+
+
+class FakeTarget(ReplayTarget):
+    def __init__(self) -> None:
+        super().__init__()
+        from flashfocus.display_protocols.fake import DISPLAY
+
+        self.display = DISPLAY
+
+    def create_window(self, event: RecordedEvent) -> BaseWindow:
+        properties = {
+            key: value for key, value in event.properties.items() if key in FAKE_WINDOW_PROPERTIES
+        }
+        workspace = event.workspace if event.workspace is not None else 0
+        return self.display.create_window(workspace=workspace, **properties)
+
+    def update(self, window: BaseWindow, event: RecordedEvent) -> None:
+        state = self.display.get_state(window.id)
+        if event.workspace is not None and state.workspace != event.workspace:
+            # The window was moved to another workspace, recreate it there
+            self.display.destroy_window(window.id)
+            window = self.windows[event.window] = self.create_window(event)
+        if event.event_type == "FOCUS_SHIFT":
+            self.display.focus(window.id)
+        self.display.set_fullscreen(window.id, event.fullscreen)
+
+
+class X11Target(ReplayTarget):
+    def __init__(self) -> None:
+        super().__init__()
+        import xpybutil
+        from xpybutil.ewmh import get_supporting_wm_check
+
+        if xpybutil.conn is None:
+            raise click.ClickException("Could not connect to the X server")
+        self.conn = xpybutil.conn
+        self.root = xpybutil.root
+        # Without a window manager nobody else will maintain the EWMH properties used by flashfocus
+        self.manage_ewmh = get_supporting_wm_check(self.root).reply() is None
+
+    def create_window(self, event: RecordedEvent) -> BaseWindow:
+        from xcffib.xproto import WindowClass
+
+        screen = self.conn.get_setup().roots[0]
+        window = compat.Window(self.conn.generate_id())
+        self.conn.core.CreateWindow(
+            depth=screen.root_depth,
+            wid=window.id,
+            parent=self.root,
+            x=0,
+            y=0,
+            width=640,
+            height=480,
+            border_width=0,
+            _class=WindowClass.InputOutput,
+            visual=screen.root_visual,
+            value_mask=0,
+            value_list=[],
+            is_checked=True,
+        ).check()
+        self.conn.core.MapWindow(window.id)
+        if event.properties.get("window_class"):
+            window.set_class(
+                event.properties.get("window_id") or "", event.properties["window_class"]
+            )
+        if self.manage_ewmh:
+            from xpybutil.ewmh import set_client_list_checked
+
+            set_client_list_checked([*(w.id for w in self.windows.values()), window.id]).check()
+        self.conn.flush()
+        return window
+
+    def update(self, window: BaseWindow, event: RecordedEvent) -> None:
+        if not self.manage_ewmh:
+            return
+        from xpybutil.ewmh import (
+            set_active_window_checked,
+            set_current_desktop_checked,
+            set_wm_desktop_checked,
+            set_wm_state_checked,
+        )
+        from xpybutil.util import get_atom
+
+        if event.workspace is not None:
+            set_wm_desktop_checked(window.id, event.workspace).check()
+        states = [get_atom("_NET_WM_STATE_FULLSCREEN")] if event.fullscreen else []
+        set_wm_state_checked(window.id, states).check()
+        if event.event_type == "FOCUS_SHIFT":
+            set_active_window_checked(window.id).check()
+            if event.workspace is not None:
+                set_current_desktop_checked(event.workspace).check()
+
+    def cleanup(self) -> None:
+        for window in self.windows.values():
+            try:
+                window.destroy()
+            except WMError:
+                pass
+        if self.manage_ewmh:
+            from xpybutil.ewmh import set_client_list_checked
+
+            set_client_list_checked([]).check()
+        self.conn.flush()
+
+
+class SwayTarget(ReplayTarget):
+    def __init__(self) -> None:
+        super().__init__()
+        self.available = sorted(compat.list_mapped_windows(), key=lambda window: window.id)
+
+    def create_window(self, event: RecordedEvent) -> BaseWindow:
+        if len(self.windows) >= len(self.available):
+            raise click.ClickException(
+                f"The recording contains more than the {len(self.available)} windows available in "
+                "the compositor"
+            )
+        return self.available[len(self.windows)]
+
+
+TARGETS: dict[str, type[ReplayTarget]] = {
+    "fake": FakeTarget,
+    "x11": X11Target,
+    "sway": SwayTarget,
+}
+
+
+def _summarize(samples: Sequence[float]) -> dict:
+    """Summary statistics of a series of timings."""
+    if not samples:
+        return {}
+    ordered = sorted(samples)
+    return {
+        "median": statistics.median(ordered),
+        "p95": ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))],
+        "max": ordered[-1],
+    }
+
+
+def replay(
+    events: Sequence[RecordedEvent], router: FlashRouter, target: ReplayTarget, speed: float
+) -> dict[str, Any]:
+    """Feed recorded events through a router.
+
+    Parameters
+    ----------
+    events
+        The recorded events.
+    router
+        Router used to handle the events.
+    target
+        Recreates the recorded windows in the display.
+    speed
+        Events are replayed at this multiple of their recorded speed. If 0, events are replayed as
+        fast as possible.
+
+    Returns
+    -------
+    A report of how quickly the events were handled. All times are in seconds.
+
+    """
+    from flashfocus.display import WMEvent, WMEventType
+
+    route_times = []
+    lag = []
+    nerrors = 0
+    start = perf_counter()
+    for event in events:
+        if speed:
+            delay = start + event.time / speed - perf_counter()
+            if delay > 0:
+                sleep(delay)
+            # How late the event was handled relative to the recording
+            lag.append(max(-delay, 0))
+        window = target.get_window(event)
+        target.update(window, event)
+        # The target may have needed to replace the window
+        window = target.get_window(event)
+        route_start = perf_counter()
+        try:
+            router.route_request(WMEvent(window=window, event_type=WMEventType[event.event_type]))
+        except WMError:
+            nerrors += 1
+        route_times.append(perf_counter() - route_start)
+    dispatched = perf_counter()
+    # Wait for any animations that are still running to finish
+    while any(flasher.progress for flasher in router.flashers):
+        sleep(0.001)
+    end = perf_counter()
+    return {
+        "events": len(events),
+        "errors": nerrors,
+        "duration": end - start,
+        "throughput": len(events) / (dispatched - start) if dispatched > start else 0,
+        "route_time": _summarize(route_times),
+        "lag": _summarize(lag),
+        "drain_time": end - dispatched,
+    }
+
+
+def format_report(report: dict[str, Any]) -> str:
+    lines = [
+        f"Replayed {report['events']} events in {report['duration']:.3f}s "
+        f"({report['errors']} errors)",
+        f"Throughput: {report['throughput']:.1f} events/s",
+    ]
+    for key, label in [("route_time", "Routing time"), ("lag", "Dispatch lag")]:
+        if report[key]:
+            stats = ", ".join(f"{stat} {value * 1000:.3f}ms" for stat, value in report[key].items())
+            lines.append(f"{label}: {stats}")
+    lines.append(f"Time to finish animations after the last event: {report['drain_time']:.3f}s")
+    return "\n".join(lines)
+
+
+@click.command()
+@click.argument("recording", type=click.Path(exists=True, dir_okay=False))
+@click.option(
+    "--backend",
+    "-b",
+    type=click.Choice(list(TARGETS)),
+    default="fake",
+    help="Display backend to replay the events against. (default: fake)",
+)
+@click.option(
+    "--speed",
+    "-s",
+    type=click.FloatRange(min=0),
+    default=1.0,
+    help="Replay events at this multiple of the recorded speed. If 0, events are replayed as fast "
+    "as possible. (default: 1)",
+)
+@click.option(
+    "--config",
+    "-c",
+    required=False,
+    default=None,
+    help="Config file location. Defaults to the user's config file.",
+)
+@click.option("--json", "as_json", is_flag=True, help="Print the report as JSON.")
+@click.option(
+    "--verbosity",
+    "-v",
+    required=False,
+    default="WARNING",
+    type=click.Choice(["INFO", "WARNING", "DEBUG", "ERROR"]),
+    help="Set the logging verbosity.",
+)
+def cli(
+    recording: str, backend: str, speed: float, config: str | None, as_json: bool, verbosity: str
+) -> None:
+    """Replay a RECORDING made with `flashfocus --record` and report the time taken."""
+    setup_logging(verbosity)
+    # The display backend is loaded the first time it's used, so this must happen before anything
+    # else touches the display
+    os.environ[compat.DISPLAY_PROTOCOL_ENV_VAR] = backend
+    config_file = Path(config) if config else find_config_file() or get_default_config_file()
+    merged_config = load_merged_config(config_file, {opt: None for opt in CLI_ONLY_OPTS})
+    events = list(read_recording(Path(recording)))
+    target = TARGETS[backend]()
+    try:
+        router = FlashRouter(merged_config)
+        report = replay(events, router, target, speed)
+    finally:
+        target.cleanup()
+    logging.info(f"Replayed {recording} against the {backend} backend")
+    click.echo(json.dumps(report) if as_json else format_report(report))
+
+
+if __name__ == "__main__":
+    cli()
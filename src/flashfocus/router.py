@@ -9,11 +9,27 @@ passes the request on to the Flasher whose criteria match the window.
 from __future__ import annotations
 import logging
 from collections.abc import Mapping
+from typing import TYPE_CHECKING
 
-from flashfocus.compat import Window, get_focused_workspace, get_workspace, list_mapped_windows
+from flashfocus import compat
 from flashfocus.display import WMEvent, WMEventType
-from flashfocus.errors import UnexpectedMessageType
+from flashfocus.errors import UnexpectedMessageType, WMError
 from flashfocus.flasher import Flasher
+from flashfocus.scheduler import Scheduler
+from flashfocus.trace import TRACER
+
+if TYPE_CHECKING:
+    from flashfocus.compat import Window
+
+# Config parameters which are passed on to each Flasher
+FLASHER_PARAMS = [
+    "default_opacity",
+    "flash_opacity",
+    "simple",
+    "ntimepoints",
+    "adaptive_frames",
+    "time",
+]
 
 
 class FlashRouter:
@@ -32,6 +48,8 @@ class FlashRouter:
         Set of rule parameters from user config. Must include all `Flasher`
         parameters, `flash_on_focus` setting and `window_id` and/or
         `window_class`.
+    scheduler
+        Scheduler used to time flash animations. Uses the system clock if None.
 
     Attributes
     ----------
@@ -46,59 +64,106 @@ class FlashRouter:
         The id of the current focused workspace
     prev_workspace
         The id of the previously focused workspace
+    current_screen
+        The root window of the X11 screen of the current workspace (None if unknown or not X11)
+    prev_screen
+        The root window of the X11 screen of the previous workspace
     prev_focus
         The id of the previously focused window. We keep track of this so that
         the same window is never flashed consecutively. When a window is closed
         in i3, the next window is flashed 3 times without this guard
+    fast_forward
+        True if any rule cuts short the flash of a window which loses focus.
 
     """
 
-    def __init__(self, config: Mapping) -> None:
-        if config.get("rules") is None:
-            self.rules: list[dict] = []
-        else:
-            self.rules = config["rules"]
+    def __init__(self, config: Mapping, scheduler: Scheduler | None = None) -> None:
+        self.scheduler = scheduler
+        self.rules: list[dict] = []
         self.flashers: list[Flasher] = []
+        self._flashers_by_params: dict[tuple, Flasher] = {}
+        self._configure(config)
+        self.prev_focus: Window | None = None
+        self.prev_workspace: int | None = None
+        self.current_workspace: int | None = None
+        self.prev_screen: int | None = None
+        self.current_screen: int | None = None
+        if self.track_workspaces:
+            self.prev_workspace = self.current_workspace
+            self.current_workspace = compat.get_focused_workspace()
+
+    def reload(self, config: Mapping) -> None:
+        """Replace the rules and flashers with those from a new config.
+
+        Flashers whose parameters are unchanged are kept, along with any flashes they have in
+        progress. Windows are only reset to their default opacity if the default opacity of the rule
+        that they match has changed.
+        """
+        old_rules, old_flashers = self.rules, self.flashers
+        self._configure(config)
+        if self.track_workspaces and self.current_workspace is None:
+            self.current_workspace = compat.get_focused_workspace()
+
+        if len({flasher.default_opacity for flasher in old_flashers + self.flashers}) == 1:
+            # Every window keeps the same default opacity, so there's no need to look at them
+            return
+        for window in compat.list_mapped_windows():
+            try:
+                old_flasher = _find_flasher(window, old_rules, old_flashers)
+                _, flasher = self._match(window)
+            except WMError:
+                # The window was probably closed while we were iterating
+                continue
+            if flasher.default_opacity == old_flasher.default_opacity:
+                continue
+            logging.debug(f"Default opacity of window {window.id} changed, resetting...")
+            # Let any flash in progress finish before resetting the window, so that its last frame
+            # doesn't overwrite the new default opacity
+            old_flasher.when_finished(window, flasher.set_default_opacity, window)
+
+    def _configure(self, config: Mapping) -> None:
+        """Build the rules and flashers for a config, reusing existing flashers where possible."""
+        existing = self._flashers_by_params
+        rules: list[dict] = [] if config.get("rules") is None else config["rules"]
         # We only need to track the user's workspace if the user config requires it
         self.track_workspaces = config["flash_lone_windows"] != "always"
-        for rule_config in self.rules:
+        self.fast_forward = config["fast_forward_on_unfocus"]
+        param_sets = []
+        for rule_config in rules:
             if rule_config["flash_lone_windows"] != "always":
                 self.track_workspaces = True
-            rule_flasher = Flasher(
-                default_opacity=rule_config.get("default_opacity", config["default_opacity"]),
-                flash_opacity=rule_config.get("flash_opacity", config["flash_opacity"]),
-                simple=rule_config.get("simple", config["simple"]),
-                ntimepoints=rule_config.get("ntimepoints", config["ntimepoints"]),
-                time=rule_config.get("time", config["time"]),
+            if rule_config.get("fast_forward_on_unfocus"):
+                self.fast_forward = True
+            param_sets.append(
+                {param: rule_config.get(param, config[param]) for param in FLASHER_PARAMS}
             )
-            self.flashers.append(rule_flasher)
         default_rule = {
             "flash_on_focus": config["flash_on_focus"],
             "flash_lone_windows": config["flash_lone_windows"],
             "flash_fullscreen": config["flash_fullscreen"],
+            "fast_forward_on_unfocus": config["fast_forward_on_unfocus"],
         }
-        self.rules.append(default_rule)
-        default_flasher = Flasher(
-            default_opacity=config["default_opacity"],
-            flash_opacity=config["flash_opacity"],
-            simple=config["simple"],
-            ntimepoints=config["ntimepoints"],
-            time=config["time"],
-        )
-        self.flashers.append(default_flasher)
-        self.prev_focus: Window | None = None
-        self.prev_workspace: int | None = None
-        self.current_workspace: int | None = None
-        if self.track_workspaces:
-            self.prev_workspace = self.current_workspace
-            self.current_workspace = get_focused_workspace()
+        rules.append(default_rule)
+        param_sets.append({param: config[param] for param in FLASHER_PARAMS})
+
+        flashers = []
+        self._flashers_by_params = {}
+        for params in param_sets:
+            key = tuple(params[param] for param in FLASHER_PARAMS)
+            flasher = existing.get(key)
+            if flasher is None:
+                flasher = Flasher(**params, scheduler=self.scheduler)
+            self._flashers_by_params[key] = flasher
+            flashers.append(flasher)
+        self.rules = rules
+        self.flashers = flashers
 
     def route_request(self, message: WMEvent) -> None:
         """Match a window against rule criteria and handle the request according to it's type."""
         if message.event_type is WMEventType.FOCUS_SHIFT:
-            self._route_focus_shift(message.window)
+            self._route_focus_shift(message.window, message.workspace, message.screen)
         elif message.event_type is WMEventType.NEW_WINDOW:
-            self._route_new_window(message.window)
+            self._route_new_window(message.window, message.workspace, message.screen)
         elif message.event_type is WMEventType.CLIENT_REQUEST:
             self._route_client_request(message.window)
         elif message.event_type is WMEventType.WINDOW_INIT:
@@ -106,10 +171,12 @@ class FlashRouter:
         else:
             raise UnexpectedMessageType()
 
-    def _route_new_window(self, window: Window) -> None:
+    def _route_new_window(
+        self, window: Window, workspace: int | None = None, screen: int | None = None
+    ) -> None:
         """Handle a new window being mapped."""
         rule, flasher = self._match(window)
-        if self._config_allows_flash(window, rule):
+        if self._config_allows_flash(window, rule, workspace, screen):
             # This will set the window to the default opacity afterwards
             flasher.flash(window)
         else:
@@ -120,18 +187,32 @@ class FlashRouter:
         _, flasher = self._match(window)
         flasher.set_default_opacity(window)
 
-    def _route_focus_shift(self, window: Window) -> None:
+    def _route_focus_shift(
+        self, window: Window, workspace: int | None = None, screen: int | None = None
+    ) -> None:
         """Handle a shift in the focused window."""
         if self.prev_focus is None or self.prev_focus != window:
+            if self.fast_forward and self.prev_focus is not None:
+                self._fast_forward(self.prev_focus)
             self.prev_focus = window
             rule, flasher = self._match(window)
-            if self._config_allows_flash(window, rule):
+            if self._config_allows_flash(window, rule, workspace, screen, focused=True):
                 flasher.flash(window)
             else:
                 flasher.set_default_opacity(window)
         else:
             logging.debug(f"Window {window.id} was just flashed, ignoring...")
 
+    def _fast_forward(self, window: Window) -> None:
+        """Cut short the flash of a window which lost focus, if its rule allows it."""
+        try:
+            rule, flasher = self._match(window)
+        except WMError:
+            # The window was probably closed
+            return
+        if rule.get("fast_forward_on_unfocus"):
+            flasher.fast_forward(window)
+
     def _route_client_request(self, window: Window) -> None:
         """Handle a manual flash request from the user."""
         _, flasher = self._match(window)
@@ -143,37 +224,59 @@ class FlashRouter:
             if window.match(rule):
                 if i < len(self.rules) - 1:
                     logging.debug(f"Window {window.id} matches criteria of rule {i}")
+                if TRACER.enabled:
+                    TRACER.instant("rule_matched", window=window.id, rule=i)
                 return rule, flasher
         return rule, flasher
 
-    def _config_allows_flash(self, window: Window, rule: Mapping) -> bool:
+    def _config_allows_flash(
+        self,
+        window: Window,
+        rule: Mapping,
+        workspace: int | None = None,
+        screen: int | None = None,
+        focused: bool = False,
+    ) -> bool:
         """Check whether a config parameter disallows a window from flashing.
 
+        Parameters
+        ----------
+        window
+            The window which would be flashed.
+        rule
+            The rule which matches the window.
+        workspace
+            The workspace of the event, if the display handler knew it when queueing the event.
+        screen
+            The X11 screen of the event, if known. Desktops are numbered separately on each screen.
+        focused
+            True if the window was just focused, in which case it must be on the focused workspace.
+
         Returns
         -------
         If window should be flashed, this function returns True, else False.
 
         """
         if self.track_workspaces:
-            self.prev_workspace = self.current_workspace
-            self.current_workspace = get_workspace(window)
+            self.prev_workspace, self.prev_screen = self.current_workspace, self.current_screen
+            if workspace is None:
+                workspace = (
+                    compat.get_focused_workspace() if focused else compat.get_workspace(window)
+                )
+            self.current_workspace, self.current_screen = workspace, screen
 
         if not rule.get("flash_on_focus"):
             logging.debug(f"flash_on_focus is False for window {window.id}, ignoring...")
             return False
 
         if rule.get("flash_lone_windows") != "always":
-            if len(list_mapped_windows(self.current_workspace)) < 2:
+            windows = compat.list_mapped_windows(self.current_workspace, self.current_screen)
+            if len(windows) < 2:
+                switched = self._switched_workspace()
                 if (
                     rule.get("flash_lone_windows") == "never"
-                    or (
-                        self.current_workspace != self.prev_workspace
-                        and rule.get("flash_lone_windows") == "on_open_close"
-                    )
-                    or (
-                        self.current_workspace == self.prev_workspace
-                        and rule.get("flash_lone_windows") == "on_switch"
-                    )
+                    or (switched and rule.get("flash_lone_windows") == "on_open_close")
+                    or (not switched and rule.get("flash_lone_windows") == "on_switch")
                 ):
                     logging.debug("Current workspace has <2 windows, ignoring...")
                     return False
@@ -184,3 +287,23 @@ class FlashRouter:
                 return False
 
         return True
+
+    def _switched_workspace(self) -> bool:
+        """Check whether the current workspace differs from the previous one."""
+        if self.current_workspace != self.prev_workspace:
+            return True
+        # The same desktop number on different screens is a different workspace. The screen may be
+        # unknown (e.g at startup), in which case only the workspace numbers are compared.
+        return (
+            self.current_screen is not None
+            and self.prev_screen is not None
+            and self.current_screen != self.prev_screen
+        )
+
+
+def _find_flasher(window: Window, rules: list[dict], flashers: list[Flasher]) -> Flasher:
+    """Find the flasher of the first rule which matches a window."""
+    for rule, flasher in zip(rules, flashers):
+        if window.match(rule):
+            return flasher
+    return flasher
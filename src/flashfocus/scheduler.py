@@ -0,0 +1,135 @@
+"""Scheduling delayed work.
+
+All timing in the flasher and server goes through a `Scheduler`, so that it can be swapped out for a
+`ManualScheduler` in tests and benchmarks. The manual scheduler only moves forward in time when told
+to, which allows animations to be tested deterministically without waiting on the wall clock.
+
+"""
+from __future__ import annotations
+
+import heapq
+import logging
+from abc import ABC, abstractmethod
+from collections.abc import Callable
+from itertools import count
+from threading import Condition, Thread
+from time import monotonic
+from typing import Any
+
+# A scheduled callback: (deadline, sequence number, callback, args). The sequence number ensures
+# that callbacks with the same deadline run in the order they were scheduled.
+Job = tuple[float, int, Callable[..., Any], tuple]
+
+
+class Scheduler(ABC):
+    """A clock which can run callbacks at a point in the future."""
+
+    @abstractmethod
+    def now(self) -> float:
+        """Get the current time in seconds."""
+        pass
+
+    @abstractmethod
+    def call_later(self, delay: float, callback: Callable[..., Any], *args: Any) -> None:
+        """Run `callback(*args)` after `delay` seconds."""
+        pass
+
+    def call_soon(self, callback: Callable[..., Any], *args: Any) -> None:
+        """Run `callback(*args)` as soon as possible."""
+        self.call_later(0, callback, *args)
+
+
+def _run_job(job: Job) -> None:
+    _, _, callback, args = job
+    try:
+        callback(*args)
+    except Exception:
+        # An error in one callback shouldn't prevent other callbacks from running
+        logging.exception(f"Error in scheduled callback {callback}")
+
+
+class MonotonicScheduler(Scheduler):
+    """Runs callbacks in a background thread using the system's monotonic clock.
+
+    The thread is started when the first callback is scheduled.
+    """
+
+    def __init__(self) -> None:
+        self._jobs: list[Job] = []
+        self._sequence = count()
+        self._condition = Condition()
+        self._thread: Thread | None = None
+
+    def now(self) -> float:
+        return monotonic()
+
+    def call_later(self, delay: float, callback: Callable[..., Any], *args: Any) -> None:
+        with self._condition:
+            heapq.heappush(self._jobs, (monotonic() + delay, next(self._sequence), callback, args))
+            if self._thread is None:
+                self._thread = Thread(target=self._run, daemon=True)
+                self._thread.start()
+            self._condition.notify()
+
+    @property
+    def pending(self) -> int:
+        """Number of callbacks which have been scheduled but not run."""
+        with self._condition:
+            return len(self._jobs)
+
+    def _run(self) -> None:
+        while True:
+            with self._condition:
+                while not self._jobs or self._jobs[0][0] > monotonic():
+                    timeout = self._jobs[0][0] - monotonic() if self._jobs else None
+                    self._condition.wait(timeout)
+                job = heapq.heappop(self._jobs)
+            _run_job(job)
+
+
+class ManualScheduler(Scheduler):
+    """A scheduler whose clock only moves forward when `advance` is called.
+
+    Callbacks are run synchronously by the thread which calls `advance`.
+    """
+
+    def __init__(self) -> None:
+        self._now = 0.0
+        self._jobs: list[Job] = []
+        self._sequence = count()
+
+    def now(self) -> float:
+        return self._now
+
+    def call_later(self, delay: float, callback: Callable[..., Any], *args: Any) -> None:
+        heapq.heappush(self._jobs, (self._now + delay, next(self._sequence), callback, args))
+
+    @property
+    def pending(self) -> int:
+        """Number of callbacks which have been scheduled but not run."""
+        return len(self._jobs)
+
+    def advance(self, seconds: float) -> None:
+        """Move the clock forward, running any callbacks which are due in order."""
+        if seconds < 0:
+            raise ValueError("Time cannot move backwards")
+        end = self._now + seconds
+        while self._jobs and self._jobs[0][0] <= end:
+            job = heapq.heappop(self._jobs)
+            self._now = max(self._now, job[0])
+            _run_job(job)
+        # Callbacks may have slept past the end
+        self._now = max(self._now, end)
+
+    def sleep(self, seconds: float) -> None:
+        """Move the clock forward without running any callbacks, to simulate slow work."""
+        self._now += seconds
+
+    def run_until_idle(self) -> None:
+        """Advance the clock until no callbacks remain."""
+        while self._jobs:
+            self.advance(max(self._jobs[0][0] - self._now, 0))
+
+
+# Shared by all classes which aren't given an explicit scheduler
+DEFAULT_SCHEDULER = MonotonicScheduler()
@@ -1,23 +1,32 @@
 """Flash windows on focus."""
 from __future__ import annotations
 import logging
+from collections import namedtuple
+from collections.abc import Callable
 from queue import Empty, Queue
 from signal import SIGINT, default_int_handler, signal
+from threading import Thread
+from time import monotonic
 
+from flashfocus import compat
 from flashfocus.client import ClientMonitor
-from flashfocus.compat import (
-    DisplayHandler,
-    disconnect_display_conn,
-    list_mapped_windows,
-)
 from flashfocus.display import WMEvent, WMEventType
-from flashfocus.errors import UnexpectedMessageType, WMError
+from flashfocus.errors import ConfigLoadError, UnexpectedMessageType, WMError
+from flashfocus.event_loop import DispatchQueue, EventLoop
+from flashfocus.event_queue import EventQueue
 from flashfocus.producer import ProducerThread
+from flashfocus.recording import EventRecorder
 from flashfocus.router import FlashRouter
+from flashfocus.scheduler import Scheduler
+from flashfocus.stats import STATS
+from flashfocus.trace import TRACER
 
 # Ensure that SIGINTs are handled correctly
 signal(SIGINT, default_int_handler)
 
+# Queued by `FlashServer.request_reload` once the new config has been loaded
+ConfigReload = namedtuple("ConfigReload", ["config"])
+
 
 class FlashServer:
     """Handle focus shifts and client (flash_window) requests.
@@ -26,6 +35,16 @@ class FlashServer:
     ----------
     config
         A config dictionary read from the user config file/CLI options
+    scheduler
+        Scheduler used to time flash animations. Uses the system clock if None.
+    recorder
+        If not None, every event handled by the server is recorded.
+    config_loader
+        Called to load the new config when a reload is requested. If None, the config can't be
+        reloaded.
+    loop
+        If not None, events and animations are handled by this single-threaded event loop instead
+        of by separate threads. The loop is also used as the scheduler, unless one is given.
 
     Attributes
     ----------
@@ -37,9 +56,10 @@ class FlashServer:
         cleanup).
     producers
         List of threads which produce work for the server.
-    flash_requests
-        Queue of flash jobs for the server to work through. Each item of the
-        queue is a tuple of (window id, request type).
+    events
+        Queue of events for the server to work through, in order of priority (see
+        flashfocus.event_queue). In the single-threaded event loop, events are instead handled as
+        soon as they arrive.
     ready
         True if all server threads are fully initialized and ready to process events
     processing_event
@@ -47,13 +67,29 @@ class FlashServer:
 
     """
 
-    def __init__(self, config: dict) -> None:
+    def __init__(
+        self,
+        config: dict,
+        scheduler: Scheduler | None = None,
+        recorder: EventRecorder | None = None,
+        config_loader: Callable[[], dict] | None = None,
+        loop: EventLoop | None = None,
+    ) -> None:
         self.config = config
-        self.router = FlashRouter(config)
-        self.events: Queue = Queue()
+        self.recorder = recorder
+        self.config_loader = config_loader
+        self.loop = loop
+        if loop is not None and scheduler is None:
+            scheduler = loop
+        self.router = FlashRouter(config, scheduler=scheduler)
+        self.events: Queue | DispatchQueue = (
+            EventQueue.from_config(config)
+            if loop is None
+            else DispatchQueue(loop, self._handle_event)
+        )
         self.producers: list[ProducerThread] = [
             ClientMonitor(self.events),
-            DisplayHandler(self.events),
+            compat.DisplayHandler(self.events),
         ]
         self.keep_going = True
         self.ready = False
@@ -64,6 +100,9 @@ class FlashServer:
         logging.info("Initializing default window opacity...")
         self._set_all_window_opacity_to_default()
         try:
+            if self.loop is not None:
+                self._run_event_loop(self.loop)
+                return
             logging.info("Initializing threads...")
             for producer in self.producers:
                 producer.start()
@@ -81,22 +120,90 @@ class FlashServer:
     def shutdown(self, disconnect_from_wm: bool = True) -> None:
         """Cleanup after recieving a SIGINT."""
         self.keep_going = False
+        if self.loop is not None:
+            self.loop.stop()
+            # Wait for the loop to finish handling the current event
+            self.loop.join()
         self._kill_producers()
         logging.info("Resetting windows to full opacity...")
-        for window in list_mapped_windows():
-            window.set_opacity(1)
+        start = monotonic()
+        restored = compat.restore_full_opacity()
+        logging.info(f"Reset {restored} windows to full opacity in {monotonic() - start:.3f}s")
         if disconnect_from_wm:
             logging.info("Disconnecting from display server...")
-            disconnect_display_conn()
+            compat.disconnect_display_conn()
+        stats = STATS.format()
+        if stats:
+            logging.info(f"Statistics:\n{stats}")
+        if self.recorder is not None:
+            self.recorder.close()
+            self.recorder = None
+
+    def request_reload(self) -> None:
+        """Reload the config without interrupting the event loop.
+
+        The config is loaded in a separate thread and then applied by the event loop, so this is
+        safe to call from a signal handler.
+        """
+        if self.config_loader is None:
+            logging.warning("Config reload requested, but there is no config to reload")
+            return
+        Thread(target=self._load_config, daemon=True).start()
+
+    def reload_config(self, config: dict) -> None:
+        """Switch to a new config.
+
+        Flashes which are in progress are left to finish, and only windows whose default opacity
+        has changed are updated.
+        """
+        self.config = config
+        self.router.reload(config)
+        if isinstance(self.events, EventQueue):
+            self.events.configure(config)
+        logging.info(f"Reloaded configuration:\n{config}")
+
+    def _load_config(self) -> None:
+        assert self.config_loader is not None
+        logging.info("Reloading configuration...")
+        try:
+            config = self.config_loader()
+        except ConfigLoadError as error:
+            logging.error(f"Failed to reload config, keeping the current config. {error}")
+            return
+        self.events.put(ConfigReload(config))
+
+    def _run_event_loop(self, loop: EventLoop) -> None:
+        logging.info("Initializing event loop...")
+        for producer in self.producers:
+            producer.setup()
+            loop.add_source(producer)
+        self.ready = True
+        logging.info("Event loop initialized, waiting for events...")
+        loop.run()
 
     def _flash_queued_window(self) -> None:
         """Pop a window from the flash_requests queue and initiate flash."""
+        assert isinstance(self.events, Queue)
         try:
             message = self.events.get(timeout=1)
-            self.processing_event = True
         except Empty:
             return None
+        self._handle_event(message)
 
+    def _handle_event(self, message: WMEvent | ConfigReload) -> None:
+        self.processing_event = True
+        if isinstance(message, ConfigReload):
+            try:
+                self.reload_config(message.config)
+            finally:
+                self.processing_event = False
+            return None
+        if TRACER.enabled:
+            TRACER.instant(
+                "event_dequeued", window=message.window.id, event_type=message.event_type.name
+            )
+        if self.recorder is not None:
+            self._record(self.recorder, message)
         try:
             self.router.route_request(message)
         except UnexpectedMessageType:
@@ -107,12 +214,24 @@ class FlashServer:
         finally:
             self.processing_event = False
 
+    def _record(self, recorder: EventRecorder, message: WMEvent) -> None:
+        try:
+            recorder.record(message, workspace=compat.get_workspace(message.window))
+        except WMError:
+            # The window was probably destroyed before we could read its properties
+            logging.debug(f"Failed to record event for window {message.window.id}")
+
     def _kill_producers(self) -> None:
+        if self.loop is not None:
+            for producer in self.producers:
+                if producer.keep_going:
+                    producer.teardown()
+            return
         logging.info("Terminating threads...")
         for producer in self.producers:
             producer.stop()
 
     def _set_all_window_opacity_to_default(self) -> None:
         logging.info("Setting all windows to their default opacity...")
-        for window in sorted(list_mapped_windows(), key=lambda window: window.id):
+        for window in sorted(compat.list_mapped_windows(), key=lambda window: window.id):
             self.router.route_request(WMEvent(window=window, event_type=WMEventType.WINDOW_INIT))
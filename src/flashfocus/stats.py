@@ -0,0 +1,75 @@
+"""Counters and timings describing how flashfocus copes with its load.
+
+Statistics are cheap to collect, so unlike tracing (see flashfocus.trace) they are always collected.
+They are logged when the daemon shuts down.
+
+Names are dotted paths, e.g `queue.focus_shift.dropped`.
+"""
+from __future__ import annotations
+
+from dataclasses import dataclass
+from threading import Lock
+
+
+@dataclass
+class Timing:
+    """Summary of a series of durations (in seconds)."""
+
+    count: int = 0
+    total: float = 0
+    max: float = 0
+
+    @property
+    def mean(self) -> float:
+        return self.total / self.count if self.count else 0
+
+
+class Stats:
+    """A set of named counters and timings which can be updated from any thread.
+
+    Attributes
+    ----------
+    counters
+        Counter values by name.
+    timings
+        Timing summaries by name.
+
+    """
+
+    def __init__(self) -> None:
+        self.counters: dict[str, int] = {}
+        self.timings: dict[str, Timing] = {}
+        self._lock = Lock()
+
+    def increment(self, name: str, count: int = 1) -> None:
+        with self._lock:
+            self.counters[name] = self.counters.get(name, 0) + count
+
+    def observe(self, name: str, duration: float) -> None:
+        """Add a duration (in seconds) to a timing."""
+        with self._lock:
+            timing = self.timings.get(name)
+            if timing is None:
+                timing = self.timings[name] = Timing()
+            timing.count += 1
+            timing.total += duration
+            timing.max = max(timing.max, duration)
+
+    def reset(self) -> None:
+        with self._lock:
+            self.counters.clear()
+            self.timings.clear()
+
+    def format(self) -> str:
+        """Format the statistics as one line per counter/timing, sorted by name."""
+        with self._lock:
+            lines = [f"{name}: {value}" for name, value in self.counters.items()]
+            lines += [
+                f"{name}: count {timing.count}, mean {timing.mean * 1000:.3f}ms, "
+                f"max {timing.max * 1000:.3f}ms"
+                for name, timing in self.timings.items()
+            ]
+        return "\n".join(sorted(lines))
+
+
+STATS = Stats()
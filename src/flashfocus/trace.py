@@ -0,0 +1,107 @@
+"""Lightweight latency tracing of the event hot path.
+
+When enabled, timestamps are recorded at each stage that a `WMEvent` passes through on its way to
+the display server (production, dequeue by the server, rule matching, flasher dispatch and each
+opacity write). Trace points are stored in a fixed-size ring buffer so that tracing can be left on
+indefinitely, and the buffer is dumped in the Chrome trace-event format (viewable in
+chrome://tracing or https://ui.perfetto.dev) when the daemon receives a SIGUSR1.
+
+Tracing is disabled by default. Callers are expected to guard trace points with a check of
+`TRACER.enabled` so that the disabled cost is a single attribute lookup.
+"""
+from __future__ import annotations
+
+import json
+import logging
+import os
+import threading
+from collections import deque
+from pathlib import Path
+from signal import SIGUSR1, signal
+from time import monotonic_ns
+from types import FrameType
+from typing import Any
+
+DEFAULT_BUFFER_SIZE = 100000
+
+
+class Tracer:
+    """Records trace points into a ring buffer.
+
+    Attributes
+    ----------
+    enabled
+        If False, trace points are not recorded.
+    buffer
+        Ring buffer of recorded trace points. Each trace point is a tuple of (name, phase,
+        timestamp, duration, thread id, args). Timestamps and durations are in nanoseconds.
+
+    """
+
+    def __init__(self) -> None:
+        self.enabled = False
+        self.buffer: deque[tuple] = deque(maxlen=DEFAULT_BUFFER_SIZE)
+
+    def enable(self, buffer_size: int = DEFAULT_BUFFER_SIZE) -> None:
+        """Start recording trace points, keeping at most `buffer_size` of the most recent."""
+        self.buffer = deque(maxlen=buffer_size)
+        self.enabled = True
+
+    def disable(self) -> None:
+        self.enabled = False
+
+    def instant(self, name: str, **args: Any) -> None:
+        """Record a point in time."""
+        # deque.append is atomic so no locking is required here
+        self.buffer.append((name, "i", monotonic_ns(), 0, threading.get_ident(), args))
+
+    def complete(self, name: str, start: int, **args: Any) -> None:
+        """Record an operation which began at `start` (from `monotonic_ns`) and ended now."""
+        end = monotonic_ns()
+        self.buffer.append((name, "X", start, end - start, threading.get_ident(), args))
+
+    def to_chrome_trace(self) -> dict:
+        """Convert the recorded trace points to the Chrome trace-event format."""
+        pid = os.getpid()
+        events = []
+        # Copy the buffer first so that it isn't mutated by other threads while we iterate
+        for name, phase, timestamp, duration, tid, args in list(self.buffer):
+            event = {
+                "name": name,
+                "ph": phase,
+                "ts": timestamp / 1000,
+                "pid": pid,
+                "tid": tid,
+                "args": args,
+            }
+            if phase == "X":
+                event["dur"] = duration / 1000
+            else:
+                # Thread-scoped instant event
+                event["s"] = "t"
+            events.append(event)
+        return {"traceEvents": events, "displayTimeUnit": "ms"}
+
+    def dump(self, path: Path) -> None:
+        """Write the recorded trace points to `path` as Chrome trace-event JSON."""
+        with path.open("w") as f:
+            json.dump(self.to_chrome_trace(), f, default=str)
+        logging.info(f"Wrote {len(self.buffer)} trace events to {path}")
+
+
+# Shared by all modules in the package
+TRACER = Tracer()
+
+
+def enable_tracing(trace_file: Path, buffer_size: int = DEFAULT_BUFFER_SIZE) -> None:
+    """Enable tracing and dump the trace to `trace_file` whenever a SIGUSR1 is received."""
+
+    def dump_trace(signum: int, frame: FrameType | None) -> None:
+        try:
+            TRACER.dump(trace_file)
+        except OSError as error:
+            logging.error(f"Failed to write trace file: {error}")
+
+    TRACER.enable(buffer_size)
+    signal(SIGUSR1, dump_trace)
+    logging.info(f"Tracing enabled, send SIGUSR1 to pid {os.getpid()} to write {trace_file}")
@@ -1,4 +1,6 @@
+import os
 import re
+from pathlib import Path
 from subprocess import CalledProcessError, check_output
 from typing import Pattern
 
@@ -18,6 +20,18 @@ def indent(n: int) -> str:
 
 def find_process(process_name: str) -> bool:
     """Check if a process is running by name."""
+    proc = Path("/proc")
+    if proc.is_dir():
+        # Reading the process table directly is much faster than spawning pidof
+        for pid in os.listdir(proc):
+            if pid.isdigit():
+                try:
+                    if (proc / pid / "comm").read_text().rstrip("\n") == process_name:
+                        return True
+                except OSError:
+                    # The process exited while we were scanning
+                    continue
+        return False
     try:
         check_output(["pidof", process_name])
     except CalledProcessError:
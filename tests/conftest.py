@@ -2,6 +2,7 @@
 from __future__ import annotations
 
 import socket
+from pathlib import Path
 from queue import Queue
 from collections.abc import Generator
 
@@ -9,8 +10,10 @@ import pytest
 from factory import Factory
 from pytest_factoryboy import register
 
+from flashfocus import compat
 from flashfocus.client import ClientMonitor
 from flashfocus.compat import DisplayHandler, Window
+from flashfocus.display_protocols import fake
 from flashfocus.flasher import Flasher
 from flashfocus.server import FlashServer
 from flashfocus.sockets import init_client_socket, init_server_socket
@@ -24,6 +27,24 @@ from tests.helpers import (
 )
 
 
+@pytest.fixture(autouse=True)
+def isolated_cache_dir(tmp_path: Path, monkeypatch: pytest.MonkeyPatch) -> Path:
+    """Keep the tests from reading/writing the user's cache dir."""
+    cache_dir = tmp_path / "cache"
+    monkeypatch.setenv("XDG_CACHE_HOME", str(cache_dir))
+    return cache_dir
+
+
+@pytest.fixture
+def fake_backend(monkeypatch: pytest.MonkeyPatch) -> Generator[fake.FakeDisplay, None, None]:
+    """Use the in-memory display backend in place of the display server."""
+    for attribute in compat.BACKEND_ATTRIBUTES:
+        monkeypatch.setattr(compat, attribute, getattr(fake, attribute))
+    fake.DISPLAY.reset()
+    yield fake.DISPLAY
+    fake.DISPLAY.reset()
+
+
 @pytest.fixture
 def windows() -> Generator[list[Window], None, None]:
     """Display session with multiple open windows."""
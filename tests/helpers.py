@@ -2,13 +2,15 @@
 from __future__ import annotations
 
 import copy
+import gc
 import socket
+import tracemalloc
 from contextlib import contextmanager
 from queue import Queue
 from threading import Thread
 from time import sleep
-from typing import Pattern
-from collections.abc import Generator
+from typing import Any, Pattern
+from collections.abc import Callable, Generator
 
 from flashfocus.compat import (
     Window,
@@ -32,11 +34,13 @@ def quick_conf() -> dict:
         flash_opacity=0.8,
         time=100,
         ntimepoints=4,
+        adaptive_frames=False,
         simple=False,
         rules=None,
         flash_on_focus=True,
         flash_lone_windows="always",
         flash_fullscreen=True,
+        fast_forward_on_unfocus=False,
     )
 
 
@@ -44,15 +48,25 @@ def default_flash_param() -> dict:
     return {
         "config": {"default": None, "type": [str], "location": "cli"},
         "verbosity": {"default": "INFO", "type": [str], "location": "cli"},
+        "trace": {"default": None, "type": [str], "location": "cli"},
+        "trace_size": {"default": 100000, "type": [int], "location": "cli"},
+        "profile": {"default": None, "type": [str], "location": "cli"},
+        "profile_duration": {"default": None, "type": [float], "location": "cli"},
+        "record": {"default": None, "type": [str], "location": "cli"},
+        "event_loop": {"default": "threads", "type": [str], "location": "cli"},
         "default_opacity": {"default": 1, "type": [float], "location": "any"},
         "flash_opacity": {"default": 0.8, "type": [float], "location": "any"},
         "time": {"default": 100, "type": [float], "location": "any"},
         "ntimepoints": {"default": 4, "type": [int], "location": "any"},
+        "adaptive_frames": {"default": False, "type": [bool], "location": "any"},
         "simple": {"default": False, "type": [bool], "location": "any"},
         "flash_on_focus": {"default": True, "type": [bool], "location": "any"},
         "flash_lone_windows": {"default": "always", "type": [str], "location": "any"},
         "flash_fullscreen": {"default": True, "type": [bool], "location": "any"},
+        "fast_forward_on_unfocus": {"default": False, "type": [bool], "location": "any"},
         "rules": {"default": None, "type": [list, type(None)], "location": "config_file"},
+        "event_queue_size": {"default": 1000, "type": [int], "location": "config_file"},
+        "event_queue_overflow": {"default": None, "type": [dict], "location": "config_file"},
         "window_id": {"default": "window1", "type": [Pattern], "location": "rule"},
         "window_class": {"default": "Window1", "type": [Pattern], "location": "rule"},
     }
@@ -265,3 +279,31 @@ def clear_workspace(workspace: int) -> None:
             window.destroy()
         except WMError:
             pass
+
+
+def retained_memory(function: Callable[[], Any], exclude: list[str] | None = None) -> int:
+    """Measure the memory allocated by a function which is still in use after it returns.
+
+    The result of the function is kept alive until the measurement is complete.
+
+    Parameters
+    ----------
+    function
+        The function to measure.
+    exclude
+        Filename patterns of modules whose allocations are ignored (e.g code running in another
+        thread of the test process).
+
+    """
+    filters = [tracemalloc.Filter(False, tracemalloc.__file__)]
+    filters += [tracemalloc.Filter(False, pattern) for pattern in exclude or []]
+    gc.collect()
+    tracemalloc.start()
+    try:
+        before = tracemalloc.take_snapshot().filter_traces(filters)
+        result = function()  # noqa: F841
+        gc.collect()
+        after = tracemalloc.take_snapshot().filter_traces(filters)
+    finally:
+        tracemalloc.stop()
+    return sum(stat.size_diff for stat in after.compare_to(before, "filename"))
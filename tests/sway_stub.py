@@ -0,0 +1,521 @@
+"""A stub sway compositor for testing and benchmarking the sway backend.
+
+`StubSway` serves a synthetic window tree over a unix socket using the i3/sway IPC wire protocol
+(https://i3wm.org/docs/ipc.html), so the sway backend can be exercised without a running sway
+session. Pointing SWAYSOCK at the stub's socket is enough for i3ipc to connect to it.
+
+The stub can emit window and workspace events (either directly or on a schedule), records every
+RUN_COMMAND it receives with a timestamp, and can inject latency into its replies or hold back its
+replies to GET_TREE. E.g:
+
+    with StubSway(socket_path, windows_per_workspace={1: 3}) as sway:
+        sway.play([(0.1, lambda: sway.focus(sway.window_ids[1]))])
+        ...
+        assert sway.opacity[sway.window_ids[1]] == 1
+
+It can also be run standalone: python -m tests.sway_stub --windows 100
+
+"""
+from __future__ import annotations
+
+import json
+import os
+import re
+import socket
+import struct
+from collections.abc import Callable, Iterable
+from itertools import count
+from pathlib import Path
+from threading import Event, Lock, Thread
+from time import monotonic, sleep
+from types import TracebackType
+from typing import Any
+
+import click
+
+MAGIC = b"i3-ipc"
+HEADER = struct.Struct("=6sII")
+
+# Message types
+RUN_COMMAND = 0
+GET_WORKSPACES = 1
+SUBSCRIBE = 2
+GET_OUTPUTS = 3
+GET_TREE = 4
+GET_VERSION = 7
+
+# Event types are sent with the high bit set
+WORKSPACE_EVENT = 0x80000000 | 0
+OUTPUT_EVENT = 0x80000000 | 1
+WINDOW_EVENT = 0x80000000 | 3
+TICK_EVENT = 0x80000000 | 7
+EVENT_NAMES = {
+    WORKSPACE_EVENT: "workspace",
+    OUTPUT_EVENT: "output",
+    WINDOW_EVENT: "window",
+    TICK_EVENT: "tick",
+}
+
+OUTPUT_NAME = "STUB-1"
+OUTPUT_RECT = {"x": 0, "y": 0, "width": 1920, "height": 1080}
+REFRESH_RATE_MHZ = 60000
+WINDOW_RECT = {"x": 0, "y": 0, "width": 640, "height": 480}
+EMPTY_RECT = {"x": 0, "y": 0, "width": 0, "height": 0}
+
+COMMAND_CRITERIA = re.compile(r'^\[con_id="?(\d+)"?\]\s*(.*)$')
+
+
+def _recv_exactly(sock: socket.socket, size: int) -> bytes:
+    data = b""
+    while len(data) < size:
+        chunk = sock.recv(size - len(data))
+        if not chunk:
+            raise ConnectionError("Client disconnected")
+        data += chunk
+    return data
+
+
+class _Client:
+    """A connection from an IPC client."""
+
+    def __init__(self, sock: socket.socket) -> None:
+        self.sock = sock
+        self.subscriptions: set[str] = set()
+        self.send_lock = Lock()
+
+    def send(self, message_type: int, payload: Any) -> None:
+        body = json.dumps(payload).encode("utf-8")
+        with self.send_lock:
+            self.sock.sendall(HEADER.pack(MAGIC, len(body), message_type) + body)
+
+
+class StubSway:
+    """A local server which speaks the sway IPC protocol.
+
+    Parameters
+    ----------
+    socket_path
+        Location of the unix socket to listen on.
+    windows_per_workspace
+        Mapping of workspace number to the number of windows to create on it.
+    latency
+        Number of seconds to wait before replying to each message.
+    tree_latency
+        Additional number of seconds to wait before replying to each GET_TREE message.
+
+    Attributes
+    ----------
+    commands
+        Every RUN_COMMAND payload received as a list of (monotonic time, payload) tuples.
+    opacity
+        The most recent opacity set for each window id.
+    tree_requests
+        The number of GET_TREE messages received.
+    window_ids
+        The ids of all windows in the tree, in creation order.
+    focused
+        The id of the focused window.
+    current_workspace
+        The number of the focused workspace.
+    refresh_rate
+        The refresh rate of the output in mHz.
+
+    """
+
+    def __init__(
+        self,
+        socket_path: Path,
+        windows_per_workspace: dict[int, int] | None = None,
+        latency: float = 0,
+        tree_latency: float = 0,
+    ) -> None:
+        self.socket_path = socket_path
+        self.latency = latency
+        self.tree_latency = tree_latency
+        self.commands: list[tuple[float, str]] = []
+        self.opacity: dict[int, float] = {}
+        self.tree_requests = 0
+        # Replies to GET_TREE are only sent while this is set
+        self._tree_released = Event()
+        self._tree_released.set()
+        # Set when a GET_TREE reply is held back
+        self._tree_held = Event()
+        self.focused: int | None = None
+        self.current_workspace = 1
+        self.refresh_rate = REFRESH_RATE_MHZ
+        self._lock = Lock()
+        # Container ids 1-2 are reserved for the root and output containers
+        self._ids = count(3)
+        self._workspace_ids: dict[int, int] = {}
+        self._windows: dict[int, dict] = {}
+        self._clients: list[_Client] = []
+        self._server: socket.socket | None = None
+        self.populate(windows_per_workspace if windows_per_workspace is not None else {1: 2})
+
+    def __enter__(self) -> StubSway:
+        self.start()
+        return self
+
+    def __exit__(
+        self,
+        exc_type: type[BaseException] | None,
+        exc: BaseException | None,
+        traceback: TracebackType | None,
+    ) -> None:
+        self.stop()
+
+    @property
+    def window_ids(self) -> list[int]:
+        with self._lock:
+            return list(self._windows)
+
+    def start(self) -> None:
+        """Start listening for clients in a background thread."""
+        try:
+            os.unlink(self.socket_path)
+        except FileNotFoundError:
+            pass
+        self._server = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self._server.bind(str(self.socket_path))
+        self._server.listen()
+        Thread(target=self._accept, args=[self._server], daemon=True).start()
+
+    def stop(self) -> None:
+        if self._server is not None:
+            self._server.close()
+            self._server = None
+        with self._lock:
+            clients, self._clients = self._clients, []
+        for client in clients:
+            try:
+                client.sock.shutdown(socket.SHUT_RDWR)
+            except OSError:
+                pass
+            client.sock.close()
+        try:
+            os.unlink(self.socket_path)
+        except FileNotFoundError:
+            pass
+
+    def populate(self, windows_per_workspace: dict[int, int]) -> None:
+        """Replace the tree with a new set of windows. The first window is focused."""
+        with self._lock:
+            self._windows.clear()
+            self._workspace_ids.clear()
+            self.focused = None
+        for workspace, nwindows in sorted(windows_per_workspace.items()):
+            for _ in range(nwindows):
+                self.new_window(workspace, emit=False)
+        with self._lock:
+            if self._windows:
+                self.focused = next(iter(self._windows))
+                self.current_workspace = self._windows[self.focused]["workspace"]
+
+    def new_window(
+        self, workspace: int | None = None, app_id: str | None = None, emit: bool = True
+    ) -> int:
+        """Map a new window and return its container id."""
+        with self._lock:
+            if workspace is None:
+                workspace = self.current_workspace
+            if workspace not in self._workspace_ids:
+                self._workspace_ids[workspace] = next(self._ids)
+            con_id = next(self._ids)
+            self._windows[con_id] = {
+                "workspace": workspace,
+                "app_id": app_id if app_id is not None else f"app_{con_id}",
+                "name": f"window_{con_id}",
+                "fullscreen_mode": 0,
+            }
+        if emit:
+            self.emit_window_event("new", con_id)
+        return con_id
+
+    def close_window(self, con_id: int) -> None:
+        container = self._container(con_id)
+        with self._lock:
+            del self._windows[con_id]
+            self.opacity.pop(con_id, None)
+            if self.focused == con_id:
+                self.focused = None
+        self._emit(WINDOW_EVENT, {"change": "close", "container": container})
+
+    def focus(self, con_id: int) -> None:
+        """Focus a window, switching workspace if necessary."""
+        with self._lock:
+            old_workspace = self.current_workspace
+            self.focused = con_id
+            self.current_workspace = self._windows[con_id]["workspace"]
+        if old_workspace != self.current_workspace:
+            self.emit_workspace_event("focus", self.current_workspace, old_workspace)
+        self.emit_window_event("focus", con_id)
+
+    def set_fullscreen(self, con_id: int, fullscreen: bool = True) -> None:
+        with self._lock:
+            self._windows[con_id]["fullscreen_mode"] = 1 if fullscreen else 0
+        self.emit_window_event("fullscreen_mode", con_id)
+
+    def emit_window_event(self, change: str, con_id: int) -> None:
+        self._emit(WINDOW_EVENT, {"change": change, "container": self._container(con_id)})
+
+    def emit_workspace_event(self, change: str, current: int, old: int | None = None) -> None:
+        with self._lock:
+            payload = {
+                "change": change,
+                "current": self._workspace(current),
+                "old": self._workspace(old) if old is not None else None,
+            }
+        self._emit(WORKSPACE_EVENT, payload)
+
+    def set_refresh_rate(self, refresh_rate: int) -> None:
+        """Change the refresh rate of the output (in mHz)."""
+        self.refresh_rate = refresh_rate
+        self._emit(OUTPUT_EVENT, {"change": "unspecified"})
+
+    def hold_tree_replies(self) -> None:
+        """Hold back replies to GET_TREE until `release_tree_replies` is called."""
+        self._tree_held.clear()
+        self._tree_released.clear()
+
+    def wait_for_held_tree_reply(self, timeout: float = 1) -> None:
+        """Wait until a GET_TREE reply is being held back."""
+        if not self._tree_held.wait(timeout):
+            raise TimeoutError("No GET_TREE message was received")
+
+    def release_tree_replies(self) -> None:
+        self._tree_released.set()
+
+    def play(self, schedule: Iterable[tuple[float, Callable[[], Any]]]) -> Thread:
+        """Run actions on a schedule in a background thread.
+
+        Parameters
+        ----------
+        schedule
+            (seconds, action) tuples. Each action is called the given number of seconds after the
+            schedule starts.
+
+        """
+
+        def run() -> None:
+            start = monotonic()
+            for offset, action in sorted(schedule, key=lambda item: item[0]):
+                delay = start + offset - monotonic()
+                if delay > 0:
+                    sleep(delay)
+                action()
+
+        thread = Thread(target=run, daemon=True)
+        thread.start()
+        return thread
+
+    def wait_for_subscriber(self, event: str, timeout: float = 1) -> None:
+        """Block until a client has subscribed to an event type."""
+        deadline = monotonic() + timeout
+        while monotonic() < deadline:
+            with self._lock:
+                if any(event in client.subscriptions for client in self._clients):
+                    return
+            sleep(0.001)
+        raise TimeoutError(f"No client subscribed to {event} events")
+
+    def get_tree(self) -> dict:
+        with self._lock:
+            workspaces = [self._workspace(num) for num in sorted(self._workspace_ids)]
+        output = self._node(2, "output", OUTPUT_NAME, nodes=workspaces)
+        return self._node(1, "root", "root", nodes=[output])
+
+    def _node(self, con_id: int, type_: str, name: str, **extra: Any) -> dict:
+        node = {
+            "id": con_id,
+            "type": type_,
+            "name": name,
+            "focused": False,
+            "fullscreen_mode": 0,
+            "rect": OUTPUT_RECT,
+            "window_rect": EMPTY_RECT,
+            "nodes": [],
+            "floating_nodes": [],
+        }
+        node.update(extra)
+        return node
+
+    def _workspace(self, num: int) -> dict:
+        """JSON representation of a workspace (the caller must hold the lock)."""
+        leaves = [
+            self._leaf(con_id)
+            for con_id, window in self._windows.items()
+            if window["workspace"] == num
+        ]
+        return self._node(
+            self._workspace_ids[num],
+            "workspace",
+            str(num),
+            num=num,
+            output=OUTPUT_NAME,
+            focused=False,
+            nodes=leaves,
+        )
+
+    def _leaf(self, con_id: int) -> dict:
+        """JSON representation of a window (the caller must hold the lock)."""
+        window = self._windows[con_id]
+        return self._node(
+            con_id,
+            "con",
+            window["name"],
+            app_id=window["app_id"],
+            focused=con_id == self.focused,
+            fullscreen_mode=window["fullscreen_mode"],
+            rect=WINDOW_RECT,
+            window_rect=WINDOW_RECT,
+            pid=os.getpid(),
+        )
+
+    def _container(self, con_id: int) -> dict:
+        with self._lock:
+            return self._leaf(con_id)
+
+    def _emit(self, event_type: int, payload: dict) -> None:
+        with self._lock:
+            clients = [c for c in self._clients if EVENT_NAMES[event_type] in c.subscriptions]
+        for client in clients:
+            try:
+                client.send(event_type, payload)
+            except OSError:
+                pass
+
+    def _accept(self, server: socket.socket) -> None:
+        while True:
+            try:
+                sock, _ = server.accept()
+            except OSError:
+                # The server socket was closed
+                return
+            client = _Client(sock)
+            with self._lock:
+                self._clients.append(client)
+            Thread(target=self._serve, args=[client], daemon=True).start()
+
+    def _serve(self, client: _Client) -> None:
+        try:
+            while True:
+                magic, length, message_type = HEADER.unpack(_recv_exactly(client.sock, HEADER.size))
+                if magic != MAGIC:
+                    raise ConnectionError("Invalid message")
+                payload = _recv_exactly(client.sock, length).decode("utf-8")
+                reply = self._handle(client, message_type, payload)
+                latency = self.latency + (self.tree_latency if message_type == GET_TREE else 0)
+                if latency:
+                    sleep(latency)
+                if message_type == GET_TREE and not self._tree_released.is_set():
+                    self._tree_held.set()
+                    self._tree_released.wait()
+                client.send(message_type, reply)
+                if message_type == SUBSCRIBE and "tick" in json.loads(payload):
+                    # Like sway, confirm a subscription to tick events with a tick event
+                    client.send(TICK_EVENT, {"first": True, "payload": ""})
+        except (ConnectionError, OSError):
+            with self._lock:
+                if client in self._clients:
+                    self._clients.remove(client)
+            client.sock.close()
+
+    def _handle(self, client: _Client, message_type: int, payload: str) -> Any:
+        if message_type == RUN_COMMAND:
+            return self._run_command(payload)
+        elif message_type == SUBSCRIBE:
+            client.subscriptions.update(json.loads(payload))
+            return {"success": True}
+        elif message_type == GET_TREE:
+            with self._lock:
+                self.tree_requests += 1
+            return self.get_tree()
+        elif message_type == GET_WORKSPACES:
+            with self._lock:
+                return [
+                    {
+                        "id": con_id,
+                        "num": num,
+                        "name": str(num),
+                        "focused": num == self.current_workspace,
+                        "visible": num == self.current_workspace,
+                        "output": OUTPUT_NAME,
+                        "rect": OUTPUT_RECT,
+                    }
+                    for num, con_id in sorted(self._workspace_ids.items())
+                ]
+        elif message_type == GET_OUTPUTS:
+            return [
+                {
+                    "name": OUTPUT_NAME,
+                    "active": True,
+                    "rect": OUTPUT_RECT,
+                    "current_workspace": str(self.current_workspace),
+                    "current_mode": {
+                        "width": OUTPUT_RECT["width"],
+                        "height": OUTPUT_RECT["height"],
+                        "refresh": self.refresh_rate,
+                    },
+                }
+            ]
+        elif message_type == GET_VERSION:
+            return {
+                "major": 1,
+                "minor": 0,
+                "patch": 0,
+                "human_readable": "stub",
+                "loaded_config_file_name": "",
+            }
+        return {"success": False, "error": f"Unsupported message type {message_type}"}
+
+    def _run_command(self, payload: str) -> list[dict]:
+        self.commands.append((monotonic(), payload))
+        replies = []
+        for command in payload.split(";"):
+            match = COMMAND_CRITERIA.match(command.strip())
+            if match is None:
+                replies.append({"success": False, "error": "Unsupported command"})
+                continue
+            con_id, action = int(match.group(1)), match.group(2).split()
+            if con_id not in self._windows:
+                replies.append({"success": False, "error": "No matching node"})
+            elif action[0] == "opacity":
+                self.opacity[con_id] = float(action[1])
+                replies.append({"success": True})
+            elif action[0] == "kill":
+                self.close_window(con_id)
+                replies.append({"success": True})
+            else:
+                replies.append({"success": False, "error": "Unsupported command"})
+        return replies
+
+
+@click.command()
+@click.option("--socket", "socket_path", default=None, help="Socket path to listen on.")
+@click.option("--windows", default=10, help="Number of windows per workspace.")
+@click.option("--workspaces", default=1, help="Number of workspaces.")
+@click.option("--latency", default=0.0, help="Seconds to wait before each reply.")
+@click.option("--tree-latency", default=0.0, help="Additional seconds to wait before tree replies.")
+def cli(
+    socket_path: str | None, windows: int, workspaces: int, latency: float, tree_latency: float
+) -> None:
+    """Run a stub sway compositor until interrupted."""
+    if socket_path is None:
+        socket_path = os.path.join(os.environ.get("XDG_RUNTIME_DIR", "/tmp"), "stub-sway.sock")
+    stub = StubSway(
+        Path(socket_path),
+        {num: windows for num in range(1, workspaces + 1)},
+        latency=latency,
+        tree_latency=tree_latency,
+    )
+    stub.start()
+    click.echo(f"SWAYSOCK={socket_path}")
+    try:
+        while True:
+            sleep(1)
+    except KeyboardInterrupt:
+        stub.stop()
+
+
+if __name__ == "__main__":
+    cli()
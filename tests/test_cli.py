@@ -2,7 +2,10 @@
 import pytest
 from typing import Any
 
-from flashfocus.cli import init_server
+from click.testing import CliRunner
+
+from flashfocus import __version__
+from flashfocus.cli import cli, init_server
 from flashfocus.server import FlashServer
 
 
@@ -20,3 +23,9 @@ def test_custom_configfile(  # type: ignore[no-untyped-def]
     monkeypatch.setattr(FlashServer, "event_loop", return_opacity)
     opacity = init_server(cli_options)  # type: ignore[func-returns-value]
     assert opacity == 0.5
+
+
+def test_version() -> None:
+    result = CliRunner().invoke(cli, ["--version"])
+    assert result.exit_code == 0
+    assert __version__ in result.output
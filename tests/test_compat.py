@@ -1,11 +1,22 @@
 """Testsuite for flashfocus.xutil."""
 from __future__ import annotations
+import os
+import subprocess
+import sys
+
 import pytest
 
-from flashfocus.compat import DisplayHandler, Window, get_workspace
+from flashfocus.compat import (
+    DisplayHandler,
+    DisplayProtocol,
+    Window,
+    detect_display_protocol,
+    get_workspace,
+)
 from flashfocus.display import WMEvent, WMEventType
 from flashfocus.errors import WMError
 from tests.compat import change_focus, set_fullscreen, unset_fullscreen
+from flashfocus.util import find_process
 from tests.helpers import new_window_session, producer_running, queue_to_list
 
 
@@ -61,3 +72,54 @@ def test_is_fullscreen(window: Window) -> None:
 def test_get_workspace() -> None:
     with new_window_session({0: 1, 1: 1}) as window_session:
         assert get_workspace(window_session.windows[1][0]) == 1
+
+
+@pytest.mark.parametrize(
+    "environment,sway_running,expected",
+    [
+        ({"SWAYSOCK": "/run/sway.sock", "DISPLAY": ":0"}, False, DisplayProtocol.SWAY),
+        ({"WAYLAND_DISPLAY": "wayland-1", "I3SOCK": "/run/sway.sock"}, False, DisplayProtocol.SWAY),
+        ({"WAYLAND_DISPLAY": "wayland-1"}, True, DisplayProtocol.SWAY),
+        ({"WAYLAND_DISPLAY": "wayland-1"}, False, DisplayProtocol.WAYLAND),
+        ({"DISPLAY": ":0", "I3SOCK": "/run/i3.sock"}, True, DisplayProtocol.X11),
+        ({"DISPLAY": ":0"}, True, DisplayProtocol.SWAY),
+        ({"DISPLAY": ":0"}, False, DisplayProtocol.X11),
+        ({}, True, DisplayProtocol.SWAY),
+        ({}, False, DisplayProtocol.X11),
+    ],
+)
+def test_detect_display_protocol(
+    monkeypatch: pytest.MonkeyPatch,
+    environment: dict[str, str],
+    sway_running: bool,
+    expected: DisplayProtocol,
+) -> None:
+    for variable in ["SWAYSOCK", "I3SOCK", "WAYLAND_DISPLAY", "DISPLAY"]:
+        monkeypatch.delenv(variable, raising=False)
+    for variable, value in environment.items():
+        monkeypatch.setenv(variable, value)
+    monkeypatch.setattr("flashfocus.compat.find_process", lambda name: sway_running)
+    assert detect_display_protocol() is expected
+
+
+def test_find_process() -> None:
+    with open("/proc/self/comm") as f:
+        assert find_process(f.read().strip())
+    assert not find_process("not-a-real-process")
+
+
+def test_backend_is_loaded_on_first_use() -> None:
+    # Run in a fresh process since the backend may already be loaded in this one
+    code = (
+        "import sys\n"
+        "import flashfocus.cli, flashfocus.server\n"
+        "assert not any(m.startswith('flashfocus.display_protocols') for m in sys.modules)\n"
+        "from flashfocus import compat\n"
+        "compat.list_mapped_windows()\n"
+        "assert 'flashfocus.display_protocols.fake' in sys.modules\n"
+    )
+    subprocess.run(
+        [sys.executable, "-c", code],
+        check=True,
+        env={**os.environ, "FLASHFOCUS_DISPLAY_PROTOCOL": "fake"},
+    )
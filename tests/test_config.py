@@ -3,6 +3,7 @@ from __future__ import annotations
 from copy import deepcopy
 
 import pytest
+import yaml
 from pytest_lazyfixture import lazy_fixture
 
 from flashfocus.config import (
@@ -54,7 +55,14 @@ def invalid_rules() -> list:
         ("simple", ["foo", "10"]),
         ("flash_lone_windows", ["foo", "true"]),
         ("flash_fullscreen", ["foo", 3]),
+        ("fast_forward_on_unfocus", ["foo", 3]),
         ("rules", lazy_fixture("invalid_rules")),
+        ("event_queue_size", ["0", "-1", "foo", 0, -1]),
+        (
+            "event_queue_overflow",
+            ["foo", {"focus-shift": "foo"}, {"foo": "coalesce"}, {"focus-shift": 1}],
+        ),
+        ("adaptive_frames", ["foo", 3]),
     ],
 )
 @pytest.mark.parametrize("input_type", ["cli", "file"])
@@ -99,7 +107,9 @@ def check_validated_config(config: dict, expected_types: dict[str, list[type]])
         ("simple", lazy_fixture("valid_bool")),
         ("flash_on_focus", lazy_fixture("valid_bool")),
         ("flash_fullscreen", lazy_fixture("valid_bool")),
+        ("fast_forward_on_unfocus", lazy_fixture("valid_bool")),
         ("flash_lone_windows", ["always", "never", "on_open_close", "on_switch"]),
+        ("adaptive_frames", lazy_fixture("valid_bool")),
     ],
 )
 @pytest.mark.parametrize("input_type", ["cli", "file"])
@@ -142,6 +152,8 @@ def test_valid_param(
         [{"window_class": "foo", "flash_on_focus": True}],
         [{"window_class": "foo", "flash_lone_windows": "always"}],
         [{"window_class": "foo", "flash_fullscreen": False}],
+        [{"window_class": "foo", "fast_forward_on_unfocus": True}],
+        [{"window_class": "foo", "adaptive_frames": False}],
         # Regexes are valid
         [{"window_class": "^indo.*$", "time": "100"}],
     ],
@@ -205,6 +217,44 @@ def test_rule_defaults_inherited_from_global_param(
     assert validated["rules"][0]["flash_opacity"] == default_config["flash_opacity"]
 
 
+@pytest.mark.parametrize(
+    "user_config,cli_options,expected",
+    [
+        # On by default
+        ({}, {}, True),
+        # Off if the user chooses the number of frames
+        ({"ntimepoints": 5}, {}, False),
+        ({}, {"ntimepoints": 5}, False),
+        # Unless they also turn it on
+        ({"ntimepoints": 5, "adaptive_frames": True}, {}, True),
+        ({"ntimepoints": 5}, {"adaptive_frames": True}, True),
+    ],
+)
+def test_adaptive_frames_off_if_ntimepoints_is_set(
+    user_config: dict,
+    cli_options: dict,
+    expected: bool,
+    default_config: dict,
+    blank_cli_options: dict,
+) -> None:
+    validated = merge_config_sources(
+        default_config=default_config,
+        user_config=user_config,
+        cli_options={**blank_cli_options, **cli_options},
+    )
+    assert validated["adaptive_frames"] is expected
+
+
+def test_adaptive_frames_off_in_rules_which_set_ntimepoints(
+    default_config: dict, blank_cli_options: dict
+) -> None:
+    user_config = {"rules": [{"window_class": "foo", "ntimepoints": 5}, {"window_class": "bar"}]}
+    validated = merge_config_sources(
+        default_config=default_config, user_config=user_config, cli_options=blank_cli_options
+    )
+    assert [rule["adaptive_frames"] for rule in validated["rules"]] == [False, True]
+
+
 def test_rules_added_to_config_dict_if_not_present_in_config(
     default_config: dict, blank_cli_options: dict
 ) -> None:
@@ -253,6 +303,20 @@ def test_invalid_yaml_passed_to_load_config(invalid_yaml) -> None:  # type: igno
         load_config(invalid_yaml)
 
 
+def test_load_config_with_pure_python_loader(  # type: ignore[no-untyped-def]
+    monkeypatch: pytest.MonkeyPatch, configfile
+) -> None:
+    monkeypatch.setattr("flashfocus.config.YAMLLoader", yaml.SafeLoader)
+    assert load_config(configfile) == {"default_opacity": 1, "flash_opacity": 0.5}
+
+
+def test_unsafe_yaml_tags_rejected(tmpdir) -> None:  # type: ignore[no-untyped-def]
+    yml = tmpdir.join("unsafe.yml")
+    yml.write("default-opacity: !!python/object/apply:os.getcwd []")
+    with pytest.raises(ConfigLoadError):
+        load_config(yml)
+
+
 def test_load_merged_config_with_no_custom_config(  # type: ignore[no-untyped-def]
     monkeypatch: pytest.MonkeyPatch, blank_cli_options: dict, configfile
 ) -> None:
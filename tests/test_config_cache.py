@@ -0,0 +1,98 @@
+"""Test suite for flashfocus.config_cache."""
+from __future__ import annotations
+
+from pathlib import Path
+from typing import Any
+
+import pytest
+from marshmallow import fields
+
+from flashfocus.config import ConfigSchema, get_default_config_file
+from flashfocus.config_cache import get_cache_file, load_cached_config
+
+
+@pytest.fixture
+def config_file(tmp_path: Path) -> Path:
+    path = tmp_path / "flashfocus.yml"
+    path.write_text("default-opacity: 1\nflash-opacity: 0.5\nrules:\n  - window-class: Term.*\n")
+    return path
+
+
+def fail_to_load(*args: Any, **kwargs: Any) -> dict:
+    raise AssertionError("Config should have been loaded from the cache")
+
+
+def test_cached_config_is_reused(
+    config_file: Path, blank_cli_options: dict, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    config = load_cached_config(config_file, dict(blank_cli_options))
+    assert get_cache_file().exists()
+    monkeypatch.setattr("flashfocus.config_cache.load_merged_config", fail_to_load)
+    cached_config = load_cached_config(config_file, dict(blank_cli_options))
+    assert cached_config == config
+    assert cached_config["flash_opacity"] == 0.5
+    assert cached_config["rules"][0]["window_class"].match("Termite")
+
+
+def test_cli_options_are_not_modified(config_file: Path, blank_cli_options: dict) -> None:
+    cli_options = dict(blank_cli_options)
+    load_cached_config(config_file, cli_options)
+    assert cli_options == blank_cli_options
+
+
+def test_cache_invalidated_by_config_change(config_file: Path, blank_cli_options: dict) -> None:
+    load_cached_config(config_file, dict(blank_cli_options))
+    config_file.write_text("default-opacity: 1\nflash-opacity: 0.25\n")
+    assert load_cached_config(config_file, dict(blank_cli_options))["flash_opacity"] == 0.25
+
+
+def test_cache_invalidated_by_cli_options(config_file: Path, blank_cli_options: dict) -> None:
+    load_cached_config(config_file, dict(blank_cli_options))
+    cli_options = {**blank_cli_options, "flash_opacity": 0.75}
+    assert load_cached_config(config_file, cli_options)["flash_opacity"] == 0.75
+
+
+def test_cache_invalidated_by_default_config_change(
+    config_file: Path, blank_cli_options: dict, tmp_path: Path, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    default_config_file = tmp_path / "default_config.yml"
+    default_config_file.write_text(get_default_config_file().read_text())
+    monkeypatch.setattr(
+        "flashfocus.config_cache.get_default_config_file", lambda: default_config_file
+    )
+    monkeypatch.setattr("flashfocus.config.get_default_config_file", lambda: default_config_file)
+    assert load_cached_config(config_file, dict(blank_cli_options))["time"] == 500
+    default_config_file.write_text(
+        default_config_file.read_text().replace("time: 500", "time: 1500")
+    )
+    assert load_cached_config(config_file, dict(blank_cli_options))["time"] == 1500
+
+
+def test_cache_invalidated_by_new_options(
+    config_file: Path, blank_cli_options: dict, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    load_cached_config(config_file, dict(blank_cli_options))
+    monkeypatch.setitem(ConfigSchema._declared_fields, "new_option", fields.Boolean())
+    reloaded = []
+
+    def load_merged_config(**kwargs: Any) -> dict:
+        reloaded.append(True)
+        return {}
+
+    monkeypatch.setattr("flashfocus.config_cache.load_merged_config", load_merged_config)
+    load_cached_config(config_file, dict(blank_cli_options))
+    assert reloaded
+
+
+def test_cache_not_invalidated_by_cli_only_options(
+    config_file: Path, blank_cli_options: dict, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    load_cached_config(config_file, dict(blank_cli_options))
+    monkeypatch.setattr("flashfocus.config_cache.load_merged_config", fail_to_load)
+    load_cached_config(config_file, {**blank_cli_options, "verbosity": "DEBUG"})
+
+
+def test_corrupt_cache_is_ignored(config_file: Path, blank_cli_options: dict) -> None:
+    get_cache_file().parent.mkdir(parents=True)
+    get_cache_file().write_bytes(b"not a pickle")
+    assert load_cached_config(config_file, dict(blank_cli_options))["flash_opacity"] == 0.5
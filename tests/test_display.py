@@ -0,0 +1,51 @@
+"""Test suite for flashfocus.display."""
+from __future__ import annotations
+
+from flashfocus.display import WindowRegistry, WorkspaceTracker
+from flashfocus.display_protocols.fake import Window
+
+
+def test_registry_interns_windows() -> None:
+    registry: WindowRegistry[Window] = WindowRegistry()
+    window = registry.intern(Window(1))
+    assert registry.intern(Window(1)) is window
+    assert registry.get(1) is window
+    assert registry.get(2) is None
+
+
+def test_registry_evicts_least_recently_used_window_when_full() -> None:
+    registry: WindowRegistry[Window] = WindowRegistry(maxsize=2)
+    registry.intern(Window(1))
+    registry.intern(Window(2))
+    registry.get(1)
+    registry.intern(Window(3))
+    assert len(registry) == 2
+    assert 1 in registry
+    assert 2 not in registry
+
+
+def test_registry_evict() -> None:
+    registry: WindowRegistry[Window] = WindowRegistry()
+    registry.intern(Window(1))
+    registry.evict(1)
+    registry.evict(2)
+    assert len(registry) == 0
+
+
+def test_registry_retain() -> None:
+    registry: WindowRegistry[Window] = WindowRegistry()
+    for window_id in range(5):
+        registry.intern(Window(window_id))
+    registry.retain([1, 3, 7])
+    assert [window_id in registry for window_id in range(5)] == [False, True, False, True, False]
+
+
+def test_workspace_tracker() -> None:
+    tracker = WorkspaceTracker()
+    assert not tracker.tracking
+    tracker.update(2)
+    assert tracker.tracking
+    assert tracker.workspace == 2
+    tracker.stop()
+    assert not tracker.tracking
+    assert tracker.workspace is None
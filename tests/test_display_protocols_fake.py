@@ -0,0 +1,144 @@
+"""Test suite for the simulated display backend."""
+from __future__ import annotations
+
+from collections.abc import Generator
+from queue import Queue
+
+import pytest
+
+from flashfocus.compat import DisplayProtocol, get_display_protocol
+from flashfocus.display import WMEvent, WMEventType
+from flashfocus.display_protocols.fake import (
+    DISPLAY,
+    DisplayHandler,
+    Window,
+    get_focused_window,
+    get_focused_workspace,
+    get_workspace,
+    list_mapped_windows,
+    restore_full_opacity,
+)
+from flashfocus.errors import UnsupportedWM, WMError
+from tests.helpers import producer_running, queue_to_list, retained_memory
+
+
+@pytest.fixture(autouse=True)
+def fake_display() -> Generator[None, None, None]:
+    DISPLAY.reset()
+    yield
+    DISPLAY.reset()
+
+
+@pytest.fixture
+def fake_display_handler() -> DisplayHandler:
+    return DisplayHandler(Queue())
+
+
+def test_display_protocol_override(monkeypatch: pytest.MonkeyPatch) -> None:
+    monkeypatch.setenv("FLASHFOCUS_DISPLAY_PROTOCOL", "fake")
+    assert get_display_protocol() is DisplayProtocol.FAKE
+
+
+def test_invalid_display_protocol_override(monkeypatch: pytest.MonkeyPatch) -> None:
+    monkeypatch.setenv("FLASHFOCUS_DISPLAY_PROTOCOL", "foo")
+    with pytest.raises(UnsupportedWM):
+        get_display_protocol()
+
+
+def test_list_mapped_windows_by_workspace() -> None:
+    windows = [DISPLAY.create_window(workspace=workspace) for workspace in [0, 1, 1]]
+    assert list_mapped_windows() == windows
+    assert list_mapped_windows(1) == windows[1:]
+    assert list_mapped_windows(2) == []
+
+
+def test_restore_full_opacity_skips_opaque_windows() -> None:
+    windows = [DISPLAY.create_window() for _ in range(3)]
+    windows[0].set_opacity(0.5)
+    windows[1].set_opacity(1)
+    assert restore_full_opacity() == 1
+    assert [window.opacity for window in windows] == [1, 1, None]
+    assert len(DISPLAY.opacity_history(windows[1].id)) == 1
+
+
+def test_destroyed_windows_are_unmapped() -> None:
+    window = DISPLAY.create_window()
+    window.destroy()
+    assert list_mapped_windows() == []
+    with pytest.raises(WMError):
+        window.properties
+
+
+def test_focus_switches_workspace() -> None:
+    window = DISPLAY.create_window(workspace=3)
+    DISPLAY.focus(window.id)
+    assert get_focused_window() == window
+    assert get_focused_workspace() == 3
+    assert get_workspace(window) == 3
+
+
+def test_set_opacity_records_virtual_time() -> None:
+    window = DISPLAY.create_window()
+    window.set_opacity(0.5)
+    DISPLAY.advance(0.25)
+    window.set_opacity(1)
+    assert window.opacity == 1
+    assert DISPLAY.opacity_history(window.id) == [(0, 0.5), (0.25, 1)]
+
+
+def test_set_opacity_of_nonexistant_window_ignored() -> None:
+    Window(1000).set_opacity(0.5)
+
+
+def test_fullscreen() -> None:
+    window = DISPLAY.create_window()
+    assert not window.is_fullscreen()
+    DISPLAY.set_fullscreen(window.id)
+    assert window.is_fullscreen()
+
+
+@pytest.mark.parametrize(
+    "rule,should_match",
+    [
+        ({"window_class": r"^Term.*$"}, True),
+        ({"app_id": r"termite"}, True),
+        ({"window_class": r"Termite", "app_id": r"firefox"}, False),
+        (dict(), True),
+    ],
+)
+def test_rule_matching(rule: dict[str, str], should_match: bool) -> None:
+    window = DISPLAY.create_window(window_class="Termite", app_id="termite")
+    assert window.match(rule) == should_match
+
+
+def test_display_handler_queues_injected_events(fake_display_handler: DisplayHandler) -> None:
+    with producer_running(fake_display_handler):
+        window = DISPLAY.create_window()
+        DISPLAY.focus(window.id)
+    # Events after the handler stops are not queued
+    DISPLAY.focus(window.id)
+    assert queue_to_list(fake_display_handler.queue) == [
+        WMEvent(window=window, event_type=WMEventType.NEW_WINDOW),
+        WMEvent(window=window, event_type=WMEventType.FOCUS_SHIFT),
+    ]
+
+
+def test_queued_events_carry_the_workspace(fake_display_handler: DisplayHandler) -> None:
+    with producer_running(fake_display_handler):
+        window = DISPLAY.create_window(workspace=2)
+        DISPLAY.focus(window.id)
+        DISPLAY.switch_workspace(2)
+    assert [event.workspace for event in queue_to_list(fake_display_handler.queue)] == [2, 2, 2]
+
+
+def test_queued_events_are_compact() -> None:
+    windows = [DISPLAY.create_window() for _ in range(10)]
+    queue: Queue = Queue()
+    nevents = 10000
+
+    def queue_events() -> None:
+        for i in range(nevents):
+            queue.put(WMEvent(Window(windows[i % 10].id), WMEventType.FOCUS_SHIFT))
+
+    # An event is a WMEvent, a Window and the queue's reference to the event
+    assert retained_memory(queue_events) / nevents < 128
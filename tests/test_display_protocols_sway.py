@@ -0,0 +1,297 @@
+"""Test suite for the sway backend, run against a stub sway compositor."""
+from __future__ import annotations
+
+import importlib
+from collections.abc import Generator
+from queue import Queue
+from threading import Thread, get_ident
+from time import monotonic, sleep
+from types import ModuleType
+from typing import Any
+
+import pytest
+
+from flashfocus.display import WMEventType
+from flashfocus.event_loop import EventLoop
+from tests.helpers import producer_running, queue_to_list, retained_memory
+from tests.sway_stub import OUTPUT_NAME, StubSway
+
+
+@pytest.fixture(scope="module")
+def stub_sway(tmp_path_factory: pytest.TempPathFactory) -> Generator[StubSway, None, None]:
+    with StubSway(tmp_path_factory.mktemp("sway") / "sway.sock") as stub:
+        yield stub
+
+
+@pytest.fixture(scope="module")
+def sway(stub_sway: StubSway) -> Generator[ModuleType, None, None]:
+    """The sway backend, connected to the stub compositor."""
+    with pytest.MonkeyPatch.context() as monkeypatch:
+        monkeypatch.delenv("I3SOCK", raising=False)
+        monkeypatch.setenv("SWAYSOCK", str(stub_sway.socket_path))
+        module = importlib.import_module("flashfocus.display_protocols.sway")
+        # Make sure the module-level connection points at this stub
+        module = importlib.reload(module)
+        yield module
+
+
+@pytest.fixture(autouse=True)
+def reset_stub(stub_sway: StubSway) -> None:
+    stub_sway.populate({1: 2, 2: 1})
+    stub_sway.commands.clear()
+    stub_sway.opacity.clear()
+    stub_sway.latency = 0
+    stub_sway.tree_latency = 0
+    stub_sway.release_tree_replies()
+    stub_sway.tree_requests = 0
+
+
+def test_list_mapped_windows(sway: ModuleType, stub_sway: StubSway) -> None:
+    window_ids = stub_sway.window_ids
+    assert [window.id for window in sway.list_mapped_windows()] == window_ids
+    assert [window.id for window in sway.list_mapped_windows(1)] == window_ids[:2]
+    assert [window.id for window in sway.list_mapped_windows(2)] == window_ids[2:]
+
+
+def test_get_focused_window(sway: ModuleType, stub_sway: StubSway) -> None:
+    assert sway.get_focused_window().id == stub_sway.window_ids[0]
+    assert sway.get_focused_workspace() == 1
+
+
+def test_get_workspace(sway: ModuleType, stub_sway: StubSway) -> None:
+    windows = sway.list_mapped_windows()
+    assert [sway.get_workspace(window) for window in windows] == [1, 1, 2]
+
+
+def test_window_properties(sway: ModuleType, stub_sway: StubSway) -> None:
+    con_id = stub_sway.new_window(app_id="termite", emit=False)
+    window = next(window for window in sway.list_mapped_windows() if window.id == con_id)
+    assert window.properties["app_id"] == "termite"
+    assert window.match({"app_id": r"^term"})
+    assert not window.match({"app_id": r"firefox"})
+
+
+def test_set_opacity_sends_command(sway: ModuleType, stub_sway: StubSway) -> None:
+    window = sway.list_mapped_windows()[0]
+    window.set_opacity(0.5)
+    assert stub_sway.opacity == {window.id: 0.5}
+    assert [command for _, command in stub_sway.commands] == [f'[con_id="{window.id}"] opacity 0.5']
+
+
+def test_restore_full_opacity_sends_one_command(sway: ModuleType, stub_sway: StubSway) -> None:
+    sway.WINDOWS.clear()
+    windows = sway.list_mapped_windows()
+    windows[0].set_opacity(0.5)
+    windows[1].set_opacity(1)
+    stub_sway.commands.clear()
+    assert sway.restore_full_opacity() == 2
+    assert [command for _, command in stub_sway.commands] == [
+        f'[con_id="{windows[0].id}"] opacity 1; [con_id="{windows[2].id}"] opacity 1'
+    ]
+    assert stub_sway.opacity == {window.id: 1 for window in windows}
+    # Every window is now known to be fully opaque
+    assert sway.restore_full_opacity() == 0
+    assert len(stub_sway.commands) == 1
+
+
+def test_refresh_interval(sway: ModuleType, stub_sway: StubSway) -> None:
+    window = sway.list_mapped_windows()[0]
+    handler = sway.DisplayHandler(Queue())
+    with producer_running(handler):
+        stub_sway.wait_for_subscriber("output")
+        assert window.refresh_interval() == pytest.approx(1 / 60)
+        stub_sway.set_refresh_rate(120000)
+        deadline = monotonic() + 1
+        while window.refresh_interval() != pytest.approx(1 / 120) and monotonic() < deadline:
+            sleep(0.001)
+        assert window.refresh_interval() == pytest.approx(1 / 120)
+    stub_sway.set_refresh_rate(60000)
+    sway._clear_refresh_intervals()
+
+
+def test_output_of_window_is_cached_until_it_moves(
+    sway: ModuleType, stub_sway: StubSway, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    # With outputs of different rates, the window's output must be found
+    monkeypatch.setattr(sway, "_refresh_intervals", {OUTPUT_NAME: 1 / 60, "STUB-2": 1 / 120})
+    window = sway.list_mapped_windows()[0]
+    # Only count the tree queries made by this thread, not those of the handler
+    get_tree = sway.QUERIES.get_tree
+    tree_queries = []
+
+    def counting_get_tree() -> Any:
+        if get_ident() == main_thread:
+            tree_queries.append(None)
+        return get_tree()
+
+    main_thread = get_ident()
+    monkeypatch.setattr(sway.QUERIES, "get_tree", counting_get_tree)
+    handler = sway.DisplayHandler(Queue())
+    with producer_running(handler):
+        deadline = monotonic() + 1
+        while sway._layout_changes is None and monotonic() < deadline:
+            sleep(0.001)
+        assert window.refresh_interval() == pytest.approx(1 / 60)
+        assert window.refresh_interval() == pytest.approx(1 / 60)
+        assert len(tree_queries) == 1
+        stub_sway.emit_window_event("move", window.id)
+        deadline = monotonic() + 1
+        while len(tree_queries) == 1 and monotonic() < deadline:
+            window.refresh_interval()
+            sleep(0.001)
+        assert len(tree_queries) == 2
+    # The cached output isn't trusted while the handler isn't running
+    window.refresh_interval()
+    assert len(tree_queries) == 3
+
+
+def test_destroy_sends_kill_command(sway: ModuleType, stub_sway: StubSway) -> None:
+    window = sway.list_mapped_windows()[0]
+    window.destroy()
+    assert [command for _, command in stub_sway.commands] == [f'[con_id="{window.id}"] kill']
+
+
+def test_windows_dont_keep_the_tree_alive(sway: ModuleType, stub_sway: StubSway) -> None:
+    stub_sway.populate({1: 100})
+    windows: list = []
+    # The stub compositor runs in this process, so its allocations are ignored
+    retained = retained_memory(
+        lambda: windows.extend(sway.list_mapped_windows()), exclude=["*/tests/sway_stub.py"]
+    )
+    assert len(windows) == 100
+    assert retained / len(windows) < 1024
+
+
+def test_is_fullscreen(sway: ModuleType, stub_sway: StubSway) -> None:
+    stub_sway.set_fullscreen(stub_sway.window_ids[0])
+    assert [window.is_fullscreen() for window in sway.list_mapped_windows()] == [
+        True,
+        False,
+        False,
+    ]
+
+
+def test_display_handler_queues_events(sway: ModuleType, stub_sway: StubSway) -> None:
+    handler = sway.DisplayHandler(Queue())
+    with producer_running(handler):
+        stub_sway.wait_for_subscriber("window")
+        focused = stub_sway.window_ids[2]
+        stub_sway.focus(focused)
+        new = stub_sway.new_window()
+        deadline = monotonic() + 1
+        while handler.queue.qsize() < 2 and monotonic() < deadline:
+            sleep(0.001)
+    assert [(event.window.id, event.event_type) for event in queue_to_list(handler.queue)] == [
+        (focused, WMEventType.FOCUS_SHIFT),
+        (new, WMEventType.NEW_WINDOW),
+    ]
+
+
+def test_windows_are_interned(sway: ModuleType, stub_sway: StubSway) -> None:
+    windows = sway.list_mapped_windows()
+    assert sway.list_mapped_windows() == windows
+    assert all(a is b for a, b in zip(sway.list_mapped_windows(), windows))
+    assert sway.get_focused_window() is windows[0]
+
+
+def test_closed_windows_are_evicted(sway: ModuleType, stub_sway: StubSway) -> None:
+    window = sway.list_mapped_windows()[0]
+    handler = sway.DisplayHandler(Queue())
+    with producer_running(handler):
+        stub_sway.wait_for_subscriber("window")
+        stub_sway.close_window(window.id)
+        deadline = monotonic() + 1
+        while window.id in sway.WINDOWS and monotonic() < deadline:
+            sleep(0.001)
+    assert window.id not in sway.WINDOWS
+
+
+def test_fullscreen_state_is_tracked_from_events(sway: ModuleType, stub_sway: StubSway) -> None:
+    window = sway.list_mapped_windows()[0]
+    handler = sway.DisplayHandler(Queue())
+    with producer_running(handler):
+        stub_sway.wait_for_subscriber("window")
+        stub_sway.set_fullscreen(window.id)
+        deadline = monotonic() + 1
+        while not window.is_fullscreen() and monotonic() < deadline:
+            sleep(0.001)
+        assert window.is_fullscreen()
+        stub_sway.set_fullscreen(window.id, False)
+        deadline = monotonic() + 1
+        while window.is_fullscreen() and monotonic() < deadline:
+            sleep(0.001)
+        assert not window.is_fullscreen()
+
+
+def test_display_handler_runs_in_event_loop(sway: ModuleType, stub_sway: StubSway) -> None:
+    handler = sway.DisplayHandler(Queue())
+    loop = EventLoop()
+    handler.setup()
+    loop.add_source(handler)
+    thread = Thread(target=loop.run)
+    thread.start()
+    try:
+        stub_sway.wait_for_subscriber("window")
+        focused = stub_sway.window_ids[1]
+        stub_sway.focus(focused)
+        deadline = monotonic() + 1
+        while handler.queue.empty() and monotonic() < deadline:
+            sleep(0.001)
+    finally:
+        loop.stop()
+        thread.join()
+        handler.teardown()
+        loop.close()
+    assert [(event.window.id, event.event_type) for event in queue_to_list(handler.queue)] == [
+        (focused, WMEventType.FOCUS_SHIFT)
+    ]
+
+
+def test_injected_latency(sway: ModuleType, stub_sway: StubSway) -> None:
+    stub_sway.latency = 0.05
+    start = monotonic()
+    sway.get_focused_window()
+    assert monotonic() - start >= 0.05
+
+
+def test_commands_dont_wait_for_tree_queries(sway: ModuleType, stub_sway: StubSway) -> None:
+    window = sway.list_mapped_windows()[0]
+    stub_sway.hold_tree_replies()
+    query = Thread(target=sway.list_mapped_windows)
+    query.start()
+    try:
+        stub_sway.wait_for_held_tree_reply()
+        command = Thread(target=window.set_opacity, args=[0.5])
+        command.start()
+        # The timeout only guards against hanging if the command waits for the tree query
+        command.join(timeout=5)
+        assert not command.is_alive()
+        assert stub_sway.opacity == {window.id: 0.5}
+        # The tree query was still waiting for its reply
+        assert query.is_alive()
+    finally:
+        stub_sway.release_tree_replies()
+        query.join()
+
+
+def test_focused_workspace_is_tracked_from_events(sway: ModuleType, stub_sway: StubSway) -> None:
+    handler = sway.DisplayHandler(Queue())
+    with producer_running(handler):
+        stub_sway.wait_for_subscriber("workspace")
+        deadline = monotonic() + 1
+        while not sway.FOCUSED_WORKSPACE.tracking and monotonic() < deadline:
+            sleep(0.001)
+        assert sway.get_focused_workspace() == 1
+        stub_sway.focus(stub_sway.window_ids[2])
+        deadline = monotonic() + 1
+        while sway.get_focused_workspace() != 2 and monotonic() < deadline:
+            sleep(0.001)
+        # The tracked workspace is used rather than fetching the tree
+        tree_requests = stub_sway.tree_requests
+        assert sway.get_focused_workspace() == 2
+        assert stub_sway.tree_requests == tree_requests
+    assert not sway.FOCUSED_WORKSPACE.tracking
+    # The focus event carries the workspace which was focused when it was queued
+    assert [(event.window.id, event.workspace) for event in queue_to_list(handler.queue)] == [
+        (stub_sway.window_ids[2], 2)
+    ]
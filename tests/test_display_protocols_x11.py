@@ -2,19 +2,25 @@
 from __future__ import annotations
 
 from collections import namedtuple
+from time import monotonic, sleep
 from unittest.mock import MagicMock
 
 import pytest
-from xcffib.xproto import CreateNotifyEvent
+import xpybutil
+from xcffib.xproto import ConfigureNotifyEvent, CreateNotifyEvent
+from xpybutil.util import get_atom
 
 from flashfocus.compat import (
     DisplayHandler,
     DisplayProtocol,
     Window,
     get_display_protocol,
+    get_focused_workspace,
     list_mapped_windows,
 )
 from flashfocus.display import WMEvent, WMEventType
+from flashfocus.display_protocols import x11
+from tests.compat import set_fullscreen, switch_workspace
 from tests.helpers import producer_running, queue_to_list
 
 Event = namedtuple("Event", "window,atom")
@@ -89,6 +95,114 @@ def test_list_mapped_windows(windows: list[Window]) -> None:
     assert list_mapped_windows(2) == list()
 
 
+def test_windows_are_interned(windows: list[Window]) -> None:
+    assert all(a is b for a, b in zip(list_mapped_windows(0), list_mapped_windows(0)))
+
+
+def test_fullscreen_state_is_tracked_from_events(
+    display_handler: DisplayHandler, window: Window
+) -> None:
+    with producer_running(display_handler):
+        assert not window.is_fullscreen()
+        set_fullscreen(window)
+        deadline = monotonic() + 1
+        while not window.is_fullscreen() and monotonic() < deadline:
+            sleep(0.01)
+    assert window.is_fullscreen()
+
+
+def test_fullscreen_state_isnt_cached_without_display_handler(window: Window) -> None:
+    assert not window.is_fullscreen()
+    set_fullscreen(window)
+    assert window.is_fullscreen()
+
+
+def test_fullscreen_state_of_watched_windows_is_cached(
+    display_handler: DisplayHandler, window: Window, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    get_wm_state = MagicMock(wraps=x11.get_wm_state)
+    monkeypatch.setattr(x11, "get_wm_state", get_wm_state)
+    with producer_running(display_handler):
+        window.watch_fullscreen()
+        assert not window.is_fullscreen()
+        assert not window.is_fullscreen()
+        assert get_wm_state.call_count == 1
+        # Reconfiguring other windows doesn't affect the cached state
+        event = MagicMock(spec=ConfigureNotifyEvent)
+        display_handler._handle_event(event)  # type: ignore[attr-defined]
+        assert not window.is_fullscreen()
+        assert get_wm_state.call_count == 1
+        set_fullscreen(window)
+        deadline = monotonic() + 1
+        while not window.is_fullscreen() and monotonic() < deadline:
+            sleep(0.01)
+        assert window.is_fullscreen()
+        # The new state was fetched by the handler when the window's _NET_WM_STATE changed
+        assert get_wm_state.call_count == 2
+
+
+def test_focused_workspace_is_tracked_from_events(display_handler: DisplayHandler) -> None:
+    screen = x11.SCREENS[xpybutil.root]
+    with producer_running(display_handler):
+        assert screen.workspace.tracking
+        switch_workspace(1)
+        deadline = monotonic() + 1
+        while screen.workspace.workspace != 1 and monotonic() < deadline:
+            sleep(0.01)
+        assert screen.workspace.workspace == 1
+        switch_workspace(0)
+    assert not screen.workspace.tracking
+
+
+@pytest.fixture
+def second_screen(monkeypatch: pytest.MonkeyPatch) -> MagicMock:
+    """A stand-in for a second X screen."""
+    screen = MagicMock(spec=x11.Screen, root=xpybutil.root + 1)
+    monkeypatch.setitem(x11.SCREENS, screen.root, screen)
+    # Restore the focused screen afterwards
+    monkeypatch.setattr(x11, "_focused_root", x11._focused_root)
+    return screen
+
+
+def test_focus_shifts_are_handled_on_every_screen(
+    display_handler: DisplayHandler, second_screen: MagicMock, window: Window
+) -> None:
+    second_screen.get_active_window.return_value = window
+    second_screen.get_current_desktop.return_value = 3
+    second_screen.workspace.tracking = True
+    second_screen.workspace.workspace = 3
+    event = Event(window=second_screen.root, atom=get_atom("_NET_ACTIVE_WINDOW"))
+    display_handler._handle_property_change(event)  # type: ignore[attr-defined]
+    queued = queue_to_list(display_handler.queue)
+    assert queued == [WMEvent(window=window, event_type=WMEventType.FOCUS_SHIFT)]
+    assert queued[0].screen == second_screen.root
+    # The event carries the screen's tracked desktop
+    assert queued[0].workspace == 3
+    # The workspace reported to the router is now the second screen's
+    assert get_focused_workspace() == 3
+
+
+def test_list_mapped_windows_on_another_screen(
+    second_screen: MagicMock, windows: list[Window]
+) -> None:
+    # Desktop 0 of the second screen has no clients, whereas that of the focused screen does
+    second_screen.get_client_list.return_value = []
+    assert list_mapped_windows(0) == windows
+    assert list_mapped_windows(0, screen=second_screen.root) == []
+
+
+def test_screen_state_is_updated_per_screen(
+    display_handler: DisplayHandler, second_screen: MagicMock
+) -> None:
+    second_screen.query_current_desktop.return_value = 2
+    second_screen.query_client_list.return_value = [1, 2]
+    for atom in ["_NET_CURRENT_DESKTOP", "_NET_CLIENT_LIST"]:
+        event = Event(window=second_screen.root, atom=get_atom(atom))
+        display_handler._handle_property_change(event)  # type: ignore[attr-defined]
+    second_screen.workspace.update.assert_called_once_with(2)
+    assert second_screen.client_ids == [1, 2]
+
+
 def test_display_handler_handle_property_change_ignores_null_windows(
     display_handler: DisplayHandler, monkeypatch: pytest.MonkeyPatch
 ) -> None:
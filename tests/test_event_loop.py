@@ -0,0 +1,135 @@
+"""Test suite for the single-threaded event loop."""
+from __future__ import annotations
+
+import socket
+import threading
+from collections.abc import Generator
+from contextlib import contextmanager
+from time import monotonic, sleep
+
+import pytest
+
+from flashfocus.client import client_request_flash
+from flashfocus.display_protocols.fake import FakeDisplay
+from flashfocus.event_loop import EventLoop
+from flashfocus.server import FlashServer
+from tests.helpers import quick_conf
+
+
+class SocketSource:
+    """Event source which reads bytes from a socket."""
+
+    def __init__(self, sock: socket.socket) -> None:
+        self.sock = sock
+        self.sock.setblocking(False)
+        self.received = b""
+        self.keep_going = True
+
+    def fileno(self) -> int:
+        return self.sock.fileno()
+
+    def handle_events(self) -> None:
+        data = self.sock.recv(1024)
+        if data:
+            self.received += data
+        else:
+            self.keep_going = False
+
+    def handle_buffered_events(self) -> None:
+        pass
+
+
+@contextmanager
+def loop_running(loop: EventLoop) -> Generator[EventLoop, None, None]:
+    thread = threading.Thread(target=loop.run)
+    thread.start()
+    try:
+        yield loop
+    finally:
+        loop.stop()
+        thread.join()
+        loop.close()
+
+
+def wait_for(condition, timeout: float = 1) -> bool:  # type: ignore[no-untyped-def]
+    deadline = monotonic() + timeout
+    while not condition() and monotonic() < deadline:
+        sleep(0.001)
+    return bool(condition())
+
+
+def test_callbacks_run_in_order_of_deadline() -> None:
+    calls: list[str] = []
+    loop = EventLoop()
+    loop.call_later(0.02, calls.append, "second")
+    loop.call_later(0.01, calls.append, "first")
+    loop.call_later(0.03, loop.stop)
+    start = monotonic()
+    loop.run()
+    loop.close()
+    assert calls == ["first", "second"]
+    assert monotonic() - start >= 0.03
+
+
+def test_callbacks_scheduled_from_another_thread_wake_up_the_loop() -> None:
+    calls: list[int] = []
+    with loop_running(EventLoop()) as loop:
+        sleep(0.05)
+        loop.call_soon(calls.append, 1)
+        assert wait_for(lambda: calls == [1], timeout=0.5)
+
+
+def test_sources_are_handled_when_readable() -> None:
+    ours, theirs = socket.socketpair()
+    source = SocketSource(ours)
+    loop = EventLoop()
+    loop.add_source(source)
+    with loop_running(loop):
+        theirs.sendall(b"abc")
+        assert wait_for(lambda: source.received == b"abc")
+        theirs.close()
+        # Sources are removed once they stop
+        assert wait_for(lambda: not source.keep_going)
+        assert wait_for(lambda: len(loop._selector.get_map()) == 1)
+    ours.close()
+
+
+def test_idle_loop_doesnt_wake_up(monkeypatch: pytest.MonkeyPatch) -> None:
+    loop = EventLoop()
+    iterations = 0
+    run_once = loop._run_once
+
+    def counting_run_once() -> None:
+        nonlocal iterations
+        iterations += 1
+        run_once()
+
+    monkeypatch.setattr(loop, "_run_once", counting_run_once)
+    with loop_running(loop):
+        sleep(0.3)
+    # One iteration to start waiting and one to handle the stop
+    assert iterations <= 2
+
+
+def test_server_handles_events_in_a_single_thread(fake_backend: FakeDisplay) -> None:
+    windows = [fake_backend.create_window(), fake_backend.create_window()]
+    server = FlashServer(quick_conf(), loop=EventLoop())
+    nthreads = threading.active_count()
+    thread = threading.Thread(target=server.event_loop)
+    thread.start()
+    try:
+        assert wait_for(lambda: server.ready)
+        fake_backend.focus(windows[1].id)
+        assert wait_for(lambda: len(fake_backend.opacity_history(windows[1].id)) == 6)
+        client_request_flash()
+        assert wait_for(lambda: len(fake_backend.opacity_history(windows[1].id)) == 11)
+        # Only the loop's thread was started
+        assert threading.active_count() == nthreads + 1
+    finally:
+        server.shutdown(disconnect_from_wm=False)
+        thread.join()
+
+    opacities = [opacity for _, opacity in fake_backend.opacity_history(windows[1].id)]
+    # Default opacity, two flashes and the reset on shutdown
+    assert opacities.count(0.8) == 2
+    assert opacities[-1] == 1
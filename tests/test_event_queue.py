@@ -0,0 +1,88 @@
+"""Test suite for flashfocus.event_queue."""
+from __future__ import annotations
+
+from queue import Empty
+
+import pytest
+
+from flashfocus.display import WMEvent, WMEventType
+from flashfocus.display_protocols.fake import Window
+from flashfocus.event_queue import EventQueue
+from flashfocus.server import ConfigReload
+from flashfocus.stats import STATS
+from tests.helpers import queue_to_list
+
+
+@pytest.fixture(autouse=True)
+def reset_stats() -> None:
+    STATS.reset()
+
+
+def event(window_id: int, event_type: WMEventType = WMEventType.FOCUS_SHIFT) -> WMEvent:
+    return WMEvent(window=Window(window_id), event_type=event_type)
+
+
+def summarize(queue: EventQueue) -> list[tuple[int, WMEventType]]:
+    return [(item.window.id, item.event_type) for item in queue_to_list(queue)]
+
+
+def test_events_are_handled_in_order_of_priority() -> None:
+    queue = EventQueue()
+    queue.put(event(1, WMEventType.NEW_WINDOW))
+    queue.put(event(2, WMEventType.FOCUS_SHIFT))
+    queue.put(event(3, WMEventType.CLIENT_REQUEST))
+    queue.put(event(4, WMEventType.FOCUS_SHIFT))
+    assert summarize(queue) == [
+        (3, WMEventType.CLIENT_REQUEST),
+        (2, WMEventType.FOCUS_SHIFT),
+        (4, WMEventType.FOCUS_SHIFT),
+        (1, WMEventType.NEW_WINDOW),
+    ]
+    assert STATS.timings["queue.focus_shift.wait"].count == 2
+
+
+def test_other_messages_are_handled_first() -> None:
+    queue = EventQueue()
+    queue.put(event(1, WMEventType.CLIENT_REQUEST))
+    reload = ConfigReload({})
+    queue.put(reload)
+    assert queue.get() is reload
+    assert queue.get().window.id == 1
+    with pytest.raises(Empty):
+        queue.get(timeout=0.01)
+
+
+def test_drop_oldest_policy() -> None:
+    queue = EventQueue(size=2, overflow={"focus-shift": "drop-oldest"})
+    for window_id in [1, 2, 1]:
+        queue.put(event(window_id))
+    assert [window_id for window_id, _ in summarize(queue)] == [2, 1]
+    assert STATS.counters == {"queue.focus_shift.dropped": 1}
+
+
+def test_coalesce_policy() -> None:
+    queue = EventQueue(size=2, overflow={"focus-shift": "coalesce"})
+    for window_id in [1, 2, 1, 3]:
+        queue.put(event(window_id))
+    # The second event for window 1 replaces the first, then window 2 is dropped to make room
+    assert [window_id for window_id, _ in summarize(queue)] == [1, 3]
+    assert STATS.counters == {"queue.focus_shift.coalesced": 1, "queue.focus_shift.dropped": 1}
+
+
+def test_each_event_type_has_its_own_bound() -> None:
+    queue = EventQueue(size=1)
+    queue.put(event(1, WMEventType.FOCUS_SHIFT))
+    queue.put(event(2, WMEventType.NEW_WINDOW))
+    queue.put(event(3, WMEventType.CLIENT_REQUEST))
+    assert queue.qsize() == 3
+    assert STATS.counters == {}
+
+
+def test_configure() -> None:
+    queue = EventQueue.from_config({"event_queue_size": 3})
+    assert queue.size == 3
+    assert queue.overflow[WMEventType.FOCUS_SHIFT] == "coalesce"
+    queue.configure({"event_queue_size": 1, "event_queue_overflow": {"focus-shift": "drop-oldest"}})
+    for window_id in [1, 2, 3]:
+        queue.put(event(window_id))
+    assert [window_id for window_id, _ in summarize(queue)] == [3]
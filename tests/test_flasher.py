@@ -7,10 +7,36 @@ import pytest
 from pytest_mock import MockerFixture
 
 from flashfocus.compat import Window
-from flashfocus.flasher import Flasher
+from flashfocus.display_protocols import fake
+from flashfocus.errors import WMError
+from flashfocus.flasher import MIN_FRAMES_BEFORE_INCREASE, Flasher
+from flashfocus.stats import STATS
 from tests.helpers import change_focus, new_watched_window, watching_windows
 
 
+@pytest.fixture(autouse=True)
+def reset_stats() -> None:
+    STATS.reset()
+
+
+@pytest.fixture
+def fake_window(fake_backend: fake.FakeDisplay) -> fake.Window:
+    return fake_backend.create_window()
+
+
+@pytest.fixture
+def manual_flasher(fake_backend: fake.FakeDisplay) -> Flasher:
+    return Flasher(
+        default_opacity=1,
+        flash_opacity=0.8,
+        time=100,
+        ntimepoints=4,
+        simple=False,
+        scheduler=fake_backend.scheduler,
+        adaptive_frames=True,
+    )
+
+
 def test_flash(flasher: Flasher, window: Window) -> None:
     change_focus(window)
     expected_opacity = [1.0] + flasher.flash_series + [1.0]
@@ -41,6 +67,188 @@ def test_flash_conflicts_are_restarted(flasher: Flasher) -> None:
     assert num_completions == 2 and len(watcher.opacity_events) > 2
 
 
+def test_flash_frames_are_evenly_spaced(manual_flasher: Flasher, fake_window: fake.Window) -> None:
+    manual_flasher.flash(fake_window)
+    fake.DISPLAY.advance(1)
+    times, opacities = zip(*fake.DISPLAY.opacity_history(fake_window.id))
+    assert times == pytest.approx([0, 0.025, 0.05, 0.075, 0.1])
+    assert opacities == pytest.approx([0.8, 0.85, 0.9, 0.95, 1])
+
+
+def test_flash_conflicts_are_restarted_in_virtual_time(
+    manual_flasher: Flasher, fake_window: fake.Window
+) -> None:
+    manual_flasher.flash(fake_window)
+    fake.DISPLAY.advance(0.03)
+    manual_flasher.flash(fake_window)
+    fake.DISPLAY.advance(1)
+    opacities = [opacity for _, opacity in fake.DISPLAY.opacity_history(fake_window.id)]
+    assert opacities == pytest.approx([0.8, 0.85, 0.8, 0.85, 0.9, 0.95, 1])
+    assert manual_flasher.progress == {}
+
+
+def flash_repeatedly(flasher: Flasher, window: fake.Window, nflashes: int) -> None:
+    for _ in range(nflashes):
+        flasher.flash(window)
+        fake.DISPLAY.scheduler.run_until_idle()
+
+
+def test_frame_count_adapts_to_write_latency(
+    manual_flasher: Flasher, fake_window: fake.Window
+) -> None:
+    # Writes take longer than the 25ms between frames
+    fake.DISPLAY.write_latency = 0.03
+    flash_repeatedly(manual_flasher, fake_window, 3)
+    assert manual_flasher.ntimepoints == 2
+    assert manual_flasher.timechunk == pytest.approx(0.05)
+    assert STATS.counters["flasher.ntimepoints_decreased"] == 1
+
+    # Latency which is below the frame interval but too high for more frames doesn't cause any
+    # further changes
+    fake.DISPLAY.write_latency = 0.01
+    flash_repeatedly(manual_flasher, fake_window, 50)
+    assert manual_flasher.ntimepoints == 2
+
+    fake.DISPLAY.write_latency = 0.001
+    flash_repeatedly(manual_flasher, fake_window, MIN_FRAMES_BEFORE_INCREASE // 3 + 1)
+    assert manual_flasher.ntimepoints == 4
+    assert STATS.counters["flasher.ntimepoints_increased"] == 1
+
+
+def test_frame_latency_excludes_frames_of_other_windows(
+    manual_flasher: Flasher, fake_backend: fake.FakeDisplay
+) -> None:
+    windows = [fake_backend.create_window() for _ in range(3)]
+    # Each write is quick enough, but the frames of all windows together take longer than the 25ms
+    # between frames
+    fake_backend.write_latency = 0.02
+    for _ in range(3):
+        for window in windows:
+            manual_flasher.flash(window)
+        fake_backend.scheduler.run_until_idle()
+    assert manual_flasher.ntimepoints == 4
+
+
+def test_frame_count_decreases_to_simple_mode(
+    manual_flasher: Flasher, fake_window: fake.Window
+) -> None:
+    fake.DISPLAY.write_latency = 0.2
+    flash_repeatedly(manual_flasher, fake_window, 10)
+    assert manual_flasher.ntimepoints == 1
+    assert manual_flasher.flash_series == [0.8]
+
+
+def test_frame_count_changes_during_a_flash(
+    manual_flasher: Flasher, fake_window: fake.Window
+) -> None:
+    fake.DISPLAY.write_latency = 0.03
+    manual_flasher.flash(fake_window)
+    fake.DISPLAY.advance(0.15)
+    # Restart the flash after 3 frames, so that the frame count is halved by its 2nd frame
+    manual_flasher.flash(fake_window)
+    fake.DISPLAY.scheduler.run_until_idle()
+    opacities = [opacity for _, opacity in fake.DISPLAY.opacity_history(fake_window.id)]
+    # The flash continues from the same point in the animation
+    assert opacities == pytest.approx([0.8, 0.85, 0.9, 0.8, 0.85, 0.9, 1])
+    assert manual_flasher.ntimepoints == 2
+    assert manual_flasher.progress == {}
+
+
+def test_frames_are_paced_to_the_refresh_rate(fake_window: fake.Window) -> None:
+    fake.DISPLAY.refresh_interval = 1 / 60
+    flasher = Flasher(
+        default_opacity=1,
+        flash_opacity=0.8,
+        time=100,
+        ntimepoints=10,
+        simple=False,
+        scheduler=fake.DISPLAY.scheduler,
+    )
+    flasher.flash(fake_window)
+    fake.DISPLAY.advance(1)
+    times, opacities = zip(*fake.DISPLAY.opacity_history(fake_window.id))
+    # Frames land on refresh boundaries, and only the last of the frames which would land in the
+    # same refresh interval is drawn
+    assert times == pytest.approx([i / 60 for i in range(7)])
+    assert opacities == pytest.approx([0.8, 0.82, 0.86, 0.9, 0.92, 0.96, 1])
+    assert STATS.counters["flasher.frames_skipped"] == 4
+    assert flasher.progress == {}
+
+
+def test_fast_forward(manual_flasher: Flasher, fake_window: fake.Window) -> None:
+    manual_flasher.flash(fake_window)
+    fake.DISPLAY.advance(0.03)
+    manual_flasher.fast_forward(fake_window)
+    fake.DISPLAY.advance(1)
+    times, opacities = zip(*fake.DISPLAY.opacity_history(fake_window.id))
+    # The next frame restores the default opacity
+    assert times == pytest.approx([0, 0.025, 0.05])
+    assert opacities == pytest.approx([0.8, 0.85, 1])
+    assert STATS.counters["flasher.frames_fast_forwarded"] == 2
+    assert manual_flasher.progress == {}
+
+
+def test_fast_forward_ignores_windows_which_arent_flashing(
+    manual_flasher: Flasher, fake_window: fake.Window
+) -> None:
+    manual_flasher.fast_forward(fake_window)
+    fake.DISPLAY.advance(1)
+    assert fake.DISPLAY.opacity_history(fake_window.id) == []
+
+
+def test_frame_count_is_fixed_if_not_adaptive(fake_window: fake.Window) -> None:
+    flasher = Flasher(
+        default_opacity=1,
+        flash_opacity=0.8,
+        time=100,
+        ntimepoints=4,
+        simple=False,
+        scheduler=fake.DISPLAY.scheduler,
+        adaptive_frames=False,
+    )
+    fake.DISPLAY.write_latency = 0.2
+    flash_repeatedly(flasher, fake_window, 10)
+    assert flasher.ntimepoints == 4
+
+
+def test_when_finished(manual_flasher: Flasher, fake_window: fake.Window) -> None:
+    finished: list[float] = []
+    # Windows which aren't flashing have already finished
+    manual_flasher.when_finished(fake_window, finished.append, 0)
+    assert finished == [0]
+
+    manual_flasher.flash(fake_window)
+    fake.DISPLAY.advance(0.05)
+    manual_flasher.when_finished(fake_window, lambda: finished.append(fake.DISPLAY.scheduler.now()))
+    assert finished == [0]
+    fake.DISPLAY.advance(1)
+    assert finished == pytest.approx([0, 0.1])
+
+
+def test_failed_frames_end_the_flash(
+    mocker: MockerFixture, manual_flasher: Flasher, fake_window: fake.Window
+) -> None:
+    mocker.patch.object(fake.DISPLAY, "set_opacity", side_effect=WMError("Invalid window"))
+    manual_flasher.flash(fake_window)
+    fake.DISPLAY.advance(1)
+    assert manual_flasher.progress == {}
+    assert fake.DISPLAY.scheduler.pending == 0
+
+    # The window can still be flashed once writes succeed again
+    mocker.stopall()
+    manual_flasher.flash(fake_window)
+    fake.DISPLAY.advance(1)
+    opacities = [opacity for _, opacity in fake.DISPLAY.opacity_history(fake_window.id)]
+    assert opacities == pytest.approx([0.8, 0.85, 0.9, 0.95, 1])
+
+
+def test_set_default_opacity(manual_flasher: Flasher, fake_window: fake.Window) -> None:
+    manual_flasher.default_opacity = 0.5
+    manual_flasher.set_default_opacity(fake_window)
+    fake.DISPLAY.advance(0)
+    assert fake_window.opacity == 0.5
+
+
 @pytest.mark.parametrize(
     "flash_opacity,default_opacity,ntimepoints,expected_result",
     [
@@ -71,6 +279,6 @@ def test_compute_flash_series(
 def test_flash_requests_ignored_if_no_opacity_change(
     mocker: MockerFixture, pointless_flasher: Flasher, window: Window
 ) -> None:
-    pointless_flasher._flash = mocker.MagicMock()  # type: ignore
+    pointless_flasher._flash_frame = mocker.MagicMock()  # type: ignore
     pointless_flasher.flash(window)
-    pointless_flasher._flash.assert_not_called()  # type: ignore
+    pointless_flasher._flash_frame.assert_not_called()  # type: ignore
@@ -0,0 +1,55 @@
+"""Test suite for flashfocus.profiling."""
+from __future__ import annotations
+
+import pstats
+from pathlib import Path
+from threading import Thread
+from time import monotonic
+
+from flashfocus.profiling import SamplingProfiler
+
+
+def busy_loop(seconds: float) -> None:
+    end = monotonic() + seconds
+    while monotonic() < end:
+        pass
+
+
+def test_profiler_samples_other_threads(tmp_path: Path) -> None:
+    profile_file = tmp_path / "out.prof"
+    profiler = SamplingProfiler(profile_file, interval=0.001)
+    profiler.start()
+    worker = Thread(target=busy_loop, args=[0.2])
+    worker.start()
+    worker.join()
+    profiler.stop()
+
+    stats = pstats.Stats(str(profile_file)).stats  # type: ignore[attr-defined]
+    sampled_functions = {name for _, _, name in stats}
+    assert "busy_loop" in sampled_functions
+    assert "run" in sampled_functions
+
+
+def test_profiler_stops_after_duration(tmp_path: Path) -> None:
+    profile_file = tmp_path / "out.prof"
+    profiler = SamplingProfiler(profile_file, duration=0.05, interval=0.001)
+    profiler.start()
+    profiler.join(timeout=5)
+    assert not profiler.is_alive()
+    assert profile_file.exists()
+
+
+def test_concurrent_dumps_write_a_complete_profile(tmp_path: Path) -> None:
+    profile_file = tmp_path / "out.prof"
+    profiler = SamplingProfiler(profile_file, interval=0.001)
+    profiler.start()
+    busy_loop(0.05)
+    dumpers = [Thread(target=profiler.dump) for _ in range(4)]
+    for dumper in dumpers:
+        dumper.start()
+    for dumper in dumpers:
+        dumper.join()
+    profiler.stop()
+
+    assert pstats.Stats(str(profile_file)).stats  # type: ignore[attr-defined]
+    assert list(tmp_path.iterdir()) == [profile_file]
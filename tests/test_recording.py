@@ -0,0 +1,80 @@
+"""Test suite for recording and replaying window manager events."""
+from __future__ import annotations
+
+import json
+import os
+import subprocess
+import sys
+from collections.abc import Generator
+from pathlib import Path
+
+import pytest
+
+from flashfocus.display import WMEvent, WMEventType
+from flashfocus.display_protocols.fake import DISPLAY
+from flashfocus.recording import EventRecorder, RecordedEvent, read_recording
+
+
+@pytest.fixture(autouse=True)
+def fake_display() -> Generator[None, None, None]:
+    DISPLAY.reset()
+    yield
+    DISPLAY.reset()
+
+
+def test_recording_round_trip(tmp_path: Path) -> None:
+    window = DISPLAY.create_window(window_class="Termite", app_id="termite", workspace=2)
+    DISPLAY.set_fullscreen(window.id)
+    recorder = EventRecorder(tmp_path / "recording.jsonl")
+    recorder.record(WMEvent(window=window, event_type=WMEventType.FOCUS_SHIFT), workspace=2)
+    recorder.record(WMEvent(window=window, event_type=WMEventType.CLIENT_REQUEST), workspace=2)
+    recorder.close()
+    events = list(read_recording(tmp_path / "recording.jsonl"))
+    assert [event.event_type for event in events] == ["FOCUS_SHIFT", "CLIENT_REQUEST"]
+    assert events[0].time == 0
+    assert events[1].time >= 0
+    assert events[0].window == window.id
+    assert events[0].properties == window.properties
+    assert events[0].workspace == 2
+    assert events[0].fullscreen
+
+
+def test_replay_against_fake_backend(tmp_path: Path) -> None:
+    recording = tmp_path / "recording.jsonl"
+    events = [
+        RecordedEvent(
+            time=i * 0.01,
+            event_type="FOCUS_SHIFT",
+            window=i % 3,
+            properties={"window_class": f"Window_{i % 3}"},
+            workspace=i % 2,
+            fullscreen=False,
+        )
+        for i in range(10)
+    ]
+    recording.write_text("".join(json.dumps(event.__dict__) + "\n" for event in events))
+    config = tmp_path / "config.yml"
+    config.write_text("time: 10\nntimepoints: 2\n")
+    # The replay selects the display backend before flashfocus.compat is imported, so it needs a
+    # fresh process
+    process = subprocess.run(
+        [
+            sys.executable,
+            "-m",
+            "flashfocus.replay",
+            str(recording),
+            "--config",
+            str(config),
+            "--speed",
+            "0",
+            "--json",
+        ],
+        capture_output=True,
+        text=True,
+        env={**os.environ, "PYTHONPATH": os.pathsep.join(sys.path)},
+    )
+    assert process.returncode == 0, process.stderr
+    report = json.loads(process.stdout)
+    assert report["events"] == 10
+    assert report["errors"] == 0
+    assert report["throughput"] > 0
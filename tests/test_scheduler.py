@@ -0,0 +1,71 @@
+"""Test suite for flashfocus.scheduler."""
+from __future__ import annotations
+
+from threading import Event
+
+import pytest
+
+from flashfocus.scheduler import ManualScheduler, MonotonicScheduler
+
+
+def test_manual_scheduler_runs_callbacks_in_order() -> None:
+    scheduler = ManualScheduler()
+    calls: list[tuple[str, float]] = []
+    scheduler.call_later(0.2, lambda: calls.append(("b", scheduler.now())))
+    scheduler.call_later(0.1, lambda: calls.append(("a", scheduler.now())))
+    scheduler.call_later(0.2, lambda: calls.append(("c", scheduler.now())))
+    scheduler.advance(0.15)
+    assert calls == [("a", 0.1)]
+    assert scheduler.now() == 0.15
+    scheduler.advance(1)
+    assert calls == [("a", 0.1), ("b", 0.2), ("c", 0.2)]
+
+
+def test_manual_scheduler_runs_callbacks_scheduled_by_callbacks() -> None:
+    scheduler = ManualScheduler()
+    times: list[float] = []
+
+    def tick() -> None:
+        times.append(scheduler.now())
+        if len(times) < 3:
+            scheduler.call_later(0.5, tick)
+
+    scheduler.call_soon(tick)
+    scheduler.run_until_idle()
+    assert times == [0, 0.5, 1.0]
+    assert scheduler.pending == 0
+
+
+def test_manual_scheduler_cannot_go_backwards() -> None:
+    with pytest.raises(ValueError):
+        ManualScheduler().advance(-1)
+
+
+def test_manual_scheduler_callbacks_can_sleep() -> None:
+    scheduler = ManualScheduler()
+    times: list[float] = []
+    scheduler.call_later(0.1, scheduler.sleep, 0.3)
+    scheduler.call_later(0.2, lambda: times.append(scheduler.now()))
+    scheduler.advance(0.25)
+    # The second callback was due during the first callback's sleep, so it runs late
+    assert times == [0.4]
+    assert scheduler.now() == 0.4
+
+
+def test_manual_scheduler_survives_callback_errors() -> None:
+    scheduler = ManualScheduler()
+    calls = []
+    scheduler.call_soon(lambda: 1 / 0)
+    scheduler.call_soon(lambda: calls.append(1))
+    scheduler.advance(0)
+    assert calls == [1]
+
+
+def test_monotonic_scheduler_runs_callbacks() -> None:
+    scheduler = MonotonicScheduler()
+    done = Event()
+    start = scheduler.now()
+    scheduler.call_later(0.01, done.set)
+    assert done.wait(timeout=5)
+    assert scheduler.now() - start >= 0.01
+    assert scheduler.pending == 0
@@ -3,6 +3,7 @@
 Most of the functionality in flashfocus.router is also tested here.
 """
 from __future__ import annotations
+import re
 from time import sleep
 from unittest.mock import MagicMock, call
 
@@ -12,9 +13,16 @@ from pytest_lazyfixture import lazy_fixture
 from flashfocus.client import client_request_flash
 from flashfocus.compat import Window
 from flashfocus.display import WMEvent, WMEventType
-from flashfocus.server import FlashServer
+from flashfocus.display_protocols.fake import FakeDisplay
+from flashfocus.errors import ConfigLoadError
+from flashfocus.event_queue import EventQueue
+from flashfocus.router import FlashRouter
+from flashfocus.server import ConfigReload, FlashServer
 from tests.compat import change_focus, set_fullscreen, switch_workspace
 from tests.helpers import (
+    fill_in_rule,
+    quick_conf,
+    rekey,
     new_watched_window,
     new_window_session,
     server_running,
@@ -91,6 +99,24 @@ def test_window_opacity_unset_on_shutdown(
     assert windows[1].opacity == pytest.approx(1)
 
 
+def test_shutdown_restores_translucent_windows(
+    fake_backend: FakeDisplay, caplog: pytest.LogCaptureFixture
+) -> None:
+    windows = [fake_backend.create_window(window_class="Term"), fake_backend.create_window()]
+    server = FlashServer(terminal_rule_conf(default_opacity=0.5), scheduler=fake_backend.scheduler)
+    server._set_all_window_opacity_to_default()
+    fake_backend.advance(1)
+    # The server was never started
+    server.producers = []
+    with caplog.at_level("INFO"):
+        server.shutdown(disconnect_from_wm=False)
+
+    assert [window.opacity for window in windows] == [1, 1]
+    # The window which was already fully opaque isn't changed again
+    assert [opacity for _, opacity in fake_backend.opacity_history(windows[1].id)] == [1]
+    assert re.search(r"Reset 1 windows to full opacity in \d", caplog.text)
+
+
 def test_new_window_opacity_set_to_default(
     transparent_flash_server: FlashServer, list_only_test_windows: None
 ) -> None:
@@ -166,6 +192,69 @@ def test_workspace_switching_behavior(server: FlashServer, expected_num_flashes:
     assert watchers[0].count_flashes() == expected_num_flashes
 
 
+@pytest.mark.parametrize(
+    "flash_lone_windows,expected_num_flashes",
+    [("never", 0), ("on_switch", 1), ("on_open_close", 0)],
+)
+def test_focus_shift_uses_focused_workspace(
+    fake_backend: FakeDisplay,
+    monkeypatch: pytest.MonkeyPatch,
+    flash_lone_windows: str,
+    expected_num_flashes: int,
+) -> None:
+    windows = [fake_backend.create_window(workspace=0) for _ in range(2)]
+    lone_window = fake_backend.create_window(workspace=1)
+    router = FlashRouter(
+        rekey(quick_conf(), {"flash_lone_windows": flash_lone_windows}),
+        scheduler=fake_backend.scheduler,
+    )
+    # Focus events shouldn't need to look up the workspace of the window
+    monkeypatch.setattr("flashfocus.compat.get_workspace", MagicMock(side_effect=AssertionError))
+    for window in [windows[0], lone_window]:
+        fake_backend.focus(window.id)
+        router.route_request(WMEvent(window=window, event_type=WMEventType.FOCUS_SHIFT))
+    fake_backend.advance(1)
+
+    assert router.prev_workspace == 0
+    assert router.current_workspace == 1
+    opacities = [opacity for _, opacity in fake_backend.opacity_history(lone_window.id)]
+    assert opacities.count(0.8) == expected_num_flashes
+
+
+def test_focus_shift_uses_workspace_of_event(fake_backend: FakeDisplay) -> None:
+    windows = [fake_backend.create_window(workspace=0) for _ in range(2)]
+    fake_backend.create_window(workspace=1)
+    router = FlashRouter(
+        rekey(quick_conf(), {"flash_lone_windows": "never"}), scheduler=fake_backend.scheduler
+    )
+    # The display has moved on to a workspace with a lone window since the event was queued
+    fake_backend.switch_workspace(1)
+    router.route_request(WMEvent(windows[0], WMEventType.FOCUS_SHIFT, workspace=0))
+    fake_backend.advance(1)
+
+    assert router.current_workspace == 0
+    opacities = [opacity for _, opacity in fake_backend.opacity_history(windows[0].id)]
+    assert opacities.count(0.8) == 1
+
+
+@pytest.mark.parametrize("screens,expected_num_flashes", [((1, 1), 1), ((1, 2), 0)])
+def test_same_desktop_on_another_screen_is_another_workspace(
+    fake_backend: FakeDisplay, screens: tuple[int, int], expected_num_flashes: int
+) -> None:
+    windows = [fake_backend.create_window(workspace=0), fake_backend.create_window(workspace=1)]
+    router = FlashRouter(
+        rekey(quick_conf(), {"flash_lone_windows": "on_open_close"}),
+        scheduler=fake_backend.scheduler,
+    )
+    # Each window is alone on desktop 0 of its screen
+    for window, screen in zip(windows, screens):
+        router.route_request(WMEvent(window, WMEventType.FOCUS_SHIFT, workspace=0, screen=screen))
+    fake_backend.advance(1)
+
+    opacities = [opacity for _, opacity in fake_backend.opacity_history(windows[1].id)]
+    assert opacities.count(0.8) == expected_num_flashes
+
+
 def test_flash_fullscreen_server_flashes_fullscreen_windows(flash_server: FlashServer) -> None:
     with new_watched_window() as (window, watcher):
         set_fullscreen(window)
@@ -186,3 +275,158 @@ def test_no_flash_fullscreen_false_server_doesnt_flash_fullscreen_windows(
             change_focus(window)
 
     assert watcher.count_flashes() == 0
+
+
+def terminal_rule_conf(**rule: float) -> dict:
+    """A config with a rule for windows with the Term class."""
+    return rekey(
+        quick_conf(), {"rules": [fill_in_rule({"window_class": re.compile("^Term$"), **rule})]}
+    )
+
+
+@pytest.mark.parametrize(
+    "config,expected_browser_opacities",
+    [
+        # Only the terminal's rule fast-forwards flashes
+        (terminal_rule_conf(fast_forward_on_unfocus=True), [0.8, 0.85, 0.9, 0.95, 1]),
+        (rekey(quick_conf(), {"fast_forward_on_unfocus": True}), [0.8, 0.85, 1]),
+    ],
+)
+def test_focus_shift_fast_forwards_previous_flash(
+    fake_backend: FakeDisplay, config: dict, expected_browser_opacities: list[float]
+) -> None:
+    terminal = fake_backend.create_window(window_class="Term")
+    browser = fake_backend.create_window(window_class="Browser")
+    router = FlashRouter(config, scheduler=fake_backend.scheduler)
+    for window in [terminal, browser, terminal]:
+        router.route_request(WMEvent(window=window, event_type=WMEventType.FOCUS_SHIFT))
+        fake_backend.advance(0.03)
+    fake_backend.advance(1)
+
+    terminal_opacities = [opacity for _, opacity in fake_backend.opacity_history(terminal.id)]
+    browser_opacities = [opacity for _, opacity in fake_backend.opacity_history(browser.id)]
+    # The terminal's first flash is cut short when the browser is focused
+    assert terminal_opacities == pytest.approx([0.8, 0.85, 1, 0.8, 0.85, 0.9, 0.95, 1])
+    assert browser_opacities == pytest.approx(expected_browser_opacities)
+
+
+def test_reload_only_resets_windows_whose_default_opacity_changed(
+    fake_backend: FakeDisplay,
+) -> None:
+    terminal = fake_backend.create_window(window_class="Term")
+    browser = fake_backend.create_window(window_class="Browser")
+    router = FlashRouter(terminal_rule_conf(default_opacity=0.5), scheduler=fake_backend.scheduler)
+    for window in [terminal, browser]:
+        router.route_request(WMEvent(window=window, event_type=WMEventType.WINDOW_INIT))
+    fake_backend.advance(1)
+
+    router.reload(terminal_rule_conf(default_opacity=0.7))
+    fake_backend.advance(1)
+
+    assert [opacity for _, opacity in fake_backend.opacity_history(terminal.id)] == [0.5, 0.7]
+    assert [opacity for _, opacity in fake_backend.opacity_history(browser.id)] == [1]
+
+
+def test_reload_keeps_unchanged_flashers(fake_backend: FakeDisplay) -> None:
+    router = FlashRouter(terminal_rule_conf(default_opacity=0.5), scheduler=fake_backend.scheduler)
+    default_flasher = router.flashers[-1]
+
+    router.reload(terminal_rule_conf(default_opacity=0.7))
+
+    assert router.flashers[-1] is default_flasher
+    assert router.flashers[0].default_opacity == 0.7
+
+
+def test_reload_doesnt_interrupt_flashes_in_progress(fake_backend: FakeDisplay) -> None:
+    window = fake_backend.create_window(window_class="Browser")
+    router = FlashRouter(terminal_rule_conf(default_opacity=0.5), scheduler=fake_backend.scheduler)
+    router.route_request(WMEvent(window=window, event_type=WMEventType.FOCUS_SHIFT))
+    fake_backend.advance(0.05)
+
+    router.reload(terminal_rule_conf(default_opacity=0.7))
+    fake_backend.advance(1)
+
+    opacities = [opacity for _, opacity in fake_backend.opacity_history(window.id)]
+    assert opacities == pytest.approx([0.8, 0.85, 0.9, 0.95, 1])
+
+
+def test_reload_resets_window_after_its_flash_finishes(fake_backend: FakeDisplay) -> None:
+    window = fake_backend.create_window(window_class="Browser")
+    router = FlashRouter(quick_conf(), scheduler=fake_backend.scheduler)
+    router.route_request(WMEvent(window=window, event_type=WMEventType.FOCUS_SHIFT))
+    fake_backend.advance(0.05)
+
+    router.reload(rekey(quick_conf(), {"default_opacity": 0.5}))
+    fake_backend.advance(1)
+
+    times, opacities = zip(*fake_backend.opacity_history(window.id))
+    assert opacities == pytest.approx((0.8, 0.85, 0.9, 0.95, 1, 0.5))
+    # The window is reset right after the last frame of the flash
+    assert times[-1] == pytest.approx(times[-2])
+
+
+def test_reload_waits_for_a_restarted_flash_to_finish(fake_backend: FakeDisplay) -> None:
+    window = fake_backend.create_window(window_class="Browser")
+    router = FlashRouter(quick_conf(), scheduler=fake_backend.scheduler)
+    old_flasher = router.flashers[-1]
+    router.route_request(WMEvent(window=window, event_type=WMEventType.FOCUS_SHIFT))
+    fake_backend.advance(0.05)
+
+    router.reload(rekey(quick_conf(), {"default_opacity": 0.5}))
+    # The flash is restarted, so it finishes later than a flash started before the reload would
+    fake_backend.advance(0.03)
+    old_flasher.flash(window)
+    fake_backend.advance(1)
+
+    opacities = [opacity for _, opacity in fake_backend.opacity_history(window.id)]
+    assert opacities == pytest.approx([0.8, 0.85, 0.9, 0.95, 0.8, 0.85, 0.9, 0.95, 1, 0.5])
+
+
+def test_reload_reconfigures_the_event_queue(fake_backend: FakeDisplay) -> None:
+    server = FlashServer(quick_conf(), scheduler=fake_backend.scheduler)
+    assert isinstance(server.events, EventQueue)
+    server.reload_config(
+        rekey(
+            quick_conf(),
+            {"event_queue_size": 5, "event_queue_overflow": {"focus-shift": "drop-oldest"}},
+        )
+    )
+    assert server.events.size == 5
+    assert server.events.overflow[WMEventType.FOCUS_SHIFT] == "drop-oldest"
+
+
+def test_server_applies_reloaded_config(fake_backend: FakeDisplay) -> None:
+    window = fake_backend.create_window()
+    new_config = rekey(quick_conf(), {"default_opacity": 0.5})
+    server = FlashServer(
+        quick_conf(), scheduler=fake_backend.scheduler, config_loader=lambda: new_config
+    )
+
+    server.request_reload()
+    server._flash_queued_window()
+    fake_backend.advance(1)
+
+    assert server.config is new_config
+    assert window.opacity == 0.5
+
+
+def test_server_keeps_config_if_reload_fails(fake_backend: FakeDisplay) -> None:
+    def fail() -> dict:
+        raise ConfigLoadError("Invalid config")
+
+    config = quick_conf()
+    server = FlashServer(config, scheduler=fake_backend.scheduler, config_loader=fail)
+    server._load_config()
+
+    assert server.events.empty()
+    assert server.config is config
+
+
+def test_reload_event_is_not_routed(fake_backend: FakeDisplay) -> None:
+    server = FlashServer(quick_conf(), scheduler=fake_backend.scheduler)
+    server.router.route_request = MagicMock()  # type: ignore[assignment]
+    server.events.put(ConfigReload(quick_conf()))
+    server._flash_queued_window()
+
+    server.router.route_request.assert_not_called()
+    assert not server.processing_event
@@ -0,0 +1,25 @@
+"""Test suite for flashfocus.stats."""
+from __future__ import annotations
+
+from flashfocus.stats import Stats
+
+
+def test_counters_and_timings() -> None:
+    stats = Stats()
+    stats.increment("b.count")
+    stats.increment("b.count", 2)
+    stats.observe("a.time", 0.001)
+    stats.observe("a.time", 0.003)
+    assert stats.counters == {"b.count": 3}
+    timing = stats.timings["a.time"]
+    assert (timing.count, timing.total, timing.max) == (2, 0.004, 0.003)
+    assert timing.mean == 0.002
+    assert stats.format() == "a.time: count 2, mean 2.000ms, max 3.000ms\nb.count: 3"
+
+
+def test_reset() -> None:
+    stats = Stats()
+    stats.increment("count")
+    stats.observe("time", 1)
+    stats.reset()
+    assert stats.format() == ""
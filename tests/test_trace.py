@@ -0,0 +1,48 @@
+"""Test suite for flashfocus.trace."""
+from __future__ import annotations
+
+import json
+import os
+from pathlib import Path
+
+import pytest
+
+from flashfocus.trace import Tracer
+
+
+@pytest.fixture
+def tracer() -> Tracer:
+    tracer = Tracer()
+    tracer.enable(buffer_size=3)
+    return tracer
+
+
+def test_tracer_disabled_by_default() -> None:
+    assert not Tracer().enabled
+
+
+def test_ring_buffer_keeps_most_recent_events(tracer: Tracer) -> None:
+    for i in range(5):
+        tracer.instant("event", window=i)
+    assert [args["window"] for *_, args in tracer.buffer] == [2, 3, 4]
+
+
+def test_chrome_trace_format(tracer: Tracer) -> None:
+    tracer.instant("event_produced", window=1, event_type="FOCUS_SHIFT")
+    tracer.complete("set_opacity", tracer.buffer[0][2], window=1, opacity=0.8)
+    events = tracer.to_chrome_trace()["traceEvents"]
+    assert [event["name"] for event in events] == ["event_produced", "set_opacity"]
+    assert events[0]["ph"] == "i"
+    assert events[1]["ph"] == "X"
+    assert events[1]["dur"] >= 0
+    assert events[1]["ts"] == events[0]["ts"]
+    assert events[1]["args"] == {"window": 1, "opacity": 0.8}
+    assert all(event["pid"] == os.getpid() for event in events)
+
+
+def test_dump(tracer: Tracer, tmp_path: Path) -> None:
+    tracer.instant("event_produced", window=1)
+    trace_file = tmp_path / "trace.json"
+    tracer.dump(trace_file)
+    with trace_file.open() as f:
+        assert json.load(f) == tracer.to_chrome_trace()